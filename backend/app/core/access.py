@@ -0,0 +1,153 @@
+import json
+import logging
+import urllib.request
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.gate_event import GateEvent, GateAction, GateTrigger
+from app.models.visit import Visit, VisitStatus
+from app.models.visitor import Visitor
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS = ("entry", "exit")
+
+
+def open_gate() -> bool:
+    """Send one open command to the gate controller"""
+    request = urllib.request.Request(f"{settings.GATE_CONTROLLER_URL}/api/v1/gate/open", method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=settings.GATE_CONTROLLER_TIMEOUT) as response:
+            return json.load(response).get("status") == "success"
+    except Exception as e:
+        logger.warning("Gate controller error: %s", e)
+        return False
+
+
+def _parse_event(event) -> Optional[tuple]:
+    """(visitor UUID, direction) of a recognized-visitor event, or None if it can't be acted on"""
+    if not isinstance(event, dict):
+        logger.warning("Ignoring malformed recognition event: %r", event)
+        return None
+    if not event.get("recognized"):
+        return None
+
+    try:
+        visitor_id = uuid.UUID(str(event["visitor_id"]))
+    except (KeyError, ValueError):
+        logger.warning("Ignoring recognition event with invalid visitor_id: %r", event.get("visitor_id"))
+        return None
+
+    direction = event.get("direction", "entry")
+    if direction not in DIRECTIONS:
+        logger.warning("Ignoring recognition event with invalid direction: %r", direction)
+        return None
+    return visitor_id, direction
+
+
+def _update_visit(visitor_id: uuid.UUID, gate_id: str, direction: str, now: datetime) -> Optional[str]:
+    """
+    Apply the entry/exit to the visitor's visits; returns the affected visit id.
+    Raises LookupError for an unknown visitor; database errors are rolled back and re-raised.
+    """
+    db = SessionLocal()
+    try:
+        # Events for the same visitor must not interleave (check-then-insert
+        # below), whichever backend process handles them: lock the visitor's
+        # row until commit. The partial unique index on visits backs this up.
+        visitor = db.query(Visitor).filter(Visitor.id == visitor_id).with_for_update().first()
+        if visitor is None:
+            raise LookupError(f"Unknown visitor {visitor_id}")
+
+        visit = db.query(Visit).filter(
+            Visit.visitor_id == visitor_id,
+            Visit.status == VisitStatus.INSIDE
+        ).first()
+
+        if direction == "exit":
+            if visit is not None:
+                visit.exit_time = now
+                visit.status = VisitStatus.OUTSIDE
+        else:
+            if visit is not None:
+                # Their exit was never seen; close that visit rather than lock them out
+                logger.warning(
+                    "Visitor %s entered while already inside (missed exit); closing visit %s", visitor_id, visit.id
+                )
+                visit.exit_time = now
+                visit.status = VisitStatus.OUTSIDE
+            visit = Visit(visitor_id=visitor_id, gate_id=gate_id, entry_time=now, status=VisitStatus.INSIDE)
+            db.add(visit)
+
+        db.commit()
+        return str(visit.id) if visit is not None else None
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _record_gate_opened(gate_id: str, visitor_id: uuid.UUID, visitor_name: Optional[str], now: datetime):
+    db = SessionLocal()
+    try:
+        db.add(GateEvent(
+            gate_id=gate_id,
+            action=GateAction.OPENED,
+            triggered_by=GateTrigger.SYSTEM,
+            visitor_id=visitor_id,
+            visitor_name=visitor_name,
+            timestamp=now
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def record_access(event: Dict) -> Optional[Dict]:
+    """
+    Act on a committed face-service recognition.
+    Entry opens a visit (closing one a missed exit left open) and the gate;
+    exit closes the visitor's open visit (if any) and opens the gate.
+    Malformed events, unknown visitors and events whose visit can't be
+    recorded are logged and ignored, without opening the gate.
+    Returns the gate_opened payload, or None when the gate was not opened.
+    """
+    parsed = _parse_event(event)
+    if parsed is None:
+        return None
+    visitor_id, direction = parsed
+    gate_id = event.get("gate_id") or "gate-1"
+    now = datetime.utcnow()
+
+    try:
+        visit_id = _update_visit(visitor_id, gate_id, direction, now)
+    except LookupError as e:
+        logger.warning("Ignoring recognition event: %s", e)
+        return None
+    except Exception:
+        logger.exception("Could not record %s of visitor %s; gate not opened", direction, visitor_id)
+        return None
+
+    # After the visit's transaction: a slow gate controller must not hold the visitor's row lock
+    if not open_gate():
+        return None
+    try:
+        _record_gate_opened(gate_id, visitor_id, event.get("visitor_name"), now)
+    except Exception:
+        # The gate is open either way; only its event log entry is missing
+        logger.exception("Could not record gate %s opening for visitor %s", gate_id, visitor_id)
+
+    return {
+        "gate_id": gate_id,
+        "direction": direction,
+        "visitor_id": str(visitor_id),
+        "visitor_name": event.get("visitor_name"),
+        "visit_id": visit_id
+    }
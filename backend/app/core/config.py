@@ -24,6 +24,18 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
 
+    # Face-service authentication: the Socket.IO client that may push
+    # recognition_event (and so open gates) must present this token.
+    # Empty = recognition events are refused.
+    FACE_SERVICE_TOKEN: str = ""
+
+    # Gate Controller (opened for recognized visitors)
+    GATE_CONTROLLER_URL: str = "http://localhost:8002"
+    GATE_CONTROLLER_TIMEOUT: float = 3.0  # seconds
+
+    # Channel the faces/visitors triggers NOTIFY (face-service GALLERY_SYNC_CHANNEL)
+    GALLERY_SYNC_CHANNEL: str = "gallery_changes"
+
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
 
@@ -0,0 +1,99 @@
+import struct
+from array import array
+from typing import List, Sequence, Tuple
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# Versioned binary embedding format, shared with the face-service
+# (face-service/app/core/embedding_codec.py):
+#
+#   magic "FEMB" | version u8 | dtype u8 | dim u16 | model name length u8 | model name
+#   zero padding up to an 8-byte boundary | dim packed little-endian values
+EMBEDDING_MEDIA_TYPE = "application/x-face-embedding"
+MAGIC = b"FEMB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHB")
+
+DTYPE_CODES = {"float32": 1, "float16": 2}
+CODE_FORMATS = {1: "f", 2: "e"}  # struct formats
+
+DEFAULT_MODEL = "dlib_resnet_v1"
+LEGACY_DIM = 128
+
+
+def _header_size(model_length: int) -> int:
+    size = HEADER.size + model_length
+    return (size + 7) // 8 * 8
+
+
+def encode_embedding(values: Sequence[float], dtype: str = "float32", model: str = DEFAULT_MODEL) -> bytes:
+    """Pack an embedding into the binary wire format"""
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    code = DTYPE_CODES[dtype]
+    model_bytes = model.encode("ascii")
+    header = HEADER.pack(MAGIC, VERSION, code, len(values), len(model_bytes)) + model_bytes
+    header = header.ljust(_header_size(len(model_bytes)), b"\0")
+    return header + struct.pack(f"<{len(values)}{CODE_FORMATS[code]}", *values)
+
+
+def is_encoded_embedding(blob: bytes) -> bool:
+    return len(blob) >= HEADER.size and bytes(blob[:4]) == MAGIC
+
+
+def decode_embedding(blob: bytes) -> Tuple[List[float], str]:
+    """Unpack a binary embedding. Returns (values, model)"""
+    if not is_encoded_embedding(blob):
+        raise ValueError("Not an encoded embedding")
+
+    _, version, code, dim, model_length = HEADER.unpack_from(blob)
+    if version != VERSION:
+        raise ValueError(f"Unsupported embedding format version: {version}")
+    if code not in CODE_FORMATS:
+        raise ValueError(f"Unsupported embedding dtype code: {code}")
+
+    model = bytes(blob[HEADER.size:HEADER.size + model_length]).decode("ascii")
+    values = struct.unpack_from(f"<{dim}{CODE_FORMATS[code]}", blob, _header_size(model_length))
+    return list(values), model
+
+
+def _decode_legacy(blob: bytes) -> List[float]:
+    """Decode pre-format rows stored as raw native float64 or float32 bytes"""
+    if len(blob) == LEGACY_DIM * 8:
+        return array("d", bytes(blob)).tolist()
+    if len(blob) == LEGACY_DIM * 4:
+        return array("f", bytes(blob)).tolist()
+    raise ValueError(f"Unrecognized embedding blob of {len(blob)} bytes")
+
+
+class Embedding(TypeDecorator):
+    """Face embedding column stored in the binary embedding format.
+
+    Accepts a sequence of floats or an already-encoded blob; legacy raw
+    float arrays are re-encoded on write. Loads as a list of floats.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype: str = "float32", model: str = DEFAULT_MODEL):
+        super().__init__()
+        self.dtype = dtype
+        self.model = model
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if is_encoded_embedding(value):
+                return bytes(value)
+            value = _decode_legacy(value)
+        return encode_embedding(list(value), dtype=self.dtype, model=self.model)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if is_encoded_embedding(value):
+            return decode_embedding(value)[0]
+        return _decode_legacy(value)
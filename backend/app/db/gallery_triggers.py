@@ -0,0 +1,46 @@
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+
+# Row-level triggers that let the face-service keep its in-memory gallery in
+# step with faces and visitors (face-service/app/core/gallery_sync.py, which
+# holds the same definitions for deployments that opt into installing them
+# itself). They NOTIFY the channel given as the trigger argument with
+# {"table", "op", "id", "visitor_id"}.
+NOTIFY_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION facescan_gallery_notify() RETURNS trigger AS $$
+DECLARE
+    changed RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    IF TG_TABLE_NAME = 'faces' THEN
+        PERFORM pg_notify(TG_ARGV[0], json_build_object(
+            'table', TG_TABLE_NAME, 'op', TG_OP, 'id', changed.id, 'visitor_id', changed.visitor_id
+        )::text);
+    ELSE
+        PERFORM pg_notify(TG_ARGV[0], json_build_object(
+            'table', TG_TABLE_NAME, 'op', TG_OP, 'id', changed.id, 'visitor_id', changed.id
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGER_SQL = (
+    "CREATE OR REPLACE TRIGGER facescan_gallery_{table} "
+    "AFTER INSERT OR UPDATE OR DELETE ON {table} "
+    "FOR EACH ROW EXECUTE FUNCTION facescan_gallery_notify('{channel}')"
+)
+
+
+def create_gallery_triggers():
+    with engine.begin() as conn:
+        conn.execute(text(NOTIFY_FUNCTION_SQL))
+        for table in ("faces", "visitors"):
+            conn.execute(text(TRIGGER_SQL.format(table=table, channel=settings.GALLERY_SYNC_CHANNEL)))
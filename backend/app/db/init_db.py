@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session
 
 from app.core.database import engine, Base
 from app.core.security import get_password_hash
+from app.db.gallery_triggers import create_gallery_triggers
+from app.db.visit_constraints import create_visit_constraints
 from app.models import User
 from app.models.user import UserRole
 
@@ -11,6 +13,14 @@ def init_db():
     Base.metadata.create_all(bind=engine)
     print("Database tables created successfully")
 
+    # One open visit per visitor (tables created before the index existed)
+    create_visit_constraints()
+    print("Visit constraints created")
+
+    # Change notifications for the face-service gallery
+    create_gallery_triggers()
+    print("Gallery sync triggers created")
+
 
 def create_default_user(db: Session):
     # Check if admin user exists
@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+from app.core.database import engine
+from app.models.visit import ONE_OPEN_VISIT_INDEX, OPEN_VISIT_WHERE
+
+# create_all only adds the one-open-visit index to a new visits table; this
+# adds it to existing ones. Visitors left with several open visits (possible
+# before the index) keep only the latest one open.
+CLOSE_DUPLICATE_VISITS_SQL = f"""
+UPDATE visits SET status = 'OUTSIDE', exit_time = COALESCE(exit_time, now() AT TIME ZONE 'utc')
+WHERE {OPEN_VISIT_WHERE} AND id NOT IN (
+    SELECT DISTINCT ON (visitor_id) id FROM visits
+    WHERE {OPEN_VISIT_WHERE}
+    ORDER BY visitor_id, entry_time DESC
+)
+"""
+
+ONE_OPEN_VISIT_SQL = (
+    f"CREATE UNIQUE INDEX IF NOT EXISTS {ONE_OPEN_VISIT_INDEX} "
+    f"ON visits (visitor_id) WHERE {OPEN_VISIT_WHERE}"
+)
+
+
+def create_visit_constraints():
+    with engine.begin() as conn:
+        conn.execute(text(CLOSE_DUPLICATE_VISITS_SQL))
+        conn.execute(text(ONE_OPEN_VISIT_SQL))
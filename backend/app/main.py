@@ -1,8 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import hmac
 import socketio
 
 from app.core.config import settings
+from app.core.access import record_access
 from app.api.routes import auth, visitors, visits, gate, reports
 
 # Create FastAPI app
@@ -47,16 +50,45 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# Socket.IO connections authenticated as the face-service (may open gates)
+face_service_sids = set()
+
+def is_face_service(auth) -> bool:
+    token = auth.get("token") if isinstance(auth, dict) else None
+    return bool(settings.FACE_SERVICE_TOKEN) and isinstance(token, str) and hmac.compare_digest(
+        token.encode(), settings.FACE_SERVICE_TOKEN.encode()
+    )
+
 # Socket.IO events
 @sio.event
 async def connect(sid, environ, auth):
+    if isinstance(auth, dict) and auth.get("service") == "face-service":
+        if not is_face_service(auth):
+            print(f"Rejected face-service connection {sid}: invalid or unconfigured FACE_SERVICE_TOKEN")
+            return False
+        face_service_sids.add(sid)
+        print(f"Face-service connected: {sid}")
+        return
     print(f"Client connected: {sid}")
     # TODO: Verify JWT token from auth
 
 @sio.event
 async def disconnect(sid):
+    face_service_sids.discard(sid)
     print(f"Client disconnected: {sid}")
 
+@sio.event
+async def recognition_event(sid, data):
+    # Pushed by the face-service recognition loops (one per committed decision);
+    # relay to the dashboards and let recognized visitors through
+    if sid not in face_service_sids:
+        print(f"Ignoring recognition_event from unauthenticated client {sid}")
+        return
+    await sio.emit("face_detected", data, skip_sid=sid)
+    gate = await asyncio.to_thread(record_access, data)
+    if gate is not None:
+        await sio.emit("gate_opened", gate, skip_sid=sid)
+
 # Export for use in other modules
 def get_sio():
     return sio
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, LargeBinary
+from sqlalchemy import Column, String, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
 
 from app.core.database import Base
+from app.core.embedding import Embedding
 
 
 class Face(Base):
@@ -12,7 +13,7 @@ class Face(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     visitor_id = Column(UUID(as_uuid=True), ForeignKey("visitors.id"), nullable=False)
-    embedding = Column(LargeBinary, nullable=False)  # Store as binary
+    embedding = Column(Embedding, nullable=False)  # Binary embedding format (see app.core.embedding)
     photo_path = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
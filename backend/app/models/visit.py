@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Enum as SQLEnum, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -13,8 +13,23 @@ class VisitStatus(str, enum.Enum):
     OUTSIDE = "outside"
 
 
+# At most one open visit per visitor, whichever backend process records it
+# (app.core.access; existing databases get it from app.db.visit_constraints)
+ONE_OPEN_VISIT_INDEX = "ix_visits_one_inside_per_visitor"
+OPEN_VISIT_WHERE = "status = 'INSIDE'"
+
+
 class Visit(Base):
     __tablename__ = "visits"
+    __table_args__ = (
+        Index(
+            ONE_OPEN_VISIT_INDEX,
+            "visitor_id",
+            unique=True,
+            postgresql_where=text(OPEN_VISIT_WHERE),
+            sqlite_where=text(OPEN_VISIT_WHERE)
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     visitor_id = Column(UUID(as_uuid=True), ForeignKey("visitors.id"), nullable=False)
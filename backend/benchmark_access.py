@@ -0,0 +1,45 @@
+"""Time the backend's access stage for recognition events.
+
+Usage: python benchmark_access.py < events.json
+
+Reads a JSON list of recognition events (as the face-service emits them) on
+stdin and runs each through record_access against the configured database,
+with the gate controller mocked out (its HTTP call is not timed). Everything
+is written inside one transaction that is rolled back at the end, so no
+visits or gate events are left behind. Prints a JSON summary on stdout;
+face-service/benchmark_pipeline.py --access runs this.
+"""
+import json
+import sys
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core import access
+from app.core.database import engine
+
+events = json.load(sys.stdin)
+access.open_gate = lambda: True
+
+try:
+    connection = engine.connect()
+except Exception as e:
+    print(f"Cannot connect to the database: {e}", file=sys.stderr)
+    sys.exit(1)
+
+transaction = connection.begin()
+# record_access's commits become savepoints of the outer transaction
+access.SessionLocal = sessionmaker(bind=connection, autoflush=False, join_transaction_mode="create_savepoint")
+timings = []
+opened = 0
+try:
+    for event in events:
+        started_at = time.perf_counter()
+        if access.record_access(event) is not None:
+            opened += 1
+        timings.append((time.perf_counter() - started_at) * 1000)
+finally:
+    transaction.rollback()
+    connection.close()
+
+print(json.dumps({"events": len(events), "opened": opened, "ms": timings}))
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Run from anywhere: make the backend package importable as "app"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@compiles(UUID, "sqlite")
+def _sqlite_uuid(type_, compiler, **kw):
+    # Stored as hex like SQLAlchemy's generic Uuid on databases without a UUID type
+    return "CHAR(32)"
+
+
+@pytest.fixture
+def SessionLocal():
+    """Sessions on an in-memory SQLite database with the backend's tables"""
+    from app.core.database import Base
+    import app.models  # noqa: F401 (registers the tables)
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
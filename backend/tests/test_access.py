@@ -0,0 +1,140 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.core import access
+from app.models.gate_event import GateEvent
+from app.models.visit import Visit, VisitStatus
+from app.models.visitor import Visitor
+
+
+@pytest.fixture
+def gate(SessionLocal, monkeypatch):
+    """record_access against the test database, with a gate controller that records its calls"""
+    monkeypatch.setattr(access, "SessionLocal", SessionLocal)
+    gate = {"opened": 0, "works": True}
+
+    def open_gate():
+        gate["opened"] += 1
+        return gate["works"]
+
+    monkeypatch.setattr(access, "open_gate", open_gate)
+    return gate
+
+
+@pytest.fixture
+def visitor_id(SessionLocal):
+    db = SessionLocal()
+    visitor = Visitor(name="Visitor", is_active="true")
+    db.add(visitor)
+    db.commit()
+    visitor_id = visitor.id
+    db.close()
+    return visitor_id
+
+
+def _event(visitor_id, direction="entry"):
+    return {
+        "recognized": True,
+        "visitor_id": str(visitor_id),
+        "visitor_name": "Visitor",
+        "gate_id": "gate-2",
+        "direction": direction
+    }
+
+
+def _visits(SessionLocal, visitor_id):
+    db = SessionLocal()
+    try:
+        return [
+            (str(visit.id), visit.status, visit.exit_time is not None)
+            for visit in db.query(Visit).filter(Visit.visitor_id == visitor_id).order_by(Visit.entry_time)
+        ]
+    finally:
+        db.close()
+
+
+def _gate_events(SessionLocal):
+    db = SessionLocal()
+    try:
+        return db.query(GateEvent).count()
+    finally:
+        db.close()
+
+
+def test_entry_then_exit(SessionLocal, gate, visitor_id):
+    opened = access.record_access(_event(visitor_id))
+    assert opened["gate_id"] == "gate-2" and opened["direction"] == "entry"
+    assert _visits(SessionLocal, visitor_id) == [(opened["visit_id"], VisitStatus.INSIDE, False)]
+
+    closed = access.record_access(_event(visitor_id, "exit"))
+    assert closed["visit_id"] == opened["visit_id"]
+    assert _visits(SessionLocal, visitor_id) == [(opened["visit_id"], VisitStatus.OUTSIDE, True)]
+    assert gate["opened"] == 2 and _gate_events(SessionLocal) == 2
+
+
+def test_entry_after_a_missed_exit_closes_the_open_visit(SessionLocal, gate, visitor_id):
+    first = access.record_access(_event(visitor_id))["visit_id"]
+    second = access.record_access(_event(visitor_id))["visit_id"]
+
+    assert second != first
+    assert _visits(SessionLocal, visitor_id) == [
+        (first, VisitStatus.OUTSIDE, True),
+        (second, VisitStatus.INSIDE, False)
+    ]
+
+
+def test_exit_without_an_open_visit_still_opens_the_gate(SessionLocal, gate, visitor_id):
+    opened = access.record_access(_event(visitor_id, "exit"))
+    assert opened["visit_id"] is None
+    assert gate["opened"] == 1 and _visits(SessionLocal, visitor_id) == []
+
+
+def test_visit_is_kept_when_the_gate_does_not_open(SessionLocal, gate, visitor_id):
+    gate["works"] = False
+    assert access.record_access(_event(visitor_id)) is None
+    assert [status for _, status, _ in _visits(SessionLocal, visitor_id)] == [VisitStatus.INSIDE]
+    assert _gate_events(SessionLocal) == 0
+
+
+@pytest.mark.parametrize("event", [
+    None,
+    {"recognized": False},
+    {"recognized": True, "visitor_id": "not-a-uuid"},
+    {"recognized": True, "visitor_id": str(uuid.uuid4()), "direction": "sideways"},
+    {"recognized": True, "visitor_id": str(uuid.uuid4())},  # Not a visitor
+])
+def test_events_that_cannot_be_acted_on_leave_the_gate_shut(SessionLocal, gate, event):
+    assert access.record_access(event) is None
+    assert gate["opened"] == 0
+
+
+def test_database_error_is_rolled_back_and_leaves_the_gate_shut(SessionLocal, gate, visitor_id, monkeypatch, caplog):
+    def failing_add(self, instance, _warn=True):
+        raise IntegrityError("INSERT INTO visits", {}, Exception("database unavailable"))
+
+    with monkeypatch.context() as patched:
+        patched.setattr(access.SessionLocal.class_, "add", failing_add)
+        assert access.record_access(_event(visitor_id)) is None
+
+    assert gate["opened"] == 0 and _visits(SessionLocal, visitor_id) == []
+    assert "gate not opened" in caplog.text
+    # The session was rolled back and released: the next event goes through
+    assert access.record_access(_event(visitor_id)) is not None
+
+
+def test_database_allows_one_open_visit_per_visitor(SessionLocal, gate, visitor_id):
+    access.record_access(_event(visitor_id))
+
+    db = SessionLocal()
+    try:
+        db.add(Visit(visitor_id=visitor_id, gate_id="gate-1", status=VisitStatus.INSIDE))
+        with pytest.raises(IntegrityError):
+            db.commit()
+        db.rollback()
+        # Closed visits are not limited
+        db.add(Visit(visitor_id=visitor_id, gate_id="gate-1", status=VisitStatus.OUTSIDE))
+        db.commit()
+    finally:
+        db.close()
@@ -83,6 +83,7 @@ export const reportsAPI = {
 }
 
 export const cameraAPI = {
+  list: () => faceServiceApi.get('/api/v1/detection/cameras'),
   listAvailable: () => faceServiceApi.get('/api/v1/detection/cameras/list'),
   configure: (entryIndex?: number, exitIndex?: number) =>
     faceServiceApi.post('/api/v1/detection/cameras/configure', null, {
@@ -92,8 +93,12 @@ export const cameraAPI = {
       },
     }),
   getStatus: () => faceServiceApi.get('/api/v1/detection/camera/status'),
-  frameUrl: (which: 'entry' | 'exit') =>
-    `${FACE_SERVICE_URL}/api/v1/detection/cameras/frame?camera=${which}`,
+  frameUrl: (cameraId: string, width?: number, quality?: number) =>
+    `${FACE_SERVICE_URL}/api/v1/detection/cameras/frame?camera=${cameraId}` +
+    (width ? `&width=${width}` : '') +
+    (quality ? `&quality=${quality}` : ''),
+  streamUrl: (cameraId: string) =>
+    `${FACE_SERVICE_URL}/api/v1/detection/cameras/stream?camera=${cameraId}`,
   reset: (entryIndex?: number, exitIndex?: number, restartServices?: boolean) =>
     faceServiceApi.post('/api/v1/detection/cameras/reset', null, {
       params: {
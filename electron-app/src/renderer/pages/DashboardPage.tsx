@@ -7,12 +7,29 @@ import { wsService } from '@/lib/websocket'
 import { useToast } from '@/components/ui/use-toast'
 import { cameraAPI } from '@/lib/api'
 
+interface CameraInfo {
+  id: string
+  name: string
+  gate_id: string
+  direction: string
+  connected: boolean
+}
+
+// Used until the face service answers, and if it is an older version without /cameras
+const DEFAULT_CAMERAS: CameraInfo[] = [
+  { id: 'entry', name: 'Entry Camera', gate_id: 'gate-1', direction: 'entry', connected: false },
+  { id: 'exit', name: 'Exit Camera', gate_id: 'gate-1', direction: 'exit', connected: false },
+]
+
 export default function DashboardPage() {
   const { toast } = useToast()
-  const [entrySrc, setEntrySrc] = useState<string>('')
-  const [exitSrc, setExitSrc] = useState<string>('')
-  const entryInterval = useRef<number | null>(null)
-  const exitInterval = useRef<number | null>(null)
+  const [cameras, setCameras] = useState<CameraInfo[]>(DEFAULT_CAMERAS)
+  const [streamSrcs, setStreamSrcs] = useState<Record<string, string>>({})
+  const retryTimers = useRef<Record<string, number>>({})
+
+  const streamSrc = (cameraId: string) => `${cameraAPI.streamUrl(cameraId)}&ts=${Date.now()}`
+  const setStreamSrc = (cameraId: string, src: string) =>
+    setStreamSrcs((current) => ({ ...current, [cameraId]: src }))
 
   useEffect(() => {
     // Connect to WebSocket
@@ -38,28 +55,37 @@ export default function DashboardPage() {
     }
   }, [toast])
 
-  // Setup simple polling to refresh camera frames
+  // Load the camera registry, then open one live MJPEG stream per camera
   useEffect(() => {
-    const entryUrl = cameraAPI.frameUrl('entry')
-    const exitUrl = cameraAPI.frameUrl('exit')
-
-    const refreshEntry = () => setEntrySrc(`${entryUrl}&ts=${Date.now()}`)
-    const refreshExit = () => setExitSrc(`${exitUrl}&ts=${Date.now()}`)
+    let cancelled = false
 
-    // Initial load
-    refreshEntry()
-    refreshExit()
+    const load = async () => {
+      let registry = DEFAULT_CAMERAS
+      try {
+        const response = await cameraAPI.list()
+        registry = response.data.cameras
+      } catch (error) {
+        console.error('Failed to load cameras:', error)
+      }
+      if (cancelled) return
 
-    // Poll every 1000ms
-    entryInterval.current = window.setInterval(refreshEntry, 1000)
-    exitInterval.current = window.setInterval(refreshExit, 1000)
+      setCameras(registry)
+      setStreamSrcs(Object.fromEntries(registry.map((camera) => [camera.id, streamSrc(camera.id)])))
+    }
+    load()
 
     return () => {
-      if (entryInterval.current) window.clearInterval(entryInterval.current)
-      if (exitInterval.current) window.clearInterval(exitInterval.current)
+      cancelled = true
+      Object.values(retryTimers.current).forEach((timer) => window.clearTimeout(timer))
     }
   }, [])
 
+  // Reconnect a dropped stream after a short delay
+  const handleStreamError = (cameraId: string) => {
+    setStreamSrc(cameraId, '')
+    retryTimers.current[cameraId] = window.setTimeout(() => setStreamSrc(cameraId, streamSrc(cameraId)), 3000)
+  }
+
   return (
     <MainLayout>
       <div className="space-y-6">
@@ -76,8 +102,10 @@ export default function DashboardPage() {
               <Camera className="h-4 w-4 text-muted-foreground" />
             </CardHeader>
             <CardContent>
-              <div className="text-2xl font-bold">2</div>
-              <p className="text-xs text-muted-foreground">Entry & Exit</p>
+              <div className="text-2xl font-bold">{cameras.length}</div>
+              <p className="text-xs text-muted-foreground">
+                {cameras.filter((camera) => camera.connected).length} connected
+              </p>
             </CardContent>
           </Card>
           <Card>
@@ -114,44 +142,30 @@ export default function DashboardPage() {
 
         {/* Live Camera Feeds */}
         <div className="grid gap-4 md:grid-cols-2">
-          <Card>
-            <CardHeader>
-              <CardTitle>Entry Camera</CardTitle>
-            </CardHeader>
-            <CardContent>
-              <div className="aspect-video bg-black rounded-lg overflow-hidden flex items-center justify-center">
-                {entrySrc ? (
-                  <img
-                    src={entrySrc}
-                    alt="Entry camera"
-                    className="w-full h-full object-contain"
-                    onError={() => setEntrySrc('')}
-                  />
-                ) : (
-                  <p className="text-muted-foreground">No feed</p>
-                )}
-              </div>
-            </CardContent>
-          </Card>
-          <Card>
-            <CardHeader>
-              <CardTitle>Exit Camera</CardTitle>
-            </CardHeader>
-            <CardContent>
-              <div className="aspect-video bg-black rounded-lg overflow-hidden flex items-center justify-center">
-                {exitSrc ? (
-                  <img
-                    src={exitSrc}
-                    alt="Exit camera"
-                    className="w-full h-full object-contain"
-                    onError={() => setExitSrc('')}
-                  />
-                ) : (
-                  <p className="text-muted-foreground">No feed</p>
-                )}
-              </div>
-            </CardContent>
-          </Card>
+          {cameras.map((camera) => (
+            <Card key={camera.id}>
+              <CardHeader>
+                <CardTitle>{camera.name || camera.id}</CardTitle>
+                <p className="text-xs text-muted-foreground">
+                  {camera.gate_id} · {camera.direction}
+                </p>
+              </CardHeader>
+              <CardContent>
+                <div className="aspect-video bg-black rounded-lg overflow-hidden flex items-center justify-center">
+                  {streamSrcs[camera.id] ? (
+                    <img
+                      src={streamSrcs[camera.id]}
+                      alt={`${camera.name || camera.id} camera`}
+                      className="w-full h-full object-contain"
+                      onError={() => handleStreamError(camera.id)}
+                    />
+                  ) : (
+                    <p className="text-muted-foreground">No feed</p>
+                  )}
+                </div>
+              </CardContent>
+            </Card>
+          ))}
         </div>
 
         {/* Recent Activity */}
@@ -1,43 +1,84 @@
-from fastapi import APIRouter, UploadFile, File, Query
-from fastapi.responses import JSONResponse, Response
+from fastapi import APIRouter, UploadFile, File, Query, Request, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+import base64
+import json
+import os
+import tarfile
+import tempfile
+import zipfile
 import cv2
 import numpy as np
 import platform
 import subprocess
+import time
 
+from app.core.config import settings
 from app.core.face_detector import face_detector
 from app.core.camera_manager import camera_manager
+from app.core.camera_discovery import camera_discovery
+from app.core.inference_pool import inference_pool, PoolSaturatedError
+from app.core.frame_stream import MJPEG_BOUNDARY, get_broadcaster, jpeg_cache, multipart_part
+from app.core.embedding_codec import EMBEDDING_MEDIA_TYPE, encode_embedding, negotiate_embedding_dtype
 
 router = APIRouter()
 
 
+def _detect(contents: bytes, include_encodings: bool, scale: float = None):
+    """Decode, preprocess and detect (and optionally encode) faces; runs on an inference worker"""
+    image = face_detector.decode_image(contents)
+    if image is None:
+        return None
+
+    # Preprocess image
+    is_night_mode = face_detector.is_night_mode(image)
+    image = face_detector.preprocess_image(image, night_mode=is_night_mode)
+
+    # Detect (and encode) faces
+    faces = face_detector.detect_and_encode(image, encode=include_encodings, scale=scale)
+
+    result = {
+        "faces_detected": len(faces),
+        "face_locations": [location for location, _ in faces],
+        "is_night_mode": is_night_mode
+    }
+    if include_encodings:
+        result["encodings"] = [encoding.tolist() for _, encoding in faces]
+    return result
+
+
 @router.post("/detect")
-async def detect_faces(file: UploadFile = File(...)):
-    """Detect faces in uploaded image"""
+async def detect_faces(
+    file: UploadFile = File(...),
+    include_encodings: bool = Query(False),
+    scale: float = Query(None, le=1.0)
+):
+    """Detect faces in uploaded image, optionally encoding them in the same pass
+
+    Query params:
+    - include_encodings: also return a 128-d encoding per face
+    - scale: detection downscale factor (0 = auto, default from settings)
+    """
     try:
         # Read image file
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-        if image is None:
+        result = await inference_pool.run(_detect, contents, include_encodings, scale)
+
+        if result is None:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Invalid image file"}
             )
 
-        # Preprocess image
-        image = face_detector.preprocess_image(image)
-
-        # Detect faces
-        face_locations = face_detector.detect_faces(image)
-
-        return {
-            "faces_detected": len(face_locations),
-            "face_locations": face_locations,
-            "is_night_mode": face_detector.is_night_mode(image)
-        }
+        return result
 
+    except PoolSaturatedError:
+        return JSONResponse(
+            status_code=settings.INFERENCE_REJECT_STATUS,
+            content={"error": "Face service busy, try again"},
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -46,37 +87,54 @@ async def detect_faces(file: UploadFile = File(...)):
 
 
 @router.post("/encode")
-async def encode_face(file: UploadFile = File(...)):
-    """Generate face encoding from uploaded image"""
+async def encode_face(file: UploadFile = File(...), accept: str = Header(None)):
+    """Generate face encoding from uploaded image
+
+    Send "Accept: application/x-face-embedding" (optionally with
+    "; dtype=float16") to get the packed binary embedding instead of JSON;
+    the face location is then returned in the X-Face-Location header.
+    """
     try:
         # Read image file
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-        if image is None:
+        # Decode, preprocess, detect and encode the first face on a worker
+        faces = await inference_pool.run(face_detector.decode_and_encode, contents)
+
+        if faces is None:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Invalid image file"}
             )
 
-        # Preprocess image
-        image = face_detector.preprocess_image(image)
-
-        # Generate encoding
-        encoding = face_detector.encode_face(image)
-
-        if encoding is None:
+        if not faces:
             return JSONResponse(
                 status_code=400,
                 content={"error": "No face detected in image"}
             )
 
+        face_location, encoding = faces[0]
+
+        wire_dtype = negotiate_embedding_dtype(accept)
+        if wire_dtype is not None:
+            return Response(
+                content=encode_embedding(encoding, dtype=wire_dtype),
+                media_type=EMBEDDING_MEDIA_TYPE,
+                headers={"X-Face-Location": ",".join(str(value) for value in face_location)}
+            )
+
         return {
             "encoding": encoding.tolist(),
+            "face_location": face_location,
             "success": True
         }
 
+    except PoolSaturatedError:
+        return JSONResponse(
+            status_code=settings.INFERENCE_REJECT_STATUS,
+            content={"error": "Face service busy, try again"},
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -84,95 +142,220 @@ async def encode_face(file: UploadFile = File(...)):
         )
 
 
-@router.get("/camera/status")
-async def camera_status():
-    """Get camera connection status"""
-    return {
-        "entry_camera": camera_manager.entry_camera.is_connected if camera_manager.entry_camera else False,
-        "exit_camera": camera_manager.exit_camera.is_connected if camera_manager.exit_camera else False
-    }
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+ARCHIVE_CONTENT_TYPES = {"application/zip", "application/x-tar", "application/gzip", "application/x-gzip"}
 
 
-def get_camera_names_windows():
-    """Get camera names on Windows using PowerShell"""
-    try:
-        # Use PowerShell to get camera names - use list to avoid shell escaping issues
-        cmd = ['powershell', '-Command', 'Get-PnpDevice -Class Camera | Select-Object -ExpandProperty FriendlyName']
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-
-        if result.returncode == 0:
-            # Parse the output - each line is a camera name
-            names = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
-            return names
-        return []
-    except Exception as e:
-        print(f"Error getting camera names: {e}")
-        return []
+def _is_image_name(name: str) -> bool:
+    return os.path.splitext(name.lower())[1] in IMAGE_EXTENSIONS
 
 
-@router.get("/cameras/list")
-async def list_available_cameras():
-    """List all available camera devices"""
+def _iter_archive(fileobj, name: str = ""):
+    """Yield (filename, bytes) for each image in a zip or tar(.gz) archive, one at a time"""
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_image_name(info.filename):
+                    yield info.filename, archive.read(info)
+        return
+
+    fileobj.seek(0)
     try:
-        available_cameras = []
-        camera_names = []
+        archive = tarfile.open(fileobj=fileobj, mode="r|*")
+    except tarfile.TarError:
+        raise ValueError(f"Unsupported archive {name}".strip())
+    with archive:
+        for member in archive:
+            if member.isfile() and _is_image_name(member.name):
+                yield member.name, archive.extractfile(member).read()
+
+
+def _iter_batch_items(files, archives):
+    """Yield (index, filename, bytes) across uploaded images and archives"""
+    index = 0
+    for upload in files:
+        upload.file.seek(0)
+        yield index, upload.filename, upload.file.read()
+        index += 1
+    for name, fileobj in archives:
+        for filename, contents in _iter_archive(fileobj, name):
+            yield index, filename, contents
+            index += 1
+
+
+async def _encode_batch_item(index: int, filename: str, contents: bytes, wire_dtype: str = None) -> dict:
+    """Encode one batch image, waiting out (not failing on) short pool saturation"""
+    result = {"index": index, "filename": filename}
+    for attempt in range(settings.ENCODE_BATCH_MAX_RETRIES + 1):
+        try:
+            faces = await inference_pool.run(face_detector.decode_and_encode, contents)
+            break
+        except PoolSaturatedError:
+            if attempt == settings.ENCODE_BATCH_MAX_RETRIES:
+                result.update(success=False, error="Face service busy")
+                return result
+            await asyncio.sleep(min(0.05 * 2 ** attempt, 1.0))
+        except Exception as e:
+            result.update(success=False, error=str(e))
+            return result
+
+    if faces is None:
+        result.update(success=False, error="Invalid image file")
+    elif not faces:
+        result.update(success=False, error="No face detected in image")
+    else:
+        face_location, encoding = faces[0]
+        if wire_dtype is not None:
+            blob = encode_embedding(encoding, dtype=wire_dtype)
+            result.update(success=True, embedding=base64.b64encode(blob).decode("ascii"), face_location=face_location)
+        else:
+            result.update(success=True, encoding=encoding.tolist(), face_location=face_location)
+    return result
 
-        # Get camera names if on Windows
-        if platform.system() == "Windows":
-            camera_names = get_camera_names_windows()
-            print(f"Camera names from Windows: {camera_names}")
 
-        # Check up to 10 camera indices
-        # Don't break on first failure - some indices might be skipped
-        for index in range(10):
+async def _stream_batch(items, cleanup, wire_dtype: str = None):
+    """Encode items with bounded concurrency, yielding NDJSON lines as they finish"""
+    concurrency = max(1, settings.ENCODE_BATCH_CONCURRENCY or inference_pool.max_workers)
+    pending = set()
+    total = 0
+    succeeded = 0
+
+    try:
+        while True:
+            while len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    succeeded += result["success"]
+                    yield json.dumps(result) + "\n"
+
+            # Archive members are read lazily, one at a time, off the event loop
             try:
-                print(f"Checking camera index {index}...")
-                is_open = False
-                cap = None
-                # Try multiple backends to detect availability
-                backends = [
-                    getattr(cv2, 'CAP_DSHOW', 700),
-                    getattr(cv2, 'CAP_MSMF', 1400),
-                    getattr(cv2, 'CAP_V4L2', 200),
-                    getattr(cv2, 'CAP_AVFOUNDATION', 1200),
-                    getattr(cv2, 'CAP_ANY', 0),
-                ]
-                for b in backends:
-                    try:
-                        cap = cv2.VideoCapture(index, b)
-                        if cap.isOpened():
-                            is_open = True
-                            break
-                        cap.release()
-                    except Exception:
-                        pass
-                print(f"  Camera {index} isOpened: {is_open}")
-
-                if is_open and cap is not None:
-                    # Use friendly name if available, otherwise fallback to generic name
-                    if index < len(camera_names) and camera_names[index]:
-                        camera_name = camera_names[index]
-                    else:
-                        camera_name = f"Camera {index}"
-
-                    print(f"  Adding camera: {camera_name}")
-                    available_cameras.append({
-                        "index": index,
-                        "name": camera_name,
-                        "type": "webcam",
-                        "available": True
-                    })
-                    cap.release()
-                else:
-                    if cap is not None:
-                        cap.release()
+                item = await asyncio.to_thread(next, items, None)
             except Exception as e:
-                print(f"Error checking camera {index}: {e}")
+                yield json.dumps({"error": str(e)}) + "\n"
+                item = None
+            if item is None:
+                break
+
+            total += 1
+            pending.add(asyncio.create_task(_encode_batch_item(*item, wire_dtype)))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                succeeded += result["success"]
+                yield json.dumps(result) + "\n"
+
+        yield json.dumps({"done": True, "total": total, "succeeded": succeeded}) + "\n"
+    finally:
+        for task in pending:
+            task.cancel()
+        await cleanup()
+
+
+@router.post("/encode/batch")
+async def encode_faces_batch(request: Request):
+    """Encode many images, streaming one NDJSON result per image as it finishes.
+
+    Accepts either multipart form data with any number of `files` images
+    and/or `archive` zip/tar uploads, or a raw zip/tar(.gz) request body.
+    Results arrive out of order; each line carries the image's index and
+    filename, and a final line summarizes the batch.
+
+    With "Accept: application/x-face-embedding" each line carries a base64
+    "embedding" in the binary format instead of an "encoding" float list.
+    """
+    wire_dtype = negotiate_embedding_dtype(request.headers.get("accept"))
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in ARCHIVE_CONTENT_TYPES:
+        # Spool the raw archive to disk rather than holding it in memory
+        spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        async for chunk in request.stream():
+            spool.write(chunk)
+        items = _iter_batch_items([], [("request body", spool)])
+
+        async def cleanup():
+            spool.close()
+    else:
+        # Parsed here (not via File params) so uploads stay open while streaming
+        form = await request.form(max_files=settings.ENCODE_BATCH_MAX_FILES)
+        files = [upload for upload in form.getlist("files") if hasattr(upload, "file")]
+        archives = [(upload.filename, upload.file) for upload in form.getlist("archive") if hasattr(upload, "file")]
+        if not files and not archives:
+            await form.close()
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Provide 'files' and/or 'archive' uploads"}
+            )
+        items = _iter_batch_items(files, archives)
+
+        async def cleanup():
+            await form.close()
+
+    return StreamingResponse(_stream_batch(items, cleanup, wire_dtype), media_type="application/x-ndjson")
+
+
+def _is_connected(camera_id: str) -> bool:
+    stream = camera_manager.get_camera(camera_id)
+    return stream.is_connected if stream else False
+
+
+def _camera_indices(entry_index: int = None, exit_index: int = None, camera_id: str = None, index: int = None):
+    """Collect device index changes by camera ID (entry_index/exit_index address the legacy pair)"""
+    indices = {}
+    if entry_index is not None:
+        indices["entry"] = entry_index
+    if exit_index is not None:
+        indices["exit"] = exit_index
+    if camera_id is not None and index is not None:
+        indices[camera_id] = index
+    return indices
+
+
+def _unknown_camera(camera: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=404,
+        content={"error": f"Unknown camera '{camera}'", "cameras": camera_manager.camera_ids()}
+    )
+
+
+@router.get("/cameras")
+async def list_cameras():
+    """List configured cameras with their gate, direction and connection state"""
+    cameras = camera_manager.describe()
+    return {
+        "cameras": cameras,
+        "count": len(cameras)
+    }
+
+
+@router.get("/camera/status")
+async def camera_status():
+    """Get camera connection status"""
+    return {
+        "cameras": {camera_id: _is_connected(camera_id) for camera_id in camera_manager.camera_ids()},
+        "entry_camera": _is_connected("entry"),
+        "exit_camera": _is_connected("exit"),
+        "capture": camera_manager.stats()
+    }
 
-        return {
-            "cameras": available_cameras,
-            "count": len(available_cameras)
-        }
+
+@router.get("/cameras/list")
+async def list_available_cameras(refresh: bool = Query(False)):
+    """List all available camera devices
+
+    Results are cached for CAMERA_DISCOVERY_TTL seconds.
+
+    Query params:
+    - refresh: re-enumerate devices instead of using the cache
+    """
+    try:
+        return await asyncio.to_thread(camera_discovery.discover, refresh)
 
     except Exception as e:
         return JSONResponse(
@@ -182,19 +365,27 @@ async def list_available_cameras():
 
 
 @router.post("/cameras/configure")
-async def configure_cameras(entry_index: int = None, exit_index: int = None):
-    """Update camera configuration"""
+async def configure_cameras(entry_index: int = None, exit_index: int = None, camera_id: str = None, index: int = None):
+    """Update camera configuration
+
+    Query params:
+    - entry_index / exit_index: device index for the 'entry' / 'exit' cameras
+    - camera_id, index: device index for any configured camera
+    """
     try:
-        result = camera_manager.update_cameras(
-            entry_index=entry_index,
-            exit_index=exit_index
+        result = await asyncio.to_thread(
+            camera_manager.update_cameras,
+            _camera_indices(entry_index, exit_index, camera_id, index)
         )
+        camera_discovery.invalidate()
+        success = all(result.values())
 
         return {
-            "success": result,
-            "message": "Cameras configured successfully" if result else "Failed to configure cameras",
-            "entry_camera_connected": camera_manager.entry_camera.is_connected if camera_manager.entry_camera else False,
-            "exit_camera_connected": camera_manager.exit_camera.is_connected if camera_manager.exit_camera else False
+            "success": success,
+            "message": "Cameras configured successfully" if success else "Failed to configure cameras",
+            "cameras": result,
+            "entry_camera_connected": _is_connected("entry"),
+            "exit_camera_connected": _is_connected("exit")
         }
 
     except Exception as e:
@@ -205,42 +396,88 @@ async def configure_cameras(entry_index: int = None, exit_index: int = None):
 
 
 @router.get("/cameras/frame")
-async def get_camera_frame(camera: str = Query("entry")):
+async def get_camera_frame(
+    camera: str = Query("entry"),
+    width: int = Query(0, ge=0),
+    quality: int = Query(95, ge=1, le=100)
+):
     """Return a single JPEG frame from the requested camera.
 
+    Encoded frames are cached per (camera, frame, width, quality), so repeated
+    or concurrent requests for the same frame share a single encode.
+
     Query params:
-    - camera: 'entry' or 'exit'
+    - camera: camera ID (e.g. 'entry' or 'exit')
+    - width: downscale to this width in pixels (0 = full resolution)
+    - quality: JPEG quality 1-100
     """
     try:
-        frame = None
-        if camera == "entry":
-            frame = camera_manager.get_entry_frame()
-        elif camera == "exit":
-            frame = camera_manager.get_exit_frame()
-        else:
-            return JSONResponse(status_code=400, content={"error": "Invalid camera. Use 'entry' or 'exit'"})
+        stream = camera_manager.get_camera(camera)
+        if stream is None:
+            return _unknown_camera(camera)
 
+        frame, sequence, timestamp = stream.get_latest() if stream.is_connected else (None, 0, 0.0)
         if frame is None:
             return JSONResponse(status_code=404, content={"error": "No frame available"})
 
-        # Encode frame as JPEG
-        success, encoded = cv2.imencode('.jpg', frame)
-        if not success:
+        # Encode frame as JPEG (or reuse the cached encode)
+        jpeg = await asyncio.to_thread(jpeg_cache.get, camera, sequence, frame, width, quality)
+        if jpeg is None:
             return JSONResponse(status_code=500, content={"error": "Failed to encode frame"})
 
-        return Response(content=encoded.tobytes(), media_type="image/jpeg")
+        return Response(
+            content=jpeg,
+            media_type="image/jpeg",
+            headers={
+                "X-Frame-Sequence": str(sequence),
+                "X-Frame-Age": f"{time.time() - timestamp:.3f}"
+            }
+        )
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+@router.get("/cameras/stream")
+async def stream_camera(camera: str = Query("entry")):
+    """Live MJPEG (multipart/x-mixed-replace) feed from the requested camera.
+
+    Frames are encoded once at STREAM_FPS / STREAM_WIDTH and shared by all viewers.
+
+    Query params:
+    - camera: camera ID (e.g. 'entry' or 'exit')
+    """
+    stream = camera_manager.get_camera(camera)
+    if stream is None:
+        return _unknown_camera(camera)
+    if not stream.is_connected:
+        return JSONResponse(status_code=404, content={"error": "Camera not connected"})
+
+    async def parts():
+        async for jpeg in get_broadcaster(camera).frames():
+            yield multipart_part(jpeg)
+
+    return StreamingResponse(
+        parts(),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+        headers={"Cache-Control": "no-store"}
+    )
+
+
 @router.post("/cameras/reset")
-async def reset_cameras(entry_index: int = None, exit_index: int = None, restart_services: bool = False):
+async def reset_cameras(
+    entry_index: int = None,
+    exit_index: int = None,
+    camera_id: str = None,
+    index: int = None,
+    restart_services: bool = False
+):
     """Attempt to fix stuck cameras by disconnecting and reconnecting using alternative backends.
 
     Optionally accepts indices to target specific cameras. If none provided, resets configured ones.
     On Windows and if restart_services is True, attempts to restart camera services (best-effort).
     """
     try:
+        indices = _camera_indices(entry_index, exit_index, camera_id, index)
         service_restart = False
         service_error = None
 
@@ -263,7 +500,7 @@ async def reset_cameras(entry_index: int = None, exit_index: int = None, restart
                         pass
                 elif system == "Linux":
                     # Kill processes using /dev/videoX for targeted indices
-                    for idx in set([i for i in [entry_index, exit_index] if i is not None]):
+                    for idx in set(indices.values()):
                         try:
                             dev = f"/dev/video{idx}"
                             subprocess.run(['fuser', '-k', dev], capture_output=True, text=True, timeout=5)
@@ -283,10 +520,12 @@ async def reset_cameras(entry_index: int = None, exit_index: int = None, restart
                 service_error = str(e)
 
         # Now attempt reconnects using multi-backend strategy
-        reset_result = camera_manager.reset_cameras(entry_index=entry_index, exit_index=exit_index)
+        reset_result = await asyncio.to_thread(camera_manager.reset_cameras, indices)
+        camera_discovery.invalidate()
 
         return {
             "success": True,
+            "cameras": reset_result,
             "entry_camera_connected": reset_result.get("entry", False),
             "exit_camera_connected": reset_result.get("exit", False),
             "service_restart_attempted": restart_services,
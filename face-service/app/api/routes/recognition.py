@@ -1,9 +1,13 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Query
 from fastapi.responses import JSONResponse
-import cv2
-import numpy as np
+import asyncio
 
+from app.core.config import settings
 from app.core.face_detector import face_detector
+from app.core.face_gallery import face_gallery
+from app.core.camera_manager import camera_manager
+from app.core.camera_recognizer import get_recognizer
+from app.core.inference_pool import inference_pool, PoolSaturatedError
 
 router = APIRouter()
 
@@ -15,32 +19,30 @@ async def compare_faces(
 ):
     """Compare two face images"""
     try:
-        # Read first image
         contents1 = await file1.read()
-        nparr1 = np.frombuffer(contents1, np.uint8)
-        image1 = cv2.imdecode(nparr1, cv2.IMREAD_COLOR)
-
-        # Read second image
         contents2 = await file2.read()
-        nparr2 = np.frombuffer(contents2, np.uint8)
-        image2 = cv2.imdecode(nparr2, cv2.IMREAD_COLOR)
 
-        if image1 is None or image2 is None:
+        # Decode, detect and encode the first face of each image in parallel
+        faces1, faces2 = await asyncio.gather(
+            inference_pool.run(face_detector.decode_and_encode, contents1, preprocess=False),
+            inference_pool.run(face_detector.decode_and_encode, contents2, preprocess=False)
+        )
+
+        if faces1 is None or faces2 is None:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Invalid image file"}
             )
 
-        # Generate encodings
-        encoding1 = face_detector.encode_face(image1)
-        encoding2 = face_detector.encode_face(image2)
-
-        if encoding1 is None or encoding2 is None:
+        if not faces1 or not faces2:
             return JSONResponse(
                 status_code=400,
                 content={"error": "No face detected in one or both images"}
             )
 
+        encoding1 = faces1[0][1]
+        encoding2 = faces2[0][1]
+
         # Compare faces
         is_match, distance = face_detector.compare_faces(encoding1, encoding2)
 
@@ -50,6 +52,12 @@ async def compare_faces(
             "confidence": max(0, 1 - distance)
         }
 
+    except PoolSaturatedError:
+        return JSONResponse(
+            status_code=settings.INFERENCE_REJECT_STATUS,
+            content={"error": "Face service busy, try again"},
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -58,40 +66,187 @@ async def compare_faces(
 
 
 @router.post("/identify")
-async def identify_face(file: UploadFile = File(...)):
-    """Identify a face against database (TODO: implement database lookup)"""
+async def identify_face(
+    file: UploadFile = File(...),
+    top_k: int = Query(None, ge=1, le=50),
+    n_probe: int = Query(None, ge=1),
+    rerank: bool = Query(None)
+):
+    """Identify a face against the in-memory visitor gallery
+
+    Query params:
+    - top_k: number of candidate visitors to return
+    - n_probe: IVF buckets to scan (higher = better recall, slower)
+    - rerank: exactly rescan all faces of the best candidates
+    """
     try:
         # Read image file
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, np.uint8)
 
-        if image is None:
+        if not face_gallery.is_loaded:
+            return JSONResponse(
+                status_code=503,
+                content={"error": "Face gallery not loaded"}
+            )
+
+        # Decode, preprocess, detect and encode the first face on a worker
+        faces = await inference_pool.run(face_detector.decode_and_encode, contents)
+
+        if faces is None:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Invalid image file"}
             )
 
-        # Generate encoding
-        encoding = face_detector.encode_face(image)
-
-        if encoding is None:
+        if not faces:
             return JSONResponse(
                 status_code=400,
                 content={"error": "No face detected in image"}
             )
 
-        # TODO: Compare with database encodings
-        # This will be implemented when integrating with the backend
+        face_location, encoding = faces[0]
+
+        candidates = await inference_pool.run(
+            face_gallery.search,
+            encoding,
+            top_k=top_k,
+            n_probe=n_probe,
+            rerank=rerank,
+            local=True
+        )
+        best = candidates[0] if candidates else None
+
+        if best is None or not best["is_match"]:
+            return {
+                "identified": False,
+                "visitor": None,
+                "confidence": best["confidence"] if best else 0.0,
+                "candidates": candidates
+            }
+
+        return {
+            "identified": True,
+            "visitor": {
+                "id": best["visitor_id"],
+                "name": best["visitor_name"]
+            },
+            "face_location": face_location,
+            "distance": best["distance"],
+            "confidence": best["confidence"],
+            "candidates": candidates
+        }
+
+    except PoolSaturatedError:
+        return JSONResponse(
+            status_code=settings.INFERENCE_REJECT_STATUS,
+            content={"error": "Face service busy, try again"},
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+def _recognize_latest_frame(recognizer):
+    """Grab the camera's current frame and run it through its recognizer"""
+    camera = camera_manager.get_camera(recognizer.camera_id)
+    if camera is None or not camera.is_connected:
+        return None
+    frame, sequence, captured_at = camera.get_latest()
+    if frame is None:
+        return None
+    return recognizer.process(frame, sequence, captured_at)
+
+
+@router.get("/cameras/recognize")
+async def recognize_camera(camera: str = Query("entry")):
+    """Recognize faces in the latest frame of a camera.
+
+    Faces are tracked between calls, so a person standing in front of the
+    camera is encoded and identified once rather than on every frame.
+
+    Query params:
+    - camera: camera ID (e.g. 'entry' or 'exit')
+    """
+    try:
+        recognizer = get_recognizer(camera)
+        if recognizer is None:
+            return JSONResponse(
+                status_code=404,
+                content={"error": f"Unknown camera '{camera}'", "cameras": camera_manager.camera_ids()}
+            )
+
+        # Trackers and the gallery live in this process, so run on a local thread
+        tracks = await inference_pool.run(_recognize_latest_frame, recognizer, local=True)
+        if tracks is None:
+            return JSONResponse(status_code=404, content={"error": "No frame available"})
+
+        return {
+            "camera": camera,
+            "faces": [track.to_dict() for track in tracks if track.misses == 0],
+            "stats": recognizer.stats()
+        }
+
+    except PoolSaturatedError:
+        return JSONResponse(
+            status_code=settings.INFERENCE_REJECT_STATUS,
+            content={"error": "Face service busy, try again"},
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+@router.get("/gallery/status")
+async def gallery_status():
+    """Get in-memory face gallery statistics"""
+    return face_gallery.stats()
+
 
+@router.post("/gallery/reload")
+async def reload_gallery():
+    """Reload all face embeddings from the database"""
+    try:
+        count = await asyncio.to_thread(face_gallery.load)
         return {
-            "identified": False,
-            "visitor": None,
-            "confidence": 0.0
+            "success": True,
+            "faces_loaded": count
         }
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
 
+
+@router.post("/gallery/visitors/{visitor_id}/sync")
+async def sync_gallery_visitor(visitor_id: str):
+    """Re-read one visitor's faces after enrollment, update or deactivation"""
+    try:
+        count = await asyncio.to_thread(face_gallery.load_visitor, visitor_id)
+        return {
+            "success": True,
+            "visitor_id": visitor_id,
+            "faces_loaded": count
+        }
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
+
+
+@router.delete("/gallery/visitors/{visitor_id}")
+async def remove_gallery_visitor(visitor_id: str):
+    """Remove a visitor's faces from the in-memory gallery"""
+    removed = face_gallery.remove_visitor(visitor_id)
+    return {
+        "success": True,
+        "visitor_id": visitor_id,
+        "faces_removed": removed
+    }
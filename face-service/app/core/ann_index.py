@@ -0,0 +1,251 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+class VectorIndex(ABC):
+    """Candidate selection over the rows of an EmbeddingStore.
+
+    Indexes only decide which rows are worth scoring; the gallery computes
+    the distances itself, so every index returns exact distances for the
+    rows it selects.
+    """
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray, rows: np.ndarray):
+        """Rebuild the index from scratch"""
+        pass
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray, rows: np.ndarray):
+        """Insert rows into the index"""
+        pass
+
+    @abstractmethod
+    def remove(self, rows: np.ndarray):
+        """Delete rows from the index"""
+        pass
+
+    @abstractmethod
+    def candidates(self, query: np.ndarray, n_probe: int = None) -> Optional[np.ndarray]:
+        """Return candidate rows for a query, or None to scan every row"""
+        pass
+
+    @abstractmethod
+    def needs_rebuild(self, size: int) -> bool:
+        """Whether the index should be rebuilt for a store of this size"""
+        pass
+
+    def export_state(self) -> Dict[str, np.ndarray]:
+        """Arrays that let restore_state() skip a rebuild (saved in gallery snapshots)"""
+        return {}
+
+    def restore_state(self, state: Dict[str, np.ndarray]):
+        """Restore what export_state() returned; missing state leaves the index untrained"""
+        pass
+
+    def stats(self) -> dict:
+        return {"type": self.index_type}
+
+
+class FlatIndex(VectorIndex):
+    """Exact brute-force search: every live row is a candidate"""
+
+    index_type = "flat"
+
+    def build(self, vectors: np.ndarray, rows: np.ndarray):
+        pass
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray):
+        pass
+
+    def remove(self, rows: np.ndarray):
+        pass
+
+    def candidates(self, query: np.ndarray, n_probe: int = None) -> Optional[np.ndarray]:
+        return None
+
+    def needs_rebuild(self, size: int) -> bool:
+        return False
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Assign each vector to its nearest centroid (squared euclidean)"""
+    centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        # ||x||^2 is constant per row, so it doesn't affect the argmin
+        scores = centroid_sq[None, :] - 2.0 * (chunk @ centroids.T)
+        assignment[start:start + chunk_size] = np.argmin(scores, axis=1)
+    return assignment
+
+
+def kmeans(vectors: np.ndarray, k: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means, returning a (k, dim) float32 centroid matrix"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].astype(np.float32)
+
+    for _ in range(n_iter):
+        assignment = _nearest_centroids(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+
+        sums = np.empty_like(centroids)
+        for dim in range(vectors.shape[1]):
+            sums[:, dim] = np.bincount(assignment, weights=vectors[:, dim], minlength=k)
+
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+        # Re-seed empty clusters from random points so every list gets used
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+    return centroids
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: k-means buckets, only n_probe buckets are scanned.
+
+    Below GALLERY_IVF_MIN_SIZE rows the index stays untrained and every row
+    is a candidate, so small galleries keep exact results.
+    """
+
+    index_type = "ivf"
+
+    def __init__(self, n_list: int = None, n_probe: int = None, min_size: int = None):
+        self.n_list = settings.GALLERY_IVF_NLIST if n_list is None else n_list
+        self.n_probe = settings.GALLERY_IVF_NPROBE if n_probe is None else n_probe
+        self.min_size = settings.GALLERY_IVF_MIN_SIZE if min_size is None else min_size
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+        self._row_list = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _target_lists(self, size: int) -> int:
+        if self.n_list > 0:
+            return self.n_list
+        return max(1, int(4 * np.sqrt(size)))
+
+    def build(self, vectors: np.ndarray, rows: np.ndarray):
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []
+        self._list_arrays = []
+        self._row_list = {}
+
+        if len(rows) < max(self.min_size, 1):
+            return
+
+        n_list = self._target_lists(len(rows))
+        # Train on a sample; ~64 points per centroid is plenty for k-means
+        sample_size = min(len(rows), n_list * 64)
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(rows), sample_size, replace=False)]
+
+        self.centroids = kmeans(sample, n_list)
+        self.trained_size = len(rows)
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._list_arrays = [None] * len(self.centroids)
+        self._assign(vectors, rows)
+
+    def _assign(self, vectors: np.ndarray, rows: np.ndarray):
+        assignment = _nearest_centroids(vectors, self.centroids)
+        for row, list_id in zip(rows.tolist(), assignment.tolist()):
+            self._lists[list_id].append(row)
+            self._list_arrays[list_id] = None
+            self._row_list[row] = list_id
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray):
+        if self.is_trained and len(rows):
+            self._assign(vectors, rows)
+
+    def remove(self, rows: np.ndarray):
+        if not self.is_trained:
+            return
+        for row in rows.tolist():
+            list_id = self._row_list.pop(row, None)
+            if list_id is not None:
+                self._lists[list_id].remove(row)
+                self._list_arrays[list_id] = None
+
+    def _list_array(self, list_id: int) -> np.ndarray:
+        array = self._list_arrays[list_id]
+        if array is None:
+            array = np.array(self._lists[list_id], dtype=np.int64)
+            self._list_arrays[list_id] = array
+        return array
+
+    def candidates(self, query: np.ndarray, n_probe: int = None) -> Optional[np.ndarray]:
+        if not self.is_trained:
+            return None
+
+        if n_probe is None:
+            n_probe = self.n_probe
+        n_probe = max(1, min(n_probe, len(self.centroids)))
+        if n_probe >= len(self.centroids):
+            return None
+
+        scores = np.einsum("ij,ij->i", self.centroids, self.centroids) - 2.0 * (self.centroids @ query)
+        probed = np.argpartition(scores, n_probe - 1)[:n_probe]
+
+        arrays = [self._list_array(list_id) for list_id in probed.tolist()]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def export_state(self) -> Dict[str, np.ndarray]:
+        if not self.is_trained:
+            return {}
+        return {
+            "centroids": self.centroids,
+            "rows": np.fromiter(self._row_list.keys(), dtype=np.int64, count=len(self._row_list)),
+            "lists": np.fromiter(self._row_list.values(), dtype=np.int64, count=len(self._row_list)),
+            "trained_size": np.array([self.trained_size], dtype=np.int64)
+        }
+
+    def restore_state(self, state: Dict[str, np.ndarray]):
+        if "centroids" not in state:
+            return
+        self.centroids = np.asarray(state["centroids"], dtype=np.float32)
+        self.trained_size = int(state["trained_size"][0])
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._list_arrays = [None] * len(self.centroids)
+        rows, lists = state["rows"].tolist(), state["lists"].tolist()
+        for row, list_id in zip(rows, lists):
+            self._lists[list_id].append(row)
+        self._row_list = dict(zip(rows, lists))
+
+    def needs_rebuild(self, size: int) -> bool:
+        if not self.is_trained:
+            return size >= max(self.min_size, 1)
+        # Retrain once the gallery has doubled (or halved) since training
+        return size > 2 * self.trained_size or size < self.trained_size // 2
+
+    def stats(self) -> dict:
+        sizes = [len(rows) for rows in self._lists]
+        return {
+            "type": self.index_type,
+            "trained": self.is_trained,
+            "n_list": len(sizes),
+            "n_probe": self.n_probe,
+            "trained_size": self.trained_size,
+            "max_list_size": max(sizes) if sizes else 0
+        }
+
+
+def get_vector_index(index_type: str = None) -> VectorIndex:
+    """Factory function to get the configured gallery index"""
+    index_type = (index_type or settings.GALLERY_INDEX_TYPE).lower()
+
+    if index_type == "ivf":
+        return IVFIndex()
+    else:  # flat or any other value
+        return FlatIndex()
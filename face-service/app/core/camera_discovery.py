@@ -0,0 +1,312 @@
+import glob
+import logging
+import os
+import platform
+import re
+import struct
+import subprocess
+import threading
+import time
+import cv2
+from collections import deque
+from queue import Empty, Queue
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.camera_manager import camera_manager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# struct v4l2_capability: driver[16] card[32] bus_info[32] version capabilities device_caps reserved[3]
+V4L2_CAPABILITY = struct.Struct("<16s32s32sIII12x")
+VIDIOC_QUERYCAP = (2 << 30) | (V4L2_CAPABILITY.size << 16) | (ord('V') << 8) | 0
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+
+
+def get_camera_names_windows() -> List[str]:
+    """Get camera names on Windows using PowerShell"""
+    try:
+        # Use PowerShell to get camera names - use list to avoid shell escaping issues
+        cmd = ['powershell', '-Command', 'Get-PnpDevice -Class Camera | Select-Object -ExpandProperty FriendlyName']
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+
+        if result.returncode == 0:
+            # Parse the output - each line is a camera name
+            names = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
+            return names
+        return []
+    except Exception as e:
+        logger.warning("Error getting camera names: %s", e)
+        return []
+
+
+def _read_sysfs(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _query_capture_capability(device: str) -> Optional[bool]:
+    """
+    Ask the V4L2 driver whether a node can capture video (VIDIOC_QUERYCAP).
+    Opening the node for an ioctl does not start a stream. Returns None if
+    the driver could not be queried.
+    """
+    if fcntl is None:
+        return None
+    try:
+        fd = os.open(device, os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return None
+    try:
+        buffer = bytearray(V4L2_CAPABILITY.size)
+        fcntl.ioctl(fd, VIDIOC_QUERYCAP, buffer)
+        _, _, _, _, capabilities, device_caps = V4L2_CAPABILITY.unpack(buffer)
+        caps = device_caps if capabilities & V4L2_CAP_DEVICE_CAPS else capabilities
+        return bool(caps & V4L2_CAP_VIDEO_CAPTURE)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+
+def _probe_backends() -> List[int]:
+    system = platform.system()
+    if system == "Windows":
+        return [getattr(cv2, 'CAP_DSHOW', 700), getattr(cv2, 'CAP_MSMF', 1400)]
+    if system == "Linux":
+        return [getattr(cv2, 'CAP_V4L2', 200)]
+    if system == "Darwin":
+        return [getattr(cv2, 'CAP_AVFOUNDATION', 1200)]
+    return [getattr(cv2, 'CAP_ANY', 0)]
+
+
+def _probe(index: int) -> bool:
+    """Open and release a camera index to confirm it is usable"""
+    for backend in _probe_backends():
+        try:
+            cap = cv2.VideoCapture(index, backend)
+            is_open = cap.isOpened()
+            cap.release()
+            if is_open:
+                return True
+        except Exception:
+            pass
+    return False
+
+
+class CameraDiscovery:
+    """Cached camera enumeration for /cameras/list.
+
+    On Linux, /dev/video* nodes are enumerated and classified from sysfs
+    and V4L2 capabilities without opening a stream; metadata-only nodes
+    are skipped. Elsewhere (or when the driver cannot be queried),
+    candidate indices are probed in parallel, each with its own timeout.
+    Cameras already opened by camera_manager are reported, never reopened.
+
+    Enumeration runs outside the cache lock, one at a time: concurrent
+    callers wait for the enumeration in progress rather than start another.
+    Probes run in daemon threads that are abandoned when they time out; a
+    probe holds one of CAMERA_DISCOVERY_WORKERS slots until its driver call
+    actually returns, so hung drivers can't pile up threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cameras: List[Dict] = []
+        self._discovered_at = 0.0
+        self._generation = 0  # Bumped by invalidate(); an enumeration that spans it isn't cached
+        self._enumeration: Optional[threading.Event] = None  # Set when the one in progress finishes
+        self._probe_slots = threading.BoundedSemaphore(max(1, settings.CAMERA_DISCOVERY_WORKERS))
+        self._probes_lock = threading.Lock()
+        self._probing: Set[int] = set()  # Indices with a probe running, abandoned ones included
+        self.probes_timed_out = 0
+        self.probes_skipped = 0  # Not run: every slot was held by a hung probe
+
+    def discover(self, refresh: bool = False) -> Dict:
+        """Return cached cameras, re-enumerating when stale or refresh is set"""
+        with self._lock:
+            age = time.time() - self._discovered_at
+            cached = not refresh and self._discovered_at and age < settings.CAMERA_DISCOVERY_TTL
+            if cached:
+                return self._result(cached=True, age=age)
+            enumeration = self._enumeration
+            if enumeration is None:
+                enumeration = self._enumeration = threading.Event()
+                generation = self._generation
+                leader = True
+            else:
+                leader = False
+
+        if leader:
+            try:
+                cameras = self._enumerate()
+                with self._lock:
+                    self._cameras = cameras
+                    # Invalidated meanwhile (e.g. a camera was connected): serve it, but don't cache it
+                    self._discovered_at = time.time() if self._generation == generation else 0.0
+            finally:
+                with self._lock:
+                    self._enumeration = None
+                enumeration.set()
+        else:
+            enumeration.wait()
+
+        with self._lock:
+            return self._result(cached=False, age=0.0)
+
+    def _result(self, cached: bool, age: float) -> Dict:
+        return {
+            "cameras": self._cameras,
+            "count": len(self._cameras),
+            "cached": cached,
+            "age": age
+        }
+
+    def invalidate(self):
+        with self._lock:
+            self._discovered_at = 0.0
+            self._generation += 1
+
+    def _open_indices(self) -> Dict[int, str]:
+        """Webcam indices currently held by camera_manager, by camera ID"""
+        in_use = {}
+        for camera_id, stream in list(camera_manager.cameras.items()):
+            if stream.camera_type == "webcam" and stream.is_connected:
+                in_use[stream.camera_index] = camera_id
+        return in_use
+
+    def _enumerate(self) -> List[Dict]:
+        in_use = self._open_indices()
+        if platform.system() == "Linux" and glob.glob("/dev/video*"):
+            candidates, unverified = self._linux_candidates()
+        else:
+            candidates, unverified = self._index_candidates()
+
+        cameras = []
+        to_probe = []
+        for index, name in sorted(candidates.items()):
+            if index in in_use:
+                cameras.append(self._entry(index, name, in_use=in_use[index]))
+            elif index in unverified:
+                to_probe.append(index)
+            else:
+                cameras.append(self._entry(index, name))
+
+        for index in self._probe_all(to_probe):
+            cameras.append(self._entry(index, candidates[index]))
+
+        cameras.sort(key=lambda camera: camera["index"])
+        return cameras
+
+    def _run_probe(self, index: int, results: Queue):
+        try:
+            usable = _probe(index)
+        except Exception:
+            usable = False
+        finally:
+            with self._probes_lock:
+                self._probing.discard(index)
+            self._probe_slots.release()
+        results.put((index, usable))
+
+    def _probe_all(self, indices: List[int]) -> List[int]:
+        """
+        The usable indices among these. Each probe gets CAMERA_DISCOVERY_PROBE_TIMEOUT
+        from its start and is abandoned (left to finish in the background) after that.
+        """
+        timeout = settings.CAMERA_DISCOVERY_PROBE_TIMEOUT
+        with self._probes_lock:
+            # A device whose last probe is still stuck in its driver isn't opened again
+            pending = deque(index for index in indices if index not in self._probing)
+        running: Dict[int, float] = {}  # index -> deadline
+        results: Queue = Queue()
+        usable = []
+
+        while pending or running:
+            while pending and self._probe_slots.acquire(blocking=False):
+                index = pending.popleft()
+                with self._probes_lock:
+                    self._probing.add(index)
+                running[index] = time.monotonic() + timeout
+                threading.Thread(
+                    target=self._run_probe, args=(index, results), name=f"camera-probe-{index}", daemon=True
+                ).start()
+            if not running:
+                # Every slot is held by a probe abandoned earlier whose driver call never returned
+                logger.warning("Camera probes still hung; not probing indices %s", list(pending))
+                self.probes_skipped += len(pending)
+                break
+
+            try:
+                index, found = results.get(timeout=max(0.0, min(running.values()) - time.monotonic()))
+                if running.pop(index, None) is not None and found:
+                    usable.append(index)
+            except Empty:
+                pass
+            now = time.monotonic()
+            for index, deadline in list(running.items()):
+                if deadline <= now:
+                    # A hung driver keeps its thread (and slot), but no longer blocks the listing
+                    logger.warning("Camera probe for index %d timed out", index)
+                    self.probes_timed_out += 1
+                    del running[index]
+        return usable
+
+    @property
+    def probes_running(self) -> int:
+        """Including abandoned probes whose driver call hasn't returned"""
+        with self._probes_lock:
+            return len(self._probing)
+
+    def _entry(self, index: int, name: str, in_use: Optional[str] = None) -> Dict:
+        return {
+            "index": index,
+            "name": name,
+            "type": "webcam",
+            "available": True,
+            "in_use": in_use
+        }
+
+    def _linux_candidates(self):
+        candidates = {}
+        unverified = set()
+        for device in glob.glob("/dev/video*"):
+            match = re.fullmatch(r"/dev/video(\d+)", device)
+            if not match:
+                continue
+            index = int(match.group(1))
+            sysfs = f"/sys/class/video4linux/video{index}"
+
+            can_capture = _query_capture_capability(device)
+            if can_capture is False:
+                continue  # Metadata / output node
+            if can_capture is None:
+                # Driver not queryable; UVC metadata nodes have a non-zero sysfs index
+                if (_read_sysfs(f"{sysfs}/index") or "0") != "0":
+                    continue
+                unverified.add(index)
+
+            candidates[index] = _read_sysfs(f"{sysfs}/name") or f"Camera {index}"
+        return candidates, unverified
+
+    def _index_candidates(self):
+        names = get_camera_names_windows() if platform.system() == "Windows" else []
+        count = len(names) if names else settings.CAMERA_DISCOVERY_MAX_INDEX
+        candidates = {
+            index: names[index] if index < len(names) else f"Camera {index}"
+            for index in range(count)
+        }
+        return candidates, set(candidates)
+
+
+# Singleton instance
+camera_discovery = CameraDiscovery()
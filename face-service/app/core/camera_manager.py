@@ -1,28 +1,200 @@
 import cv2
+import logging
 import numpy as np
+import os
 import platform
-from typing import Optional, List
-from app.core.config import settings
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, List, Tuple
+from app.core.config import settings, CameraConfig
+from app.core.frame_bus import FrameRing
+from app.core.file_capture import FileCapture
+
+logger = logging.getLogger(__name__)
+
+
+# OpenCV reads FFmpeg capture options from this process-wide variable when a
+# stream is opened, so setting it and opening must happen together.
+FFMPEG_OPTIONS_ENV = "OPENCV_FFMPEG_CAPTURE_OPTIONS"
+_ffmpeg_options_lock = threading.Lock()
 
 
 class CameraStream:
-    def __init__(self, camera_type: str, rtsp_url: str = "", camera_index: int = 0):
+    """A camera device plus a capture thread that keeps only the newest frame.
+
+    The capture thread continuously drains the device (so RTSP/driver
+    buffers never hold stale frames) and publishes the latest frame with
+    a sequence number and timestamp; readers never block on the device.
+    """
+
+    def __init__(
+        self,
+        camera_type: str,
+        rtsp_url: str = "",
+        camera_index: int = 0,
+        detection_scale: Optional[float] = None,
+        min_face_size: Optional[int] = None,
+        camera_id: str = "",
+        name: str = "",
+        gate_id: str = "",
+        direction: str = "entry",
+        substream_url: str = "",
+        transport: str = "",
+        file_path: str = "",
+        playback: str = "realtime",
+        loop: bool = True,
+        fps: float = 0.0,
+        recognition_fps: Optional[float] = None,
+        cpu_budget: Optional[float] = None
+    ):
         self.camera_type = camera_type
         self.rtsp_url = rtsp_url
         self.camera_index = camera_index
+        self.camera_id = camera_id
+        self.name = name or camera_id
+        self.gate_id = gate_id
+        self.direction = direction
+        # RTSP: optional low-resolution sub-stream used for capture, and transport (tcp/udp)
+        self.substream_url = substream_url
+        self.transport = transport or settings.RTSP_TRANSPORT
+        self.active_url = ""
+        # File replay: video or image directory, paced in real time or as fast as consumed
+        self.file_path = file_path
+        self.playback = playback
+        self.loop = loop
+        self.fps = fps
+        # Per-camera face detection scale (None = use global settings)
+        self.detection_scale = detection_scale
+        self.min_face_size = min_face_size
+        # Per-camera recognition loop rate and CPU budget (None = use global settings)
+        self.recognition_fps = recognition_fps
+        self.cpu_budget = cpu_budget
         self.cap: Optional[cv2.VideoCapture] = None
         self.is_connected = False
+        # Shared-memory ring frames are also published to (FRAME_BUS_ENABLED)
+        self.ring: Optional[FrameRing] = None
+        self._connect_lock = threading.Lock()
+        self._closed = False
+
+        # Latest-frame buffer, written by the capture thread
+        self._frame_lock = threading.Lock()
+        self._consumed = threading.Event()
+        self._frame: Optional[np.ndarray] = None
+        self._frame_time = 0.0
+        self._sequence = 0
+        self._last_read_sequence = 0
+        self._capture_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        # Capture counters
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+
+        # Health, maintained by the capture thread and the watchdog
+        self._connected_at = 0.0
+        self._frame_signature = None
+        self._changed_at = 0.0
+        self.state = "disconnected"
+        self.reconnects = 0
+        self.reconnect_failures = 0
+        self.next_attempt_at = 0.0
+        self._backoff = 0.0
+        self._down_since: Optional[float] = time.time()
+        self._downtime = 0.0
+
+    @classmethod
+    def from_config(cls, config: CameraConfig) -> "CameraStream":
+        return cls(
+            camera_type=config.type,
+            rtsp_url=config.rtsp_url,
+            camera_index=config.index,
+            detection_scale=config.detection_scale,
+            min_face_size=config.min_face_size,
+            camera_id=config.id,
+            name=config.name,
+            gate_id=config.gate_id,
+            direction=config.direction,
+            substream_url=config.substream_url,
+            transport=config.transport,
+            file_path=config.path,
+            playback=config.playback,
+            loop=config.loop,
+            fps=config.fps,
+            recognition_fps=config.recognition_fps,
+            cpu_budget=config.cpu_budget
+        )
+
+    def with_index(self, camera_index: int) -> "CameraStream":
+        """A new (unconnected) webcam stream at camera_index with this camera's identity"""
+        return CameraStream(
+            camera_type="webcam",
+            camera_index=camera_index,
+            detection_scale=self.detection_scale,
+            min_face_size=self.min_face_size,
+            camera_id=self.camera_id,
+            name=self.name,
+            gate_id=self.gate_id,
+            direction=self.direction,
+            recognition_fps=self.recognition_fps,
+            cpu_budget=self.cpu_budget
+        )
+
+    def describe(self) -> dict:
+        return {
+            "id": self.camera_id,
+            "name": self.name,
+            "type": self.camera_type,
+            "index": self.camera_index if self.camera_type == "webcam" else None,
+            "path": self.file_path if self.camera_type == "file" else None,
+            "gate_id": self.gate_id,
+            "direction": self.direction,
+            "connected": self.is_connected
+        }
 
     def connect(self) -> bool:
-        """Connect to camera stream"""
+        """Connect to camera stream and start the capture thread"""
+        with self._connect_lock:
+            return self._connect()
+
+    def _connect(self) -> bool:
+        if self._closed or not self._open():
+            return False
+        if settings.FRAME_BUS_ENABLED and self.ring is None:
+            try:
+                self.ring = FrameRing.create(self.camera_id or str(self.camera_index))
+            except Exception as e:
+                logger.warning("Frame bus unavailable for camera '%s': %s", self.camera_id, e)
+        self._mark_up()
+        self._start_capture()
+        return True
+
+    def _open(self) -> bool:
+        """Open the capture device"""
         try:
             if self.camera_type == "rtsp" and self.rtsp_url:
-                self.cap = cv2.VideoCapture(self.rtsp_url)
-                if self.cap.isOpened():
-                    self.is_connected = True
-                    return True
+                # Prefer the sub-stream (less to decode); fall back to the main stream
+                for url in filter(None, [self.substream_url, self.rtsp_url]):
+                    cap = self._open_rtsp(url)
+                    if cap.isOpened():
+                        self.cap = cap
+                        self.active_url = url
+                        self.is_connected = True
+                        return True
+                    cap.release()
                 return False
 
+            if self.camera_type == "file":
+                cap = FileCapture(self.file_path, playback=self.playback, loop=self.loop, fps=self.fps)
+                if not cap.isOpened():
+                    logger.error("Camera '%s': cannot open file source %s", self.camera_id, self.file_path)
+                    cap.release()
+                    return False
+                self.cap = cap
+                self.is_connected = True
+                return True
+
             # Try multiple backends for webcams (helps when one backend gets stuck)
             backends: List[int] = []
             system = platform.system()
@@ -57,147 +229,416 @@ class CameraStream:
                     pass
             return False
         except Exception as e:
-            print(f"Error connecting to camera: {e}")
+            logger.error("Error connecting to camera: %s", e)
             return False
 
+    def _open_rtsp(self, url: str) -> cv2.VideoCapture:
+        """Open an RTSP stream through FFmpeg with the configured transport and minimal buffering"""
+        options = [f"rtsp_transport;{self.transport}"]
+        if settings.RTSP_LOW_LATENCY:
+            options += ["fflags;nobuffer", "flags;low_delay", "max_delay;0"]
+
+        params = []
+        if hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+            params = [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, settings.RTSP_OPEN_TIMEOUT_MS,
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, settings.RTSP_READ_TIMEOUT_MS
+            ]
+
+        with _ffmpeg_options_lock:
+            os.environ[FFMPEG_OPTIONS_ENV] = "|".join(options)
+            if params:
+                cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+            else:
+                cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, settings.RTSP_BUFFER_SIZE)
+        return cap
+
+    def _start_capture(self):
+        # Each capture thread gets its own stop event: a thread stuck in a
+        # blocking read must not be revived by the next connect()
+        self._stop_event = threading.Event()
+        self._capture_thread = threading.Thread(
+            target=self._capture_loop,
+            args=(self.cap, self._stop_event),
+            name=f"capture-{self.camera_id or self.camera_index}",
+            daemon=True
+        )
+        self._capture_thread.start()
+
+    @property
+    def lockstep(self) -> bool:
+        """Fast file replay hands out every frame: the next is read only once the last was consumed"""
+        return self.camera_type == "file" and self.playback == "fast"
+
+    def _capture_loop(self, cap: cv2.VideoCapture, stop_event: threading.Event):
+        """Drain the device continuously, keeping only the newest frame"""
+        self._consumed.set()
+        try:
+            while not stop_event.is_set():
+                if self.lockstep:
+                    while not self._consumed.wait(0.1):
+                        if stop_event.is_set():
+                            return
+                    self._consumed.clear()
+
+                ret, frame = cap.read()
+                if stop_event.is_set():
+                    break
+                if not ret and getattr(cap, "finished", False):
+                    self.state = "finished"
+                    break
+                if not ret:
+                    self.read_failures += 1
+                    # Avoid spinning on a device that stopped delivering frames
+                    stop_event.wait(0.05)
+                    continue
+
+                now = time.time()
+                # Sparse thumbnail to spot a frozen stream repeating the same image;
+                # differences up to CAMERA_FROZEN_TOLERANCE still count as the same image
+                thumbnail = frame[::32, ::32].astype(np.int16)
+                previous = self._frame_signature
+                if (
+                    previous is None
+                    or previous.shape != thumbnail.shape
+                    or np.abs(thumbnail - previous).mean() > settings.CAMERA_FROZEN_TOLERANCE
+                ):
+                    self._frame_signature = thumbnail
+                    self._changed_at = now
+
+                with self._frame_lock:
+                    if self._sequence > self._last_read_sequence:
+                        # The previous frame was replaced before anyone read it
+                        self.frames_dropped += 1
+                    self._frame = frame
+                    self._frame_time = now
+                    self._sequence += 1
+                    self.frames_captured += 1
+                    sequence = self._sequence
+
+                if self.ring is not None:
+                    self.ring.write(frame, sequence, now)
+        finally:
+            # The capture thread owns its device; release it even if
+            # disconnect() gave up waiting for a blocked read
+            cap.release()
+
     def disconnect(self):
-        """Disconnect from camera stream"""
-        if self.cap:
+        """Stop the capture thread and disconnect from camera stream"""
+        with self._connect_lock:
+            self._disconnect()
+
+    def _disconnect(self):
+        self._stop_event.set()
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=2.0)
+            self._capture_thread = None
+        elif self.cap:
             self.cap.release()
-            self.is_connected = False
+        self.cap = None
+        self.is_connected = False
+        self._mark_down("disconnected")
+        with self._frame_lock:
+            self._frame = None
+
+    def close(self):
+        """Disconnect for good (camera removed or replaced); the watchdog won't revive it"""
+        self._closed = True
+        self.disconnect()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def get_latest(self) -> Tuple[Optional[np.ndarray], int, float]:
+        """
+        Get the newest captured frame without blocking.
+        Returns (frame, sequence, timestamp); frame is None when nothing fresh
+        is available. The frame is shared with other readers: do not modify it.
+        """
+        with self._frame_lock:
+            frame, sequence, timestamp = self._frame, self._sequence, self._frame_time
+            if frame is not None:
+                self._last_read_sequence = sequence
+                self._consumed.set()
+
+        if frame is None or time.time() - timestamp > settings.CAMERA_STALE_FRAME_SECONDS:
+            return None, sequence, timestamp
+        return frame, sequence, timestamp
 
     def get_frame(self) -> Optional[np.ndarray]:
-        """Get current frame from camera"""
-        if not self.is_connected or not self.cap:
+        """Get current frame from camera (the newest captured one, without blocking)"""
+        if not self.is_connected:
             return None
+        return self.get_latest()[0]
 
-        ret, frame = self.cap.read()
-        if ret:
-            return frame
-        return None
+    def _mark_up(self):
+        now = time.time()
+        self._connected_at = now
+        self._changed_at = now
+        self._frame_signature = None
+        self.state = "streaming"
+        if self._down_since is not None:
+            self._downtime += now - self._down_since
+            self._down_since = None
+
+    def _mark_down(self, state: str, since: Optional[float] = None):
+        self.state = state
+        if self._down_since is None:
+            self._down_since = since or time.time()
+
+    def check_health(self) -> str:
+        """Classify the stream as streaming, stalled (no frames) or frozen (same frame repeating)"""
+        if self._closed:
+            return "closed"
+        if not self.is_connected or self.state == "finished":
+            return self.state
+        if self.camera_type == "file":
+            # Replays pause by design (lockstep, end of file); only a failed open is unhealthy
+            return self.state
+
+        now = time.time()
+        last_frame = max(self._frame_time, self._connected_at)
+        if now - last_frame > settings.CAMERA_STALL_SECONDS:
+            self._mark_down("stalled", since=last_frame)
+        elif settings.CAMERA_FROZEN_SECONDS > 0 and now - self._changed_at > settings.CAMERA_FROZEN_SECONDS:
+            self._mark_down("frozen", since=self._changed_at)
+        else:
+            self.state = "streaming"
+            # Only a stream that stayed healthy past the detection windows resets the backoff
+            if now - self._connected_at > settings.CAMERA_STALL_SECONDS + settings.CAMERA_FROZEN_SECONDS:
+                self._backoff = 0.0
+        return self.state
+
+    def try_reconnect(self) -> Optional[bool]:
+        """
+        Reconnect unless another reconnect is in progress or the backoff
+        delay hasn't elapsed. Returns None if skipped, else the result.
+        """
+        if self._closed or time.time() < self.next_attempt_at:
+            return None
+        if not self._connect_lock.acquire(blocking=False):
+            return None
+        try:
+            self._disconnect()
+            self._mark_down("reconnecting")
+            connected = self._connect()
+            if connected:
+                self.reconnects += 1
+            else:
+                self.reconnect_failures += 1
+                self.state = "down"
+
+            # Back off even after a successful open, so a source that
+            # connects but keeps stalling isn't hammered
+            self._backoff = min(
+                max(self._backoff * 2, settings.CAMERA_RECONNECT_DELAY),
+                settings.CAMERA_RECONNECT_MAX_DELAY
+            )
+            self.next_attempt_at = time.time() + self._backoff
+            return connected
+        finally:
+            self._connect_lock.release()
+
+    def stats(self) -> dict:
+        with self._frame_lock:
+            frame_time = self._frame_time
+            sequence = self._sequence
+        now = time.time()
+        current_downtime = now - self._down_since if self._down_since is not None else 0.0
+        return {
+            "connected": self.is_connected,
+            "state": self.state,
+            "capturing": self._capture_thread is not None and self._capture_thread.is_alive(),
+            "source": ("substream" if self.active_url == self.substream_url else "main") if self.active_url else None,
+            "transport": self.transport if self.camera_type == "rtsp" else None,
+            "sequence": sequence,
+            "frame_age": now - frame_time if frame_time else None,
+            "frames_captured": self.frames_captured,
+            "frames_dropped": self.frames_dropped,
+            "read_failures": self.read_failures,
+            "reconnects": self.reconnects,
+            "reconnect_failures": self.reconnect_failures,
+            "next_reconnect_in": max(0.0, self.next_attempt_at - now) if self.state == "down" else None,
+            "downtime_seconds": self._downtime + current_downtime,
+            "current_downtime_seconds": current_downtime,
+            "frame_bus": self.ring.stats() if self.ring is not None else None,
+            "replay": self._replay_stats()
+        }
+
+    def _replay_stats(self) -> Optional[dict]:
+        cap = self.cap
+        if not isinstance(cap, FileCapture):
+            return None
+        return {
+            "playback": self.playback,
+            "fps": cap.fps,
+            "frames_read": cap.frames_read,
+            "loops": cap.loops,
+            "finished": cap.finished
+        }
 
     def reconnect(self) -> bool:
         """Reconnect to camera"""
-        self.disconnect()
-        return self.connect()
+        with self._connect_lock:
+            self._disconnect()
+            self.next_attempt_at = 0.0
+            return self._connect()
 
 
 class CameraManager:
+    """Registry of camera streams keyed by camera ID (see settings.CAMERAS).
+
+    Each camera owns its capture thread; recognition pipelines, streams and
+    endpoints look cameras up by ID, so adding a lane is configuration only.
+    """
+
     def __init__(self):
-        self.entry_camera: Optional[CameraStream] = None
-        self.exit_camera: Optional[CameraStream] = None
+        self.cameras: Dict[str, CameraStream] = {}
+        self._lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+        self._reconnecting = set()
 
     def initialize(self):
         """Initialize camera streams"""
-        # Entry camera
-        self.entry_camera = CameraStream(
-            camera_type=settings.ENTRY_CAMERA_TYPE,
-            rtsp_url=settings.ENTRY_CAMERA_RTSP,
-            camera_index=settings.ENTRY_CAMERA_INDEX
-        )
+        streams = {}
+        for config in settings.camera_configs():
+            if config.id in streams:
+                logger.warning("Duplicate camera id '%s' in CAMERAS, ignoring", config.id)
+                continue
+            streams[config.id] = CameraStream.from_config(config)
 
-        # Exit camera
-        self.exit_camera = CameraStream(
-            camera_type=settings.EXIT_CAMERA_TYPE,
-            rtsp_url=settings.EXIT_CAMERA_RTSP,
-            camera_index=settings.EXIT_CAMERA_INDEX
-        )
+        with self._lock:
+            self.cameras = streams
+        result = self._connect_all(list(streams.values()))
 
-        # Connect cameras
-        entry_connected = self.entry_camera.connect()
-        exit_connected = self.exit_camera.connect()
+        if settings.CAMERA_WATCHDOG_ENABLED and self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watchdog_loop, name="camera-watchdog", daemon=True)
+            self._watchdog.start()
+        return result
 
-        return {
-            "entry": entry_connected,
-            "exit": exit_connected
-        }
+    def _watchdog_loop(self):
+        """Detect stalled, frozen or failed streams and reconnect them with exponential backoff"""
+        while not self._watchdog_stop.wait(settings.CAMERA_WATCHDOG_INTERVAL):
+            for stream in list(self.cameras.values()):
+                state = stream.check_health()
+                if state not in ("stalled", "frozen", "down", "disconnected"):
+                    continue
+                if stream in self._reconnecting or time.time() < stream.next_attempt_at:
+                    continue
 
-    def get_entry_frame(self) -> Optional[np.ndarray]:
-        """Get frame from entry camera"""
-        if self.entry_camera:
-            return self.entry_camera.get_frame()
-        return None
+                # Reconnect on its own thread so a slow source never delays the others
+                self._reconnecting.add(stream)
+                threading.Thread(
+                    target=self._watchdog_reconnect,
+                    args=(stream, state),
+                    name=f"reconnect-{stream.camera_id}",
+                    daemon=True
+                ).start()
 
-    def get_exit_frame(self) -> Optional[np.ndarray]:
-        """Get frame from exit camera"""
-        if self.exit_camera:
-            return self.exit_camera.get_frame()
-        return None
-
-    def update_cameras(self, entry_index: int = None, exit_index: int = None) -> bool:
-        """Update camera configuration with new indices"""
+    def _watchdog_reconnect(self, stream: CameraStream, state: str):
         try:
-            success = True
+            result = stream.try_reconnect()
+            if result is True:
+                logger.info("Camera '%s' reconnected after being %s", stream.camera_id, state)
+            elif result is False:
+                logger.warning(
+                    "Camera '%s' reconnect failed, retrying in %.0fs", stream.camera_id, stream.next_attempt_at - time.time()
+                )
+        except Exception as e:
+            logger.error("Error reconnecting camera '%s': %s", stream.camera_id, e)
+        finally:
+            self._reconnecting.discard(stream)
 
-            # Update entry camera if index provided
-            if entry_index is not None:
-                if self.entry_camera:
-                    self.entry_camera.disconnect()
+    def _connect_all(self, streams: List[CameraStream]) -> Dict[str, bool]:
+        """Connect (or reconnect) streams in parallel so one slow source doesn't delay the rest"""
+        if not streams:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+            results = list(executor.map(lambda stream: stream.reconnect(), streams))
+        return {stream.camera_id: result for stream, result in zip(streams, results)}
 
-                self.entry_camera = CameraStream(
-                    camera_type="webcam",
-                    camera_index=entry_index
-                )
-                entry_connected = self.entry_camera.connect()
-                if not entry_connected:
-                    success = False
-                    print(f"Failed to connect to entry camera at index {entry_index}")
-
-            # Update exit camera if index provided
-            if exit_index is not None:
-                if self.exit_camera:
-                    self.exit_camera.disconnect()
-
-                self.exit_camera = CameraStream(
-                    camera_type="webcam",
-                    camera_index=exit_index
-                )
-                exit_connected = self.exit_camera.connect()
-                if not exit_connected:
-                    success = False
-                    print(f"Failed to connect to exit camera at index {exit_index}")
+    def get_camera(self, camera_id: str) -> Optional[CameraStream]:
+        """Get a camera stream by ID"""
+        return self.cameras.get(camera_id)
+
+    def camera_ids(self) -> List[str]:
+        return list(self.cameras)
+
+    def describe(self) -> List[dict]:
+        """Identity and connection state of every configured camera"""
+        return [stream.describe() for stream in self.cameras.values()]
 
-            return success
+    def get_frame(self, camera_id: str) -> Optional[np.ndarray]:
+        """Get the latest frame from a camera"""
+        stream = self.get_camera(camera_id)
+        if stream:
+            return stream.get_frame()
+        return None
+
+    def _replace(self, camera_id: str, camera_index: int) -> Optional[CameraStream]:
+        """Swap a camera for a webcam at a new device index, keeping its ID, gate and direction"""
+        with self._lock:
+            current = self.cameras.get(camera_id)
+            if current is None:
+                logger.warning("Unknown camera id '%s'", camera_id)
+                return None
+            current.close()
+            stream = current.with_index(camera_index)
+            self.cameras = {**self.cameras, camera_id: stream}
+            return stream
+
+    def update_cameras(self, indices: Dict[str, int]) -> Dict[str, bool]:
+        """Point cameras at new device indices. Returns connection status per camera ID"""
+        result = {}
+        try:
+            streams = []
+            for camera_id, camera_index in indices.items():
+                stream = self._replace(camera_id, camera_index)
+                if stream is None:
+                    result[camera_id] = False
+                else:
+                    streams.append(stream)
+
+            result.update(self._connect_all(streams))
+            for camera_id, connected in result.items():
+                if not connected:
+                    logger.error("Failed to connect to camera '%s' at index %s", camera_id, indices[camera_id])
+            return result
 
         except Exception as e:
-            print(f"Error updating cameras: {e}")
-            return False
+            logger.error("Error updating cameras: %s", e)
+            return {camera_id: False for camera_id in indices}
 
-    def reset_cameras(self, entry_index: int = None, exit_index: int = None):
+    def reset_cameras(self, indices: Optional[Dict[str, int]] = None) -> Dict[str, bool]:
         """Force reset cameras (disconnect and reconnect, trying multiple backends).
 
-        If indices are provided, target those; otherwise reset currently configured streams.
-        Returns a dict with connection statuses.
+        Cameras listed in indices are first moved to the given device index;
+        every configured camera is then reconnected.
+        Returns connection status per camera ID.
         """
-        result = {"entry": False, "exit": False}
+        result = {camera_id: False for camera_id in self.cameras}
         try:
-            # Entry
-            if entry_index is not None:
-                if self.entry_camera:
-                    self.entry_camera.disconnect()
-                self.entry_camera = CameraStream(camera_type="webcam", camera_index=entry_index)
-            if self.entry_camera:
-                result["entry"] = self.entry_camera.reconnect()
-
-            # Exit
-            if exit_index is not None:
-                if self.exit_camera:
-                    self.exit_camera.disconnect()
-                self.exit_camera = CameraStream(camera_type="webcam", camera_index=exit_index)
-            if self.exit_camera:
-                result["exit"] = self.exit_camera.reconnect()
+            for camera_id, camera_index in (indices or {}).items():
+                self._replace(camera_id, camera_index)
 
+            result.update(self._connect_all(list(self.cameras.values())))
             return result
         except Exception as e:
-            print(f"Error resetting cameras: {e}")
+            logger.error("Error resetting cameras: %s", e)
             return result
 
+    def stats(self) -> dict:
+        """Capture statistics for each camera"""
+        return {camera_id: stream.stats() for camera_id, stream in self.cameras.items()}
+
     def shutdown(self):
         """Disconnect all cameras"""
-        if self.entry_camera:
-            self.entry_camera.disconnect()
-        if self.exit_camera:
-            self.exit_camera.disconnect()
+        self._watchdog_stop.set()
+        for stream in self.cameras.values():
+            stream.close()
 
 
 # Singleton instance
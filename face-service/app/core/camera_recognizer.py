@@ -0,0 +1,248 @@
+import threading
+import time
+import cv2
+import numpy as np
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.camera_manager import camera_manager
+from app.core.face_detector import face_detector
+from app.core.face_gallery import face_gallery
+from app.core.face_tracker import FaceTracker, Track
+from app.core.frame_bus import get_ring
+from app.core.inference_pool import inference_pool
+from app.core.latency import LatencyHistogram
+from app.core.motion_detector import MotionDetector
+
+# Pipeline stages timed per frame
+STAGES = ("preprocess", "detect", "track", "encode", "identify")
+
+
+def _shared_frame_copy(ring_name: str, sequence: int, convert) -> Optional[np.ndarray]:
+    """
+    Run convert on a zero-copy view of a frame-bus frame and return its
+    (new) output, or None if the frame was overwritten before or during it.
+    """
+    ring = get_ring(ring_name)
+    if ring is None:
+        return None
+    frame, _, _ = ring.read(sequence)
+    if frame is None:
+        return None
+    result = convert(frame)
+    return result if ring.is_current(sequence) else None
+
+
+def _bus_rgb(frame: np.ndarray, night_mode: Optional[bool] = None) -> np.ndarray:
+    return face_detector.to_rgb(face_detector.preprocess_image(frame, night_mode))
+
+
+def detect_shared_frame(
+    ring_name: str,
+    sequence: int,
+    scale: Optional[float] = None,
+    min_face_size: Optional[int] = None,
+    night_mode: Optional[bool] = None
+) -> Optional[List[Tuple[int, int, int, int]]]:
+    """Worker-process face detection on a frame read from the frame bus"""
+    rgb_image = _shared_frame_copy(ring_name, sequence, partial(_bus_rgb, night_mode=night_mode))
+    if rgb_image is None:
+        return None
+    return face_detector.detect_faces(rgb_image, rgb_image=rgb_image, scale=scale, min_face_size=min_face_size)
+
+
+def encode_shared_frame(
+    ring_name: str,
+    sequence: int,
+    locations: List[Tuple],
+    night_mode: Optional[bool] = None
+) -> Optional[List[np.ndarray]]:
+    """Worker-process face encoding on a frame read from the frame bus"""
+    rgb_image = _shared_frame_copy(ring_name, sequence, partial(_bus_rgb, night_mode=night_mode))
+    if rgb_image is None:
+        return None
+    return face_detector.encode_faces(rgb_image, locations)
+
+
+class CameraRecognizer:
+    """Per-camera detect -> track -> encode -> identify step.
+
+    Faces are tracked across frames so each person is encoded and
+    identified once, and again only when the tracker asks for it.
+
+    With the frame bus enabled and process inference workers, detection
+    and encoding run in those workers on the shared-memory copy of the
+    frame (addressed by ring name and sequence) instead of in this process.
+
+    With MOTION_GATING_ENABLED, detection only runs while the scene is
+    changing or faces are being tracked (see MotionDetector).
+    """
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.tracker = FaceTracker()
+        self.frame_index = 0
+        self.encodings_computed = 0
+        self.detections_run = 0
+        self.frames_missed = 0
+        self.frames_off_bus = 0  # Frame bus configured, but this frame wasn't on it
+        self.stage_times = {stage: LatencyHistogram() for stage in STAGES}
+        # Motion gating: detection is skipped while the scene is static and empty
+        self.motion = MotionDetector()
+        self.detections_gated = 0
+        self.active_at = 0.0  # Last frame with motion or a live track
+        self._detected_at = 0.0
+        self._lock = threading.Lock()
+
+    def process(
+        self,
+        frame: np.ndarray,
+        sequence: Optional[int] = None,
+        captured_at: Optional[float] = None
+    ) -> List[Track]:
+        """
+        Run one frame through the pipeline and return the live tracks.
+        captured_at (the frame's capture time) dates when new faces appeared.
+        """
+        # Tracker state is per camera; frames must be processed one at a time
+        with self._lock:
+            tracks = self._process(frame, sequence)
+            appeared_at = captured_at or time.time()
+            for track in tracks:
+                if track.appeared_at is None:
+                    track.appeared_at = appeared_at
+            return tracks
+
+    def _use_frame_bus(self, camera, sequence: Optional[int]) -> Optional[str]:
+        """The name of the ring workers should read this frame from, or None to process it here"""
+        ring = camera.ring if camera is not None else None
+        if sequence is None or ring is None or inference_pool.worker_type != "process":
+            return None
+        # Frames larger than a slot (or not written yet) never reach the ring;
+        # those are processed here instead of being missed by the workers
+        if not ring.is_current(sequence):
+            self.frames_off_bus += 1
+            return None
+        return ring.name
+
+    def _timed(self, stage: str, started_at: float) -> float:
+        """Record a stage that began at started_at (perf_counter); returns now"""
+        now = time.perf_counter()
+        self.stage_times[stage].observe(now - started_at)
+        return now
+
+    def _process(self, frame: np.ndarray, sequence: Optional[int] = None) -> List[Track]:
+        self.frame_index += 1
+        camera = camera_manager.get_camera(self.camera_id)
+        started_at = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        motion = self.motion.update(gray)
+        night_mode = self.motion.is_night
+        now = time.time()
+        if motion or self.tracker.tracks:
+            self.active_at = now
+
+        interval = max(1, settings.TRACKER_DETECT_INTERVAL)
+        skip = bool(self.tracker.tracks) and self.frame_index % interval != 0
+        if not skip and not self.tracker.tracks and not motion and settings.MOTION_GATING_ENABLED:
+            # Static, empty scene: nothing new can have appeared, so don't run HOG.
+            # Detect now and then anyway in case someone arrived without visible motion.
+            force_every = settings.MOTION_FORCE_DETECT_SECONDS
+            skip = not (force_every > 0 and now - self._detected_at >= force_every)
+            if skip:
+                self.detections_gated += 1
+
+        if skip:
+            started_at = self._timed("preprocess", started_at)
+            tracks = self.tracker.update(gray, None)
+            self._timed("track", started_at)
+            return tracks
+        self._detected_at = now
+
+        scale = camera.detection_scale if camera else None
+        min_face_size = camera.min_face_size if camera else None
+        bus_ring = self._use_frame_bus(camera, sequence)
+
+        if bus_ring:
+            # Preprocessing happens in the worker and is counted as detection
+            started_at = self._timed("preprocess", started_at)
+            rgb_image = None
+            locations = inference_pool.call(
+                detect_shared_frame, bus_ring, sequence, scale, min_face_size, night_mode
+            )
+            started_at = self._timed("detect", started_at)
+            if locations is None:
+                # Frame left the ring before a worker got to it; just track
+                self.frames_missed += 1
+                tracks = self.tracker.update(gray, None)
+                self._timed("track", started_at)
+                return tracks
+        else:
+            image = face_detector.preprocess_image(frame, night_mode)
+            rgb_image = face_detector.to_rgb(image)
+            started_at = self._timed("preprocess", started_at)
+            locations = face_detector.detect_faces(
+                image,
+                rgb_image=rgb_image,
+                scale=scale,
+                min_face_size=min_face_size
+            )
+            started_at = self._timed("detect", started_at)
+        self.detections_run += 1
+
+        tracks = self.tracker.update(gray, locations)
+        started_at = self._timed("track", started_at)
+        pending = [track for track in tracks if self.tracker.needs_encoding(track)]
+        if pending:
+            pending_locations = [track.location for track in pending]
+            if bus_ring:
+                encodings = inference_pool.call(
+                    encode_shared_frame, bus_ring, sequence, pending_locations, night_mode
+                )
+                if encodings is None:
+                    self.frames_missed += 1
+                    return tracks
+            else:
+                encodings = face_detector.encode_faces(rgb_image, pending_locations)
+            started_at = self._timed("encode", started_at)
+            self.encodings_computed += len(encodings)
+            for track, encoding in zip(pending, encodings):
+                candidates = face_gallery.search(encoding, top_k=1) if face_gallery.is_loaded else []
+                track.set_identity(encoding, candidates[0] if candidates else None)
+            self._timed("identify", started_at)
+
+        return tracks
+
+    def stats(self) -> Dict:
+        camera = camera_manager.get_camera(self.camera_id)
+        return {
+            "camera": self.camera_id,
+            "gate_id": camera.gate_id if camera else None,
+            "direction": camera.direction if camera else None,
+            "frames": self.frame_index,
+            "detections": self.detections_run,
+            "detections_gated": self.detections_gated,
+            "encodings": self.encodings_computed,
+            "frames_missed": self.frames_missed,
+            "frames_off_bus": self.frames_off_bus,
+            "active_tracks": len(self.tracker.tracks),
+            "motion": self.motion.stats(),
+            "stage_ms": {stage: times.stats(buckets=False) for stage, times in self.stage_times.items()}
+        }
+
+
+_recognizers: Dict[str, CameraRecognizer] = {}
+
+
+def get_recognizer(camera_id: str) -> Optional[CameraRecognizer]:
+    """Get (or create) the recognizer for a configured camera"""
+    if camera_manager.get_camera(camera_id) is None:
+        return None
+    if camera_id not in _recognizers:
+        _recognizers[camera_id] = CameraRecognizer(camera_id)
+    return _recognizers[camera_id]
+
+
+def recognizer_stats() -> Dict:
+    return {camera_id: recognizer.stats() for camera_id, recognizer in _recognizers.items()}
@@ -1,26 +1,199 @@
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
+from typing import List, Optional
+
+
+class CameraConfig(BaseModel):
+    """One camera in the CAMERAS registry"""
+    id: str
+    name: str = ""
+    type: str = "webcam"  # Options: rtsp, webcam, file
+    rtsp_url: str = ""
+    substream_url: str = ""  # Optional low-resolution RTSP stream used for capture/detection
+    transport: str = ""  # Options: tcp, udp; empty = RTSP_TRANSPORT
+    index: int = 0
+    path: str = ""  # file: video file or directory of images
+    playback: str = "realtime"  # file: realtime (source frame rate) or fast (every frame, as fast as consumed)
+    loop: bool = True  # file: restart at the end
+    fps: float = 0.0  # file: playback rate; 0 = the video's own (10 for image directories)
+    gate_id: str = "gate-1"
+    direction: str = "entry"  # Options: entry, exit
+    detection_scale: Optional[float] = None  # Overrides FACE_DETECTION_SCALE
+    min_face_size: Optional[int] = None  # Overrides FACE_MIN_SIZE
+    recognition_fps: Optional[float] = None  # Overrides RECOGNITION_FPS
+    cpu_budget: Optional[float] = None  # Overrides RECOGNITION_CPU_BUDGET
 
 
 class Settings(BaseSettings):
+    # Logging
+    LOG_LEVEL: str = "INFO"  # Level of the service's own loggers (app.*)
+
     # Face Recognition
     FACE_RECOGNITION_THRESHOLD: float = 0.6
     FACE_DETECTION_MODEL: str = "hog"  # Options: hog, cnn
     FACE_ENCODING_MODEL: str = "large"  # Options: small, large
+    FACE_DETECTION_SCALE: float = 1.0  # Detect on a downscaled copy; 0 = auto from FACE_MIN_SIZE
+    FACE_MIN_SIZE: int = 80  # Smallest face (full-resolution pixels) auto scale must still detect
+
+    # Embedding Wire Format
+    EMBEDDING_MODEL_NAME: str = "dlib_resnet_v1"  # Recorded in binary embedding headers
+    EMBEDDING_WIRE_DTYPE: str = "float32"  # Options: float32, float16
 
     # Camera Configuration
-    ENTRY_CAMERA_TYPE: str = "webcam"  # Options: rtsp, webcam
+    # JSON list of CameraConfig objects, e.g.
+    # [{"id": "lane-1-in", "type": "rtsp", "rtsp_url": "rtsp://...", "gate_id": "lane-1", "direction": "entry"}]
+    # When empty, the ENTRY_/EXIT_CAMERA_* pair below is used (camera IDs "entry" and "exit").
+    CAMERAS: List[CameraConfig] = []
+    DEFAULT_GATE_ID: str = "gate-1"  # Gate of the legacy entry/exit pair
+
+    ENTRY_CAMERA_TYPE: str = "webcam"  # Options: rtsp, webcam (use CAMERAS for file sources)
     ENTRY_CAMERA_RTSP: str = ""
+    ENTRY_CAMERA_RTSP_SUBSTREAM: str = ""
     ENTRY_CAMERA_INDEX: int = 0
+    ENTRY_CAMERA_DETECTION_SCALE: Optional[float] = None  # Overrides FACE_DETECTION_SCALE
+    ENTRY_CAMERA_MIN_FACE_SIZE: Optional[int] = None  # Overrides FACE_MIN_SIZE
 
     EXIT_CAMERA_TYPE: str = "webcam"
     EXIT_CAMERA_RTSP: str = ""
+    EXIT_CAMERA_RTSP_SUBSTREAM: str = ""
     EXIT_CAMERA_INDEX: int = 1
+    EXIT_CAMERA_DETECTION_SCALE: Optional[float] = None
+    EXIT_CAMERA_MIN_FACE_SIZE: Optional[int] = None
+
+    # Frame Capture
+    CAMERA_STALE_FRAME_SECONDS: float = 2.0  # Buffered frames older than this are treated as unavailable
+
+    # Shared-memory Frame Bus (camera frames for process inference workers)
+    FRAME_BUS_ENABLED: bool = False  # Publish frames to shared memory; use with INFERENCE_WORKER_TYPE=process
+    FRAME_BUS_PREFIX: str = "facescan"  # Shared memory segment name prefix
+    FRAME_BUS_SLOTS: int = 8  # Frames kept per camera (how long a worker's view stays valid)
+    FRAME_BUS_MAX_WIDTH: int = 1920  # Slot size; larger frames are not published
+    FRAME_BUS_MAX_HEIGHT: int = 1080
+
+    # RTSP Ingestion
+    RTSP_TRANSPORT: str = "tcp"  # Options: tcp (reliable), udp (lowest latency, may drop packets)
+    RTSP_LOW_LATENCY: bool = True  # Disable FFmpeg input buffering
+    RTSP_BUFFER_SIZE: int = 1  # Decoded frames OpenCV may queue
+    RTSP_OPEN_TIMEOUT_MS: int = 5000
+    RTSP_READ_TIMEOUT_MS: int = 5000
+
+    # Camera Watchdog
+    CAMERA_WATCHDOG_ENABLED: bool = True
+    CAMERA_WATCHDOG_INTERVAL: float = 1.0  # Seconds between health checks
+    CAMERA_STALL_SECONDS: float = 5.0  # No new frame for this long = stalled
+    CAMERA_FROZEN_SECONDS: float = 0.0  # Identical frames for this long = frozen (0 = off; a still, denoised scene can look frozen)
+    CAMERA_FROZEN_TOLERANCE: float = 0.0  # Mean absolute pixel difference still counted as identical
+    CAMERA_RECONNECT_DELAY: float = 1.0  # First retry delay, doubled after each failure
+    CAMERA_RECONNECT_MAX_DELAY: float = 60.0
+
+    # Camera Discovery
+    CAMERA_DISCOVERY_TTL: float = 30.0  # Seconds /cameras/list results are cached
+    CAMERA_DISCOVERY_PROBE_TIMEOUT: float = 3.0  # Limit for each device probe
+    CAMERA_DISCOVERY_WORKERS: int = 4  # Probes outstanding at once (timed-out probes count until they return)
+    CAMERA_DISCOVERY_MAX_INDEX: int = 10  # Indices probed where devices can't be enumerated
+
+    # Live MJPEG Stream
+    STREAM_FPS: float = 10.0  # Frames pushed per second to viewers
+    STREAM_WIDTH: int = 960  # Stream frame width in pixels; 0 = camera resolution
+    STREAM_JPEG_QUALITY: int = 75
+    STREAM_KEEPALIVE_SECONDS: float = 5.0  # Re-send the last frame when the camera sends none for this long; 0 = off
+    STREAM_IDLE_TIMEOUT: float = 30.0  # End a viewer's stream after this long without a new frame; 0 = never
 
     # Image Processing
     NIGHT_MODE_THRESHOLD: int = 50
     ENABLE_FACE_ALIGNMENT: bool = True
     ENABLE_FACE_ENHANCEMENT: bool = True
 
+    # Inference Worker Pool
+    INFERENCE_WORKER_TYPE: str = "thread"  # Options: thread, process (avoids GIL contention)
+    INFERENCE_WORKERS: int = 0  # 0 = number of CPU cores
+    INFERENCE_QUEUE_SIZE: int = 32  # Jobs allowed to wait for a worker before rejecting
+    INFERENCE_REJECT_STATUS: int = 503  # Status returned when the queue is full (429 or 503)
+
+    # Encoding Micro-batching
+    ENCODING_BATCH_ENABLED: bool = True  # Group concurrent face encodings into one dlib call
+    ENCODING_BATCH_MAX_SIZE: int = 16  # Faces per batch
+    ENCODING_BATCH_MAX_WAIT_MS: float = 10.0  # Latency budget for filling a batch
+
+    # Batch Encoding (bulk enrollment)
+    ENCODE_BATCH_CONCURRENCY: int = 0  # Images encoded at once per batch request; 0 = INFERENCE_WORKERS
+    ENCODE_BATCH_MAX_FILES: int = 10000  # Multipart file limit; use an archive for larger rosters
+    ENCODE_BATCH_MAX_RETRIES: int = 20  # Retries per image while the inference queue is full
+
+    # Face Gallery (in-memory identification)
+    GALLERY_LOAD_ON_STARTUP: bool = True
+    GALLERY_TOP_K: int = 5
+    GALLERY_INDEX_TYPE: str = "flat"  # Options: flat, ivf
+    GALLERY_IVF_NLIST: int = 0  # 0 = auto (about 4 * sqrt(gallery size))
+    GALLERY_IVF_NPROBE: int = 8  # Buckets scanned per query (recall vs latency)
+    GALLERY_IVF_MIN_SIZE: int = 10000  # Smaller galleries are scanned exactly
+    GALLERY_RERANK: bool = True  # Exactly rescan all faces of the best candidates
+    GALLERY_RERANK_CANDIDATES: int = 10
+    GALLERY_QUANTIZATION: str = "none"  # Options: none, float16, int8 (int8 is smallest and fastest to scan)
+    GALLERY_QUANT_RERANK_ROWS: int = 64  # Closest coarse rows re-ranked in float32
+    GALLERY_QUANT_RERANK_PATH: str = "./data/gallery-rerank"  # Disk-backed float32 rows of a quantized gallery
+    GALLERY_SUMMARIES_ENABLED: bool = False  # Search per-visitor centroid + exemplars instead of every face
+    GALLERY_SUMMARY_EXEMPLARS: int = 3  # Diverse faces kept per visitor next to the centroid
+    GALLERY_SUMMARY_MARGIN: float = 0.1  # Distances this close to the threshold are re-checked against all faces
+    GALLERY_SHARDS: int = 0  # Worker processes the gallery is split across (scatter-gather search); 0 = in-process
+    GALLERY_SHARD_PREFIX: str = "facescan-gallery"  # Shared memory segment name prefix
+    GALLERY_SHARD_IMBALANCE: float = 1.5  # Reassign visitors when the largest shard exceeds the mean by this factor
+    GALLERY_SHARD_TIMEOUT: float = 2.0  # Seconds to wait for a shard worker before searching its shard in-process
+
+    # Gallery Sync (incremental updates via Postgres LISTEN/NOTIFY)
+    GALLERY_SYNC_ENABLED: bool = True
+    GALLERY_SYNC_CHANNEL: str = "gallery_changes"
+    GALLERY_SYNC_INSTALL_TRIGGERS: bool = False  # Create the NOTIFY triggers here at startup (normally the backend's init_db does)
+    GALLERY_SYNC_DEBOUNCE_MS: float = 100.0  # Notifications collected before they are applied together
+    GALLERY_SYNC_RECONCILE_SECONDS: float = 300.0  # Checksum comparison with the database; 0 = off
+    GALLERY_SYNC_RETRY_SECONDS: float = 5.0  # Delay before reconnecting a lost listener
+
+    # Gallery Snapshot (memory-mapped copy of the gallery for fast restarts)
+    GALLERY_SNAPSHOT_ENABLED: bool = True
+    GALLERY_SNAPSHOT_PATH: str = "./data/gallery-snapshot"
+    GALLERY_SNAPSHOT_INTERVAL: float = 600.0  # Seconds between saves (only when the gallery changed)
+    GALLERY_SNAPSHOT_KEEP: int = 2  # Snapshot versions kept on disk
+    GALLERY_SNAPSHOT_CATCHUP_MARGIN: float = 300.0  # Seconds before the high-water mark re-read on catch-up (clock skew, long transactions)
+
+    # Face Tracking (camera recognition)
+    TRACKER_IOU_THRESHOLD: float = 0.3  # Minimum box overlap to continue a track
+    TRACKER_MAX_MISSES: int = 5  # Frames a track survives without a detection
+    TRACKER_DETECT_INTERVAL: int = 1  # Run detection every N frames while tracking
+    TRACKER_USE_OPTICAL_FLOW: bool = False  # Move boxes with Lucas-Kanade flow between frames
+    TRACKER_QUALITY_GAIN: float = 0.25  # Re-encode when face quality improves by this fraction
+    TRACKER_RETRY_FRAMES: int = 5  # Re-encode low-confidence tracks every N frames
+    TRACKER_LOW_CONFIDENCE_MARGIN: float = 0.05  # Matches within this of the threshold are low confidence
+    TRACKER_MAX_ENCODING_AGE: float = 10.0  # Seconds before a cached encoding is refreshed (0 = never)
+
+    # Continuous Recognition (background pipeline per camera)
+    RECOGNITION_ENABLED: bool = False  # Watch every camera and emit recognition events
+    RECOGNITION_FPS: float = 5.0  # Frames processed per second per camera; 0 = as fast as possible
+    RECOGNITION_IDLE_FPS: float = 1.0  # Rate while a lane shows no motion or faces; 0 = same as RECOGNITION_FPS
+    RECOGNITION_IDLE_AFTER: float = 3.0  # Seconds without motion or faces before dropping to the idle rate
+    RECOGNITION_CPU_BUDGET: float = 0.0  # Share of one core a camera's pipeline may keep busy; 0 = unlimited
+
+    # Motion Gating (skip face detection on static, empty scenes)
+    MOTION_GATING_ENABLED: bool = True
+    MOTION_WIDTH: int = 160  # Width of the downsampled grayscale frame compared
+    MOTION_PIXEL_THRESHOLD: int = 25  # Brightness change (0-255) that marks a pixel as changed
+    MOTION_MIN_AREA: float = 0.01  # Fraction of changed pixels that counts as scene change
+    MOTION_BACKGROUND_RATE: float = 0.05  # How fast the background adapts to lighting drift
+    MOTION_FORCE_DETECT_SECONDS: float = 5.0  # Detect at least this often anyway; 0 = never
+
+    # Identity Voting (continuous recognition)
+    VOTE_WINDOW: int = 5  # Most recent identifications of a track that are voted on
+    VOTE_MIN_AGREE: int = 3  # Identifications that must agree before an identity is committed (1 = first result)
+    VOTE_MAX_ENCODES: int = 10  # Commit as unknown after this many identifications without agreement
+    VISITOR_COOLDOWN_SECONDS: float = 30.0  # A committed visitor isn't committed again at that lane until unseen this long
+
+    # Recognition Events (pushed to the backend over Socket.IO)
+    EVENT_PUBLISHER: str = "socketio"  # Options: socketio, none
+    BACKEND_URL: str = "http://localhost:8000"
+    FACE_SERVICE_TOKEN: str = ""  # Shared with the backend; without it recognition events are refused
+    RECOGNITION_EVENT_NAME: str = "recognition_event"
+    EVENT_QUEUE_SIZE: int = 1000  # Events held while the backend is unreachable (oldest dropped)
+    WS_RECONNECT_DELAY: float = 5.0  # Seconds between connection attempts
+
     # Database
     DB_HOST: str = "postgres"
     DB_PORT: int = 5432
@@ -28,6 +201,38 @@ class Settings(BaseSettings):
     DB_USER: str = "facescan_user"
     DB_PASSWORD: str = "changeme"
 
+    def camera_configs(self) -> List[CameraConfig]:
+        """Configured cameras, falling back to the legacy entry/exit pair"""
+        if self.CAMERAS:
+            return list(self.CAMERAS)
+
+        return [
+            CameraConfig(
+                id="entry",
+                name="Entry Camera",
+                type=self.ENTRY_CAMERA_TYPE,
+                rtsp_url=self.ENTRY_CAMERA_RTSP,
+                substream_url=self.ENTRY_CAMERA_RTSP_SUBSTREAM,
+                index=self.ENTRY_CAMERA_INDEX,
+                gate_id=self.DEFAULT_GATE_ID,
+                direction="entry",
+                detection_scale=self.ENTRY_CAMERA_DETECTION_SCALE,
+                min_face_size=self.ENTRY_CAMERA_MIN_FACE_SIZE
+            ),
+            CameraConfig(
+                id="exit",
+                name="Exit Camera",
+                type=self.EXIT_CAMERA_TYPE,
+                rtsp_url=self.EXIT_CAMERA_RTSP,
+                substream_url=self.EXIT_CAMERA_RTSP_SUBSTREAM,
+                index=self.EXIT_CAMERA_INDEX,
+                gate_id=self.DEFAULT_GATE_ID,
+                direction="exit",
+                detection_scale=self.EXIT_CAMERA_DETECTION_SCALE,
+                min_face_size=self.EXIT_CAMERA_MIN_FACE_SIZE
+            )
+        ]
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
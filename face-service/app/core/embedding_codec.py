@@ -0,0 +1,84 @@
+import struct
+import numpy as np
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+# Versioned binary embedding format, shared with the backend's faces.embedding:
+#
+#   magic "FEMB" | version u8 | dtype u8 | dim u16 | model name length u8 | model name
+#   zero padding up to an 8-byte boundary | dim packed little-endian values
+#
+# The padded header keeps the payload aligned so it can be read with a
+# zero-copy np.frombuffer.
+EMBEDDING_MEDIA_TYPE = "application/x-face-embedding"
+MAGIC = b"FEMB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHB")
+
+DTYPE_CODES = {"float32": 1, "float16": 2}
+CODE_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+
+def _header_size(model_length: int) -> int:
+    size = HEADER.size + model_length
+    return (size + 7) // 8 * 8
+
+
+def encode_embedding(embedding: np.ndarray, dtype: str = None, model: str = None) -> bytes:
+    """Pack an embedding into the binary wire format"""
+    if dtype is None:
+        dtype = settings.EMBEDDING_WIRE_DTYPE
+    if model is None:
+        model = settings.EMBEDDING_MODEL_NAME
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    values = np.ascontiguousarray(embedding, dtype=CODE_DTYPES[DTYPE_CODES[dtype]]).ravel()
+    model_bytes = model.encode("ascii")
+    header = HEADER.pack(MAGIC, VERSION, DTYPE_CODES[dtype], len(values), len(model_bytes)) + model_bytes
+    header = header.ljust(_header_size(len(model_bytes)), b"\0")
+    return header + values.tobytes()
+
+
+def is_encoded_embedding(blob: bytes) -> bool:
+    return len(blob) >= HEADER.size and bytes(blob[:4]) == MAGIC
+
+
+def decode_embedding(blob: bytes) -> Tuple[np.ndarray, str]:
+    """
+    Unpack a binary embedding.
+    Returns (values, model); values is a read-only view over blob, not a copy.
+    """
+    if not is_encoded_embedding(blob):
+        raise ValueError("Not an encoded embedding")
+
+    _, version, dtype_code, dim, model_length = HEADER.unpack_from(blob)
+    if version != VERSION:
+        raise ValueError(f"Unsupported embedding format version: {version}")
+    if dtype_code not in CODE_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype code: {dtype_code}")
+
+    model = bytes(blob[HEADER.size:HEADER.size + model_length]).decode("ascii")
+    values = np.frombuffer(blob, dtype=CODE_DTYPES[dtype_code], count=dim, offset=_header_size(model_length))
+    return values, model
+
+
+def negotiate_embedding_dtype(accept: Optional[str]) -> Optional[str]:
+    """
+    Return the requested wire dtype if the Accept header asks for the binary
+    format (e.g. "application/x-face-embedding; dtype=float16"), else None.
+    """
+    if not accept:
+        return None
+
+    for media_range in accept.split(","):
+        parts = [part.strip() for part in media_range.split(";")]
+        if parts[0].lower() != EMBEDDING_MEDIA_TYPE:
+            continue
+        for param in parts[1:]:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "dtype" and value.strip() in DTYPE_CODES:
+                return value.strip()
+        return settings.EMBEDDING_WIRE_DTYPE
+    return None
@@ -0,0 +1,173 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+import dlib
+import numpy as np
+from face_recognition.api import face_encoder, pose_predictor_5_point, pose_predictor_68_point
+
+from app.core.config import settings
+
+
+def face_landmarks(rgb_image: np.ndarray, face_locations: List[Tuple], model: str) -> list:
+    """dlib landmark shapes for (top, right, bottom, left) face locations, as face_recognition computes them"""
+    predictor = pose_predictor_5_point if model == "small" else pose_predictor_68_point
+    return [
+        predictor(rgb_image, dlib.rectangle(left, top, right, bottom))
+        for top, right, bottom, left in face_locations
+    ]
+
+
+def compute_descriptors(rgb_images: List[np.ndarray], landmarks: List[list]) -> List[list]:
+    """Face descriptors for several images in one batched dlib call"""
+    detections = []
+    for shapes in landmarks:
+        detection = dlib.full_object_detections()
+        for shape in shapes:
+            detection.append(shape)
+        detections.append(detection)
+    return face_encoder.compute_face_descriptor(rgb_images, detections, 1)
+
+
+def compute_descriptor(rgb_image: np.ndarray, shape) -> np.ndarray:
+    return np.array(face_encoder.compute_face_descriptor(rgb_image, shape, 1))
+
+
+class _EncodeRequest:
+    def __init__(self, rgb_image: np.ndarray, landmarks: list):
+        self.rgb_image = rgb_image
+        self.landmarks = landmarks
+        self.future: Future = Future()
+        self.submitted_at = time.time()
+
+
+class EncodingBatcher:
+    """Dynamic micro-batching for face encodings.
+
+    Callers (HTTP workers, camera recognizers) compute landmarks on their own
+    thread and submit them; a single scheduler thread collects requests for
+    up to ENCODING_BATCH_MAX_WAIT_MS or ENCODING_BATCH_MAX_SIZE faces and runs
+    them through dlib's batched compute_face_descriptor in one call, then
+    hands each caller back its own encodings.
+
+    The scheduler belongs to the process that started it: a forked child
+    (process inference workers) inherits the thread object but not the
+    running thread, so it starts its own queue and scheduler.
+    """
+
+    def __init__(self):
+        self.max_size = settings.ENCODING_BATCH_MAX_SIZE
+        self.max_wait = settings.ENCODING_BATCH_MAX_WAIT_MS / 1000.0
+        self._reset()
+        self._batches = 0
+        self._faces = 0
+        self._requests = 0
+        self._batch_sizes = deque(maxlen=1000)
+        self._waits = deque(maxlen=1000)
+
+    def _reset(self):
+        """Fresh scheduler state for the current process"""
+        self._pid = os.getpid()
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            # Forked: the parent's scheduler thread doesn't exist here, and its
+            # queue and locks may have been copied mid-use
+            self._reset()
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="encoding-batcher", daemon=True)
+                self._thread.start()
+
+    def encode(self, rgb_image: np.ndarray, face_locations: List[Tuple], model: str) -> List[np.ndarray]:
+        """Encode faces at known locations, batched with other pending callers"""
+        if not face_locations:
+            return []
+
+        landmarks = face_landmarks(rgb_image, face_locations, model)
+        request = _EncodeRequest(rgb_image, landmarks)
+        self._ensure_started()
+        self._queue.put(request)
+        return request.future.result()
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            batch = [request]
+            faces = len(request.landmarks)
+            deadline = time.time() + self.max_wait
+
+            while faces < self.max_size:
+                remaining = deadline - time.time()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(request)
+                faces += len(request.landmarks)
+
+            self._execute(batch, faces)
+
+    def _execute(self, batch: List[_EncodeRequest], faces: int):
+        started_at = time.time()
+        try:
+            descriptors = compute_descriptors(
+                [request.rgb_image for request in batch],
+                [request.landmarks for request in batch]
+            )
+            for request, face_descriptors in zip(batch, descriptors):
+                request.future.set_result([np.array(descriptor) for descriptor in face_descriptors])
+        except Exception:
+            # Fall back to per-request encoding so one bad input can't fail the batch
+            for request in batch:
+                if request.future.done():
+                    continue
+                try:
+                    request.future.set_result([
+                        compute_descriptor(request.rgb_image, shape) for shape in request.landmarks
+                    ])
+                except Exception as e:
+                    request.future.set_exception(e)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._faces += faces
+            self._requests += len(batch)
+            self._batch_sizes.append(faces)
+            self._waits.extend(started_at - request.submitted_at for request in batch)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            sizes = np.array(self._batch_sizes) if self._batch_sizes else np.zeros(1)
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            return {
+                "enabled": settings.ENCODING_BATCH_ENABLED,
+                "max_batch_size": self.max_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "requests": self._requests,
+                "faces": self._faces,
+                "batch_size": {
+                    "mean": float(sizes.mean()),
+                    "max": int(sizes.max())
+                },
+                "wait_ms": {
+                    "mean": float(waits.mean() * 1000),
+                    "p95": float(np.percentile(waits, 95) * 1000)
+                }
+            }
+
+
+# Singleton instance
+encoding_batcher = EncodingBatcher()
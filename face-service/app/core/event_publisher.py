@@ -0,0 +1,141 @@
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EventPublisher:
+    """Pushes recognition events to the backend over one persistent Socket.IO connection.
+
+    publish() only queues the event, so camera pipelines never wait on the
+    network; a background thread sends it as RECOGNITION_EVENT_NAME and the
+    backend relays it to dashboards. While the backend is unreachable events
+    wait in a bounded queue (the oldest are dropped) and the connection is
+    retried every WS_RECONNECT_DELAY seconds.
+    """
+
+    def __init__(self):
+        self.mode = settings.EVENT_PUBLISHER.lower()
+        self._queue = deque(maxlen=max(1, settings.EVENT_QUEUE_SIZE))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._client = None
+        self.published = 0
+        self.sent = 0
+        self.dropped = 0
+        self.send_failures = 0
+        self.connects = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None and self._client.connected
+
+    def publish(self, event: Dict):
+        """Queue an event for delivery (never blocks)"""
+        with self._lock:
+            self.published += 1
+            if self.mode == "none":
+                return
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(event)
+        self._wake.set()
+
+    def start(self):
+        if self.mode == "none" or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._client is not None:
+            try:
+                self._client.disconnect()
+            except Exception:
+                pass
+            self._client = None
+
+    def _connect(self) -> bool:
+        if self.connected:
+            return True
+        try:
+            import socketio
+        except ImportError:
+            self.last_error = "python-socketio is not installed"
+            return False
+
+        client = socketio.Client(reconnection=False)
+        try:
+            client.connect(
+                settings.BACKEND_URL,
+                transports=["websocket"],
+                auth={"service": "face-service", "token": settings.FACE_SERVICE_TOKEN},
+                wait_timeout=5
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("Event publisher cannot reach backend at %s: %s", settings.BACKEND_URL, e)
+            return False
+
+        self._client = client
+        self.connects += 1
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            if self._stop_event.is_set():
+                break
+            if not self._queue:
+                continue
+
+            if not self._connect():
+                self._stop_event.wait(settings.WS_RECONNECT_DELAY)
+                continue
+
+            while self._queue and not self._stop_event.is_set():
+                with self._lock:
+                    event = self._queue.popleft()
+                try:
+                    self._client.emit(settings.RECOGNITION_EVENT_NAME, event)
+                    self.sent += 1
+                except Exception as e:
+                    # Keep the event for the next connection
+                    with self._lock:
+                        self._queue.appendleft(event)
+                    self.send_failures += 1
+                    self.last_error = str(e)
+                    break
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "backend_url": settings.BACKEND_URL,
+                "connected": self.connected,
+                "connects": self.connects,
+                "published": self.published,
+                "sent": self.sent,
+                "queued": len(self._queue),
+                "dropped": self.dropped,
+                "send_failures": self.send_failures,
+                "last_error": self.last_error
+            }
+
+
+# Singleton instance
+event_publisher = EventPublisher()
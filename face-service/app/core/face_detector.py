@@ -4,6 +4,11 @@ import numpy as np
 from typing import List, Tuple, Optional
 
 from app.core.config import settings
+from app.core.encoding_batcher import encoding_batcher
+
+# Smallest face (pixels) face_locations reliably finds with its default
+# single upsample; used to pick the automatic detection scale
+MIN_DETECTABLE_FACE_SIZE = 48
 
 
 class FaceDetector:
@@ -11,48 +16,159 @@ class FaceDetector:
         self.detection_model = settings.FACE_DETECTION_MODEL
         self.encoding_model = settings.FACE_ENCODING_MODEL
 
-    def detect_faces(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    def to_rgb(self, image: np.ndarray) -> np.ndarray:
+        """Convert BGR to RGB (OpenCV uses BGR, face_recognition uses RGB)"""
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def detection_scale(self, scale: Optional[float] = None, min_face_size: Optional[int] = None) -> float:
+        """
+        Resolve the factor detection runs at (1.0 = full resolution).
+        A scale <= 0 means auto: shrink until the smallest face we care
+        about (min_face_size, full-resolution pixels) is just detectable.
+        """
+        if scale is None:
+            scale = settings.FACE_DETECTION_SCALE
+        if scale > 0:
+            return min(float(scale), 1.0)
+
+        if min_face_size is None:
+            min_face_size = settings.FACE_MIN_SIZE
+        if min_face_size <= 0:
+            return 1.0
+
+        return min(1.0, MIN_DETECTABLE_FACE_SIZE / float(min_face_size))
+
+    def detect_faces(
+        self,
+        image: np.ndarray,
+        rgb_image: Optional[np.ndarray] = None,
+        scale: Optional[float] = None,
+        min_face_size: Optional[int] = None
+    ) -> List[Tuple[int, int, int, int]]:
         """
         Detect faces in an image.
+        Pass rgb_image when the caller already converted the frame.
+        Detection runs on a copy downscaled by detection_scale; locations
+        are mapped back to full-resolution coordinates.
         Returns list of face locations as (top, right, bottom, left)
         """
-        # Convert BGR to RGB (OpenCV uses BGR, face_recognition uses RGB)
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if rgb_image is None:
+            rgb_image = self.to_rgb(image)
+
+        factor = self.detection_scale(scale, min_face_size)
+        detect_image = rgb_image
+        if factor < 1.0:
+            detect_image = cv2.resize(rgb_image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
 
         # Detect faces
         face_locations = face_recognition.face_locations(
-            rgb_image,
+            detect_image,
             model=self.detection_model
         )
 
+        if factor < 1.0:
+            height, width = rgb_image.shape[:2]
+            face_locations = [
+                (
+                    max(0, int(round(top / factor))),
+                    min(width, int(round(right / factor))),
+                    min(height, int(round(bottom / factor))),
+                    max(0, int(round(left / factor)))
+                )
+                for top, right, bottom, left in face_locations
+            ]
+
         return face_locations
 
-    def encode_face(self, image: np.ndarray, face_location: Optional[Tuple] = None) -> Optional[np.ndarray]:
+    def encode_faces(self, rgb_image: np.ndarray, face_locations: List[Tuple]) -> List[np.ndarray]:
         """
-        Generate face encoding from image.
-        If face_location is provided, use it; otherwise detect faces first.
+        Generate encodings for already-detected faces in an RGB image.
+        Returns one encoding per location, in the same order.
         """
-        # Convert BGR to RGB
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if not face_locations:
+            return []
 
-        if face_location is None:
-            # Detect faces first
-            face_locations = face_recognition.face_locations(rgb_image, model=self.detection_model)
-            if not face_locations:
-                return None
-            face_location = face_locations[0]  # Use first detected face
-
-        # Generate encoding
-        encodings = face_recognition.face_encodings(
+        if settings.ENCODING_BATCH_ENABLED:
+            # Batched with other pending encodes across cameras and requests
+            return encoding_batcher.encode(rgb_image, face_locations, self.encoding_model)
+
+        return face_recognition.face_encodings(
             rgb_image,
-            known_face_locations=[face_location],
+            known_face_locations=face_locations,
             model=self.encoding_model
         )
 
+    def detect_and_encode(
+        self,
+        image: np.ndarray,
+        max_faces: Optional[int] = None,
+        encode: bool = True,
+        scale: Optional[float] = None,
+        min_face_size: Optional[int] = None
+    ) -> List[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]]:
+        """
+        Detect and encode faces with one colour conversion and one detection pass.
+        Detection may run downscaled (see detect_faces); encodings always use
+        the full-resolution image.
+        Returns list of (face_location, encoding) in detection order; encoding
+        is None when encode is False. max_faces limits how many are encoded.
+        """
+        rgb_image = self.to_rgb(image)
+        face_locations = self.detect_faces(
+            image,
+            rgb_image=rgb_image,
+            scale=scale,
+            min_face_size=min_face_size
+        )
+
+        if max_faces is not None:
+            face_locations = face_locations[:max_faces]
+
+        if not encode:
+            return [(location, None) for location in face_locations]
+
+        encodings = self.encode_faces(rgb_image, face_locations)
+        return list(zip(face_locations, encodings))
+
+    def encode_face(self, image: np.ndarray, face_location: Optional[Tuple] = None) -> Optional[np.ndarray]:
+        """
+        Generate face encoding from image.
+        If face_location is provided, use it; otherwise detect faces first.
+        """
+        if face_location is None:
+            faces = self.detect_and_encode(image, max_faces=1)
+            return faces[0][1] if faces else None
+
+        encodings = self.encode_faces(self.to_rgb(image), [face_location])
         if encodings:
             return encodings[0]
         return None
 
+    def decode_image(self, contents: bytes) -> Optional[np.ndarray]:
+        """Decode uploaded image bytes to a BGR image (None if invalid)"""
+        nparr = np.frombuffer(contents, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    def decode_and_encode(
+        self,
+        contents: bytes,
+        max_faces: Optional[int] = 1,
+        preprocess: bool = True
+    ) -> Optional[List[Tuple[Tuple[int, int, int, int], np.ndarray]]]:
+        """
+        Decode image bytes and detect+encode faces in one call, so the whole
+        step can run on an inference worker.
+        Returns None if the image is invalid, otherwise detect_and_encode output.
+        """
+        image = self.decode_image(contents)
+        if image is None:
+            return None
+
+        if preprocess:
+            image = self.preprocess_image(image)
+
+        return self.detect_and_encode(image, max_faces=max_faces)
+
     def compare_faces(
         self,
         known_encoding: np.ndarray,
@@ -70,7 +186,7 @@ class FaceDetector:
         distance = face_recognition.face_distance([known_encoding], unknown_encoding)[0]
 
         # Check if match
-        is_match = distance <= tolerance
+        is_match = bool(distance <= tolerance)
 
         return is_match, float(distance)
 
@@ -96,21 +212,29 @@ class FaceDetector:
 
     def is_night_mode(self, image: np.ndarray) -> bool:
         """
-        Determine if image is in low light conditions
+        Determine if image is in low light conditions.
+        Accepts a BGR image or an already converted grayscale one.
         """
         # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
         # Calculate average brightness
         avg_brightness = np.mean(gray)
 
-        return avg_brightness < settings.NIGHT_MODE_THRESHOLD
+        return bool(avg_brightness < settings.NIGHT_MODE_THRESHOLD)
 
-    def preprocess_image(self, image: np.ndarray) -> np.ndarray:
+    def preprocess_image(self, image: np.ndarray, night_mode: Optional[bool] = None) -> np.ndarray:
         """
-        Preprocess image before face detection
+        Preprocess image before face detection.
+        Pass night_mode when the caller already computed it.
         """
-        if settings.ENABLE_FACE_ENHANCEMENT and self.is_night_mode(image):
+        if not settings.ENABLE_FACE_ENHANCEMENT:
+            return image
+
+        if night_mode is None:
+            night_mode = self.is_night_mode(image)
+
+        if night_mode:
             image = self.enhance_image(image)
 
         return image
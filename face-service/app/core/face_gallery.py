@@ -0,0 +1,934 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import numpy as np
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import bindparam, text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.ann_index import VectorIndex, get_vector_index
+from app.core.embedding_codec import decode_embedding, is_encoded_embedding
+from app.core.gallery_shards import gallery_shards
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 128
+
+# Database clock in the (naive UTC) convention of faces.created_at / visitors.updated_at
+NOW_QUERY = "SELECT now() AT TIME ZONE 'utc'"
+
+FACES_QUERY = (
+    "SELECT f.id, f.visitor_id, f.embedding, v.name, v.is_active "
+    "FROM faces f JOIN visitors v ON v.id = f.visitor_id"
+)
+
+
+def _decode_embedding(raw: bytes) -> Optional[np.ndarray]:
+    """Decode a faces.embedding blob (binary embedding format, or legacy raw float64/float32 bytes)"""
+    if is_encoded_embedding(raw):
+        values, _ = decode_embedding(raw)
+        if len(values) != EMBEDDING_DIM:
+            return None
+        # float32 payloads are used zero-copy; float16 is widened once
+        return values if values.dtype == np.float32 else values.astype(np.float32)
+    if len(raw) == EMBEDDING_DIM * 8:
+        return np.frombuffer(raw, dtype=np.float64).astype(np.float32)
+    if len(raw) == EMBEDDING_DIM * 4:
+        return np.frombuffer(raw, dtype=np.float32)
+    return None
+
+
+def _rerank_matrix(capacity: int) -> np.ndarray:
+    """
+    Disk-backed float32 rows of a quantized store (an unlinked file under
+    GALLERY_QUANT_RERANK_PATH): the codes are scanned in memory and only the
+    short-listed rows being re-ranked are paged in.
+    """
+    os.makedirs(settings.GALLERY_QUANT_RERANK_PATH, exist_ok=True)
+    with tempfile.TemporaryFile(dir=settings.GALLERY_QUANT_RERANK_PATH) as f:
+        # The mapping keeps the file alive after it is closed
+        return np.memmap(f, dtype=np.float32, mode="w+", shape=(capacity, EMBEDDING_DIM))
+
+
+def _is_active(value) -> bool:
+    """visitors.is_active is stored as a string column"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "t", "1", "yes")
+
+
+QUANTIZED_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+# face_id of a visitor's centroid row in VisitorSummaries
+CENTROID_PREFIX = "centroid:"
+
+# Rows scored per chunk when scanning quantized codes, so the float32
+# temporary stays cache-sized
+QUANTIZED_CHUNK_ROWS = 8192
+
+# Range headroom left when the int8 scale is widened for out-of-range
+# embeddings, so a growing gallery doesn't re-encode on every add
+QUANT_RANGE_HEADROOM = 1.1
+
+
+class EmbeddingStore:
+    """Slot-based float32 embedding matrix with incremental insert/delete.
+
+    Rows keep their position for their whole lifetime; deleted rows are
+    masked out and their slots reused by later inserts, so the attached
+    VectorIndex only has to be told about the rows that changed.
+
+    With quantization ("float16" or "int8" with a per-dimension scale) the
+    coarse scan runs over a compact code matrix held in memory, and only the
+    closest rows are re-ranked against the float32 rows, which stay on disk
+    (the snapshot's memory map, or a re-rank file once rows are written).
+
+    A store restored from a gallery snapshot scans read-only memory maps;
+    they are copied into memory the first time a row is rewritten.
+    """
+
+    def __init__(self, capacity: int = 1024, index: VectorIndex = None, quantization: str = None):
+        capacity = max(capacity, 1)
+        self.quantization = (quantization or settings.GALLERY_QUANTIZATION).lower()
+        if self.quantization not in QUANTIZED_DTYPES:
+            self.quantization = "none"
+        self.matrix = self._new_matrix(capacity)
+        self.sq_norms = np.zeros(capacity, dtype=np.float32)
+        self.codes: Optional[np.ndarray] = None
+        self.code_sq_norms: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.recalibrations = 0  # int8 scale widened because added embeddings fell outside it
+        if self.quantization != "none":
+            self.codes = np.zeros((capacity, EMBEDDING_DIM), dtype=QUANTIZED_DTYPES[self.quantization])
+            self.code_sq_norms = np.zeros(capacity, dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.visitor_ids = np.empty(capacity, dtype=object)
+        self.face_ids = np.empty(capacity, dtype=object)
+        self.high = 0
+        self.face_rows: Dict[str, int] = {}
+        self.visitor_rows: Dict[str, Set[int]] = {}
+        self._watchers: List[Set[str]] = []  # See watch()
+        self.index = index if index is not None else get_vector_index()
+        self._free: List[int] = []
+
+    @property
+    def size(self) -> int:
+        return len(self.face_rows)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def memory_mapped(self) -> bool:
+        return isinstance(self.matrix, np.memmap)
+
+    def _new_matrix(self, capacity: int) -> np.ndarray:
+        if self.quantization == "none":
+            return np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        return _rerank_matrix(capacity)
+
+    def memory_bytes(self) -> Tuple[int, int]:
+        """(bytes held in memory, bytes memory-mapped from disk) of the numeric arrays"""
+        resident = mapped = 0
+        for array in (self.matrix, self.sq_norms, self.codes, self.code_sq_norms, self.alive):
+            if array is None:
+                continue
+            if isinstance(array, np.memmap):
+                mapped += array.nbytes
+            else:
+                resident += array.nbytes
+        return resident, mapped
+
+    def snapshot_arrays(self) -> Dict[str, np.ndarray]:
+        """Copies of every array needed to restore this store (see from_snapshot)"""
+        high = self.high
+        arrays = {
+            "matrix": np.array(self.matrix[:high]),
+            "sq_norms": np.array(self.sq_norms[:high]),
+            "alive": np.array(self.alive[:high]),
+            "face_ids": np.array([face_id or "" for face_id in self.face_ids[:high]], dtype=str),
+            "visitor_ids": np.array([visitor_id or "" for visitor_id in self.visitor_ids[:high]], dtype=str)
+        }
+        if self.codes is not None:
+            arrays["codes"] = np.array(self.codes[:high])
+            arrays["code_sq_norms"] = np.array(self.code_sq_norms[:high])
+        if self.scale is not None:
+            arrays["scale"] = np.array(self.scale)
+        for name, array in self.index.export_state().items():
+            arrays[f"index_{name}"] = np.array(array)
+        return arrays
+
+    @classmethod
+    def from_snapshot(cls, arrays: Dict[str, np.ndarray], quantization: str = None) -> "EmbeddingStore":
+        """
+        Rebuild a store from snapshot_arrays() output, typically loaded with
+        np.load(mmap_mode="r"). Row numbers (and so the index) are unchanged.
+        """
+        store = cls(capacity=1, quantization=quantization)
+        high = len(arrays["matrix"])
+        if high == 0:
+            return store
+
+        store.matrix = arrays["matrix"]
+        store.sq_norms = arrays["sq_norms"]
+        if store.codes is not None:
+            store.codes = arrays["codes"]
+            store.code_sq_norms = arrays["code_sq_norms"]
+        if "scale" in arrays:
+            store.scale = np.array(arrays["scale"])
+
+        # Small bookkeeping arrays are rewritten on every change; keep them in memory
+        store.alive = np.array(arrays["alive"], dtype=bool)
+        store.face_ids = arrays["face_ids"].astype(object)
+        store.visitor_ids = arrays["visitor_ids"].astype(object)
+        store.face_ids[~store.alive] = None
+        store.visitor_ids[~store.alive] = None
+        store.high = high
+
+        live = np.flatnonzero(store.alive)
+        store.face_rows = dict(zip(store.face_ids[live].tolist(), live.tolist()))
+        for row, visitor_id in zip(live.tolist(), store.visitor_ids[live].tolist()):
+            store.visitor_rows.setdefault(visitor_id, set()).add(row)
+        store._free = np.flatnonzero(~store.alive).tolist()
+
+        store.index.restore_state({
+            name[len("index_"):]: array for name, array in arrays.items() if name.startswith("index_")
+        })
+        if store.index.needs_rebuild(store.size):
+            store.rebuild_index()
+        return store
+
+    def _ensure_writable(self):
+        """Copy read-only (memory-mapped snapshot) arrays before rows are rewritten in place"""
+        for name in ("matrix", "sq_norms", "codes", "code_sq_norms"):
+            array = getattr(self, name)
+            if array is not None and not array.flags.writeable:
+                if name == "matrix":
+                    # Quantized stores keep their float32 rows out of memory
+                    matrix = self._new_matrix(len(array))
+                    matrix[:] = array
+                    self.matrix = matrix
+                else:
+                    setattr(self, name, np.array(array))
+
+    def watch(self) -> Set[str]:
+        """
+        A set that collects the id of every visitor whose faces are added or
+        removed from now on, for derived structures that update per visitor.
+        The caller empties it as it catches up.
+        """
+        watcher: Set[str] = set()
+        self._watchers.append(watcher)
+        return watcher
+
+    def _grow(self, needed: int):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+
+        # Allocate fresh arrays so callers holding the old ones stay valid
+        def grown(array, shape, dtype):
+            new = np.zeros(shape, dtype=dtype) if dtype != object else np.empty(shape, dtype=object)
+            new[:len(array)] = array
+            return new
+
+        matrix = self._new_matrix(capacity)
+        matrix[:len(self.matrix)] = self.matrix
+        self.matrix = matrix
+        self.sq_norms = grown(self.sq_norms, capacity, np.float32)
+        self.alive = grown(self.alive, capacity, bool)
+        self.visitor_ids = grown(self.visitor_ids, capacity, object)
+        self.face_ids = grown(self.face_ids, capacity, object)
+        if self.codes is not None:
+            self.codes = grown(self.codes, (capacity, EMBEDDING_DIM), self.codes.dtype)
+            self.code_sq_norms = grown(self.code_sq_norms, capacity, np.float32)
+
+    def _calibrate(self, embeddings: np.ndarray, headroom: float = 1.0):
+        """Pick the int8 per-dimension scale so the observed range maps to [-127, 127]"""
+        peak = np.abs(embeddings).max(axis=0) if len(embeddings) else np.zeros(EMBEDDING_DIM)
+        self.scale = (np.maximum(peak * headroom, 1e-6) / 127.0).astype(np.float32)
+
+    def _quantize(self, rows: np.ndarray, embeddings: np.ndarray):
+        """Write the codes (and their dequantized norms) for the given rows"""
+        self._ensure_writable()
+        if self.quantization == "float16":
+            codes = embeddings.astype(np.float16)
+            dequantized = codes.astype(np.float32)
+        else:
+            if self.scale is None:
+                self._calibrate(embeddings)
+            elif np.any(np.abs(embeddings) > self.scale * 127.0):
+                # These rows would saturate: widen the scale and re-encode every live row
+                rows = np.union1d(self.live_rows(), rows)
+                embeddings = self.matrix[rows]
+                self._calibrate(embeddings, QUANT_RANGE_HEADROOM)
+                self.recalibrations += 1
+                logger.info("Gallery int8 scale widened for out-of-range embeddings; re-encoded %d rows", len(rows))
+            codes = np.clip(np.rint(embeddings / self.scale), -127, 127).astype(np.int8)
+            dequantized = codes.astype(np.float32) * self.scale
+        self.codes[rows] = codes
+        self.code_sq_norms[rows] = np.einsum("ij,ij->i", dequantized, dequantized)
+
+    def _allocate(self, count: int) -> np.ndarray:
+        reused = [self._free.pop() for _ in range(min(count, len(self._free)))]
+        fresh = count - len(reused)
+        self._grow(self.high + fresh)
+        rows = reused + list(range(self.high, self.high + fresh))
+        self.high += fresh
+        return np.array(rows, dtype=np.int64)
+
+    def add(self, face_ids: List[str], visitor_ids: List[str], embeddings: np.ndarray) -> np.ndarray:
+        """Insert embeddings, replacing any existing rows with the same face ids"""
+        existing = [self.face_rows[face_id] for face_id in face_ids if face_id in self.face_rows]
+        if existing:
+            self.remove_rows(np.array(existing, dtype=np.int64))
+
+        if not face_ids:
+            return np.empty(0, dtype=np.int64)
+
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        rows = self._allocate(len(face_ids))
+        self._ensure_writable()
+
+        self.matrix[rows] = embeddings
+        self.sq_norms[rows] = np.einsum("ij,ij->i", embeddings, embeddings)
+        if self.codes is not None:
+            self._quantize(rows, embeddings)
+        for row, face_id, visitor_id in zip(rows.tolist(), face_ids, visitor_ids):
+            self.visitor_ids[row] = visitor_id
+            self.face_ids[row] = face_id
+            self.face_rows[face_id] = row
+            self.visitor_rows.setdefault(visitor_id, set()).add(row)
+        for watcher in self._watchers:
+            watcher.update(visitor_ids)
+        # Only mark rows live once they are fully written
+        self.alive[rows] = True
+
+        if self.index.needs_rebuild(self.size):
+            self.rebuild_index()
+        else:
+            self.index.add(embeddings, rows)
+        return rows
+
+    def remove_rows(self, rows: np.ndarray):
+        rows = rows[self.alive[rows]]
+        if not len(rows):
+            return
+
+        self.alive[rows] = False
+        self.index.remove(rows)
+        for row in rows.tolist():
+            face_id = self.face_ids[row]
+            visitor_id = self.visitor_ids[row]
+            self.face_rows.pop(face_id, None)
+            visitor_rows = self.visitor_rows.get(visitor_id)
+            if visitor_rows is not None:
+                visitor_rows.discard(row)
+                if not visitor_rows:
+                    del self.visitor_rows[visitor_id]
+            self.face_ids[row] = None
+            self.visitor_ids[row] = None
+            self._free.append(row)
+            for watcher in self._watchers:
+                watcher.add(visitor_id)
+
+        if self.index.needs_rebuild(self.size):
+            self.rebuild_index()
+
+    def remove_face(self, face_id: str) -> bool:
+        row = self.face_rows.get(face_id)
+        if row is None:
+            return False
+        self.remove_rows(np.array([row], dtype=np.int64))
+        return True
+
+    def remove_visitor(self, visitor_id: str) -> int:
+        rows = self.visitor_rows.get(visitor_id)
+        if not rows:
+            return 0
+        count = len(rows)
+        self.remove_rows(np.array(sorted(rows), dtype=np.int64))
+        return count
+
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.alive[:self.high])
+
+    def rebuild_index(self):
+        rows = self.live_rows()
+        vectors = self.matrix[rows]
+        if self.quantization == "int8" and len(rows):
+            # Re-calibrate so codes track the current gallery's value range
+            self._calibrate(vectors)
+            self._quantize(rows, vectors)
+        self.index.build(vectors, rows)
+
+    def _select_rows(self, rows: Optional[np.ndarray]) -> Tuple[np.ndarray, bool]:
+        """Resolve candidate rows to live rows, noting when they are the whole contiguous block"""
+        if rows is None:
+            rows = self.live_rows()
+            return rows, len(rows) == self.high
+        return rows[self.alive[rows]], False
+
+    def exact_distances(self, query: np.ndarray, rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact euclidean distances from query to the given rows (all live rows by default)"""
+        rows, full_scan = self._select_rows(rows)
+
+        # ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2, one matrix-vector product
+        if full_scan:
+            # No gaps: scan the contiguous block without a gather copy
+            matrix, sq_norms = self.matrix[:self.high], self.sq_norms[:self.high]
+        else:
+            matrix, sq_norms = self.matrix[rows], self.sq_norms[rows]
+        sq_dist = sq_norms - 2.0 * (matrix @ query) + np.dot(query, query)
+        return rows, np.sqrt(np.maximum(sq_dist, 0.0))
+
+    def _coarse_sq_distances(self, query: np.ndarray, rows: np.ndarray, full_scan: bool) -> np.ndarray:
+        """Approximate squared distances computed from the quantized codes"""
+        # int8 codes are dequantized by folding the scale into the query
+        projected = query * self.scale if self.quantization == "int8" else query
+        dots = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), QUANTIZED_CHUNK_ROWS):
+            end = min(start + QUANTIZED_CHUNK_ROWS, len(rows))
+            block = self.codes[start:end] if full_scan else self.codes[rows[start:end]]
+            dots[start:end] = block.astype(np.float32) @ projected
+
+        sq_norms = self.code_sq_norms[:self.high] if full_scan else self.code_sq_norms[rows]
+        return sq_norms - 2.0 * dots + np.dot(query, query)
+
+    def distances(
+        self,
+        query: np.ndarray,
+        rows: np.ndarray = None,
+        limit: int = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distances from query to the given rows (all live rows by default).
+        With quantization, rows are scanned via their codes and only the
+        closest max(limit, GALLERY_QUANT_RERANK_ROWS) are returned, with
+        exact float32 distances.
+        """
+        if self.codes is None:
+            return self.exact_distances(query, rows)
+
+        rows, full_scan = self._select_rows(rows)
+        keep = max(limit or 0, settings.GALLERY_QUANT_RERANK_ROWS)
+        if len(rows) <= keep:
+            return self.exact_distances(query, rows)
+
+        coarse = self._coarse_sq_distances(query, rows, full_scan)
+        closest = rows[np.argpartition(coarse, keep - 1)[:keep]]
+        return self.exact_distances(query, closest)
+
+
+def summarize(embeddings: np.ndarray, exemplars: int) -> Tuple[np.ndarray, List[int]]:
+    """
+    Centroid of one visitor's embeddings and the positions of up to
+    exemplars diverse ones: the face closest to the centroid, then
+    repeatedly the face farthest from every face already picked.
+    """
+    centroid = embeddings.mean(axis=0)
+    picked = [int(np.argmin(np.linalg.norm(embeddings - centroid, axis=1)))]
+    gaps = np.linalg.norm(embeddings - embeddings[picked[0]], axis=1)
+    while len(picked) < min(exemplars, len(embeddings)):
+        position = int(np.argmax(gaps))
+        if gaps[position] <= 0.0:
+            break  # The rest are duplicates
+        picked.append(position)
+        gaps = np.minimum(gaps, np.linalg.norm(embeddings - embeddings[position], axis=1))
+    return centroid.astype(np.float32), picked
+
+
+class VisitorSummaries:
+    """Per-visitor representatives searched in place of every enrolled face.
+
+    A visitor with more than GALLERY_SUMMARY_EXEMPLARS + 1 faces is
+    represented by their centroid plus GALLERY_SUMMARY_EXEMPLARS diverse
+    faces; smaller visitors keep all of theirs. Representatives live in their
+    own EmbeddingStore (same index and quantization settings) and are
+    recomputed for the visitors that changed in the source store.
+    """
+
+    def __init__(self, source: EmbeddingStore, exemplars: int = None):
+        self.source = source
+        self.exemplars = max(exemplars if exemplars is not None else settings.GALLERY_SUMMARY_EXEMPLARS, 1)
+        self.store = EmbeddingStore(index=get_vector_index())
+        self.summarized: Set[str] = set()  # Visitors represented by a centroid
+        self.borderline_checks = 0
+        self._changed = source.watch()
+        self._changed.update(source.visitor_rows)
+
+    def refresh(self):
+        """Re-summarize the visitors changed in the source store since the last refresh"""
+        source = self.source
+        changed = set(self._changed)
+        self._changed.clear()
+        face_ids, visitor_ids, embeddings = [], [], []
+        for visitor_id in changed:
+            self.store.remove_visitor(visitor_id)
+            self.summarized.discard(visitor_id)
+            rows = np.array(sorted(source.visitor_rows.get(visitor_id, ())), dtype=np.int64)
+            if not len(rows):
+                continue
+
+            vectors = source.matrix[rows]
+            if len(rows) <= self.exemplars + 1:
+                picked = range(len(rows))
+            else:
+                centroid, picked = summarize(vectors, self.exemplars)
+                face_ids.append(CENTROID_PREFIX + visitor_id)
+                visitor_ids.append(visitor_id)
+                embeddings.append(centroid)
+                self.summarized.add(visitor_id)
+            for position in picked:
+                face_ids.append(source.face_ids[rows[position]])
+                visitor_ids.append(visitor_id)
+                embeddings.append(vectors[position])
+
+        if face_ids:
+            self.store.add(face_ids, visitor_ids, np.vstack(embeddings))
+
+    def stats(self) -> Dict:
+        return {
+            "representatives": self.store.size,
+            "summarized_visitors": len(self.summarized),
+            "exemplars": self.exemplars,
+            "borderline_checks": self.borderline_checks
+        }
+
+
+class FaceGallery:
+    """In-memory gallery of enrolled face embeddings.
+
+    Embeddings live in an EmbeddingStore (one float32 matrix plus a parallel
+    visitor-id array); a pluggable VectorIndex narrows the rows scanned for
+    large galleries, optionally followed by an exact per-visitor re-rank.
+    With GALLERY_SUMMARIES_ENABLED the scan runs over VisitorSummaries and
+    raw faces are only compared for borderline visitors.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._store = EmbeddingStore()
+        self._visitor_names: Dict[str, str] = {}
+        self._summaries: Optional[VisitorSummaries] = None
+        # md5 of each face's stored embedding blob, per visitor, as read from the
+        # database (see gallery_sync.DIGEST_QUERY); face_id -> visitor_id alongside
+        self._checksums: Dict[str, Dict[str, str]] = {}
+        self._checksum_owners: Dict[str, str] = {}
+        self.is_loaded = False
+        # Bumped on every change, so snapshots are only written when needed
+        self.version = 0
+        # Database time up to which every change is known to be applied
+        self.high_water_mark: Optional[datetime] = None
+
+    @property
+    def size(self) -> int:
+        return self._store.size
+
+    def visitor_name(self, visitor_id: str) -> Optional[str]:
+        return self._visitor_names.get(visitor_id)
+
+    def _query(self, where: str, params: Dict):
+        """Face rows (id, visitor_id, embedding blob, visitor name, is_active); list params expand to IN lists"""
+        statement = text(FACES_QUERY + where)
+        expanding = [bindparam(key, expanding=True) for key, value in params.items() if isinstance(value, list)]
+        if expanding:
+            statement = statement.bindparams(*expanding)
+        with engine.connect() as conn:
+            return conn.execute(statement, params).fetchall()
+
+    def _fetch(self, where: str = "", params: Dict = None):
+        """Read active visitors' face rows from the database, decoding embeddings"""
+        faces = []
+        names: Dict[str, str] = {}
+        checksums: List[Tuple[str, str, str]] = []  # (face_id, visitor_id, md5 of the blob)
+
+        for face_id, visitor_id, raw, name, is_active in self._query(where, params or {}):
+            face_id, visitor_id = str(face_id), str(visitor_id)
+            if not _is_active(is_active):
+                continue
+            raw = bytes(raw)
+            # Undecodable faces count too, so they don't look like drift on every reconcile
+            checksums.append((face_id, visitor_id, hashlib.md5(raw).hexdigest()))
+            names[visitor_id] = name
+            embedding = _decode_embedding(raw)
+            if embedding is None:
+                logger.warning("Skipping face %s: unexpected embedding size %d", face_id, len(raw))
+                continue
+            faces.append((face_id, visitor_id, embedding))
+
+        return faces, names, checksums
+
+    def _remember(self, face_id: str, visitor_id: str, checksum: str):
+        self._forget_face(face_id)
+        self._checksums.setdefault(visitor_id, {})[face_id] = checksum
+        self._checksum_owners[face_id] = visitor_id
+
+    def _forget_face(self, face_id: str):
+        visitor_id = self._checksum_owners.pop(face_id, None)
+        faces = self._checksums.get(visitor_id)
+        if faces is not None:
+            faces.pop(face_id, None)
+            if not faces:
+                del self._checksums[visitor_id]
+
+    def _forget_visitor(self, visitor_id: str):
+        for face_id in self._checksums.pop(visitor_id, {}):
+            self._checksum_owners.pop(face_id, None)
+
+    @staticmethod
+    def _summarize(store: EmbeddingStore) -> Optional[VisitorSummaries]:
+        if not settings.GALLERY_SUMMARIES_ENABLED:
+            return None
+        summaries = VisitorSummaries(store)
+        summaries.refresh()
+        return summaries
+
+    def database_now(self) -> datetime:
+        with engine.connect() as conn:
+            return conn.execute(text(NOW_QUERY)).scalar()
+
+    def load(self) -> int:
+        """Load every active visitor's face embeddings from the database"""
+        high_water_mark = self.database_now()
+        faces, names, checksums = self._fetch()
+
+        store = EmbeddingStore(capacity=len(faces), index=get_vector_index())
+        if faces:
+            face_ids, visitor_ids, embeddings = zip(*faces)
+            store.add(list(face_ids), list(visitor_ids), np.vstack(embeddings))
+        summaries = self._summarize(store)
+
+        with self._lock:
+            self._store = store
+            self._summaries = summaries
+            self._visitor_names = names
+            self._checksums, self._checksum_owners = {}, {}
+            for face_id, visitor_id, checksum in checksums:
+                self._remember(face_id, visitor_id, checksum)
+            self.is_loaded = True
+            self.high_water_mark = high_water_mark
+            self.version += 1
+            gallery_shards.sync(store)
+        return store.size
+
+    def snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, str], Dict[str, Dict[str, str]], Optional[datetime], int]:
+        """Copy the gallery's state: (store arrays, visitor names, face checksums, high-water mark, version)"""
+        with self._lock:
+            return (
+                self._store.snapshot_arrays(),
+                dict(self._visitor_names),
+                {visitor_id: dict(faces) for visitor_id, faces in self._checksums.items()},
+                self.high_water_mark,
+                self.version
+            )
+
+    def restore(
+        self,
+        store: EmbeddingStore,
+        visitor_names: Dict[str, str],
+        checksums: Dict[str, Dict[str, str]],
+        high_water_mark: datetime
+    ):
+        """
+        Swap in a store restored from a snapshot. The gallery doesn't report
+        itself loaded until mark_loaded(), once it has caught up.
+        """
+        summaries = self._summarize(store)
+        with self._lock:
+            self._store = store
+            self._summaries = summaries
+            self._visitor_names = visitor_names
+            self._checksums, self._checksum_owners = {}, {}
+            for visitor_id, faces in checksums.items():
+                for face_id, checksum in faces.items():
+                    self._remember(face_id, visitor_id, checksum)
+            self.high_water_mark = high_water_mark
+            self.is_loaded = False
+            self.version += 1
+            gallery_shards.sync(store)
+
+    def mark_loaded(self):
+        with self._lock:
+            self.is_loaded = True
+
+    def apply_changes(
+        self,
+        visitor_ids: Iterable[str] = (),
+        face_ids: Iterable[str] = (),
+        removed_face_ids: Iterable[str] = (),
+        high_water_mark: datetime = None
+    ) -> int:
+        """
+        Re-read visitors (enrolled, updated or deactivated) and single faces
+        (inserted or updated) from the database, drop deleted faces, and swap
+        it all in under one lock. high_water_mark, if given, is the database
+        time the gallery is up to date with afterwards and is set in the same
+        critical section. Returns the number of faces read.
+        """
+        visitor_ids, face_ids = set(visitor_ids), set(face_ids)
+        removed_face_ids = set(removed_face_ids) - face_ids
+        faces: Dict[str, Tuple[str, np.ndarray]] = {}
+        names: Dict[str, str] = {}
+        checksums: List[Tuple[str, str, str]] = []
+        for where, key, ids in (
+            (" WHERE f.visitor_id IN :visitor_ids", "visitor_ids", visitor_ids),
+            (" WHERE f.id IN :face_ids", "face_ids", face_ids)
+        ):
+            if not ids:
+                continue
+            fetched, fetched_names, fetched_checksums = self._fetch(where, {key: sorted(ids)})
+            # A face read both ways is added once
+            faces.update((face_id, (visitor_id, embedding)) for face_id, visitor_id, embedding in fetched)
+            names.update(fetched_names)
+            checksums.extend(fetched_checksums)
+
+        with self._lock:
+            self.version += 1
+            for visitor_id in visitor_ids:
+                self._store.remove_visitor(visitor_id)
+                self._visitor_names.pop(visitor_id, None)
+                self._forget_visitor(visitor_id)
+            for face_id in face_ids | removed_face_ids:
+                self._store.remove_face(face_id)
+                self._forget_face(face_id)
+            if faces:
+                self._store.add(
+                    list(faces),
+                    [visitor_id for visitor_id, _ in faces.values()],
+                    np.vstack([embedding for _, embedding in faces.values()])
+                )
+            self._visitor_names.update(names)
+            for face_id, visitor_id, checksum in checksums:
+                self._remember(face_id, visitor_id, checksum)
+            if high_water_mark is not None:
+                self.high_water_mark = high_water_mark
+            gallery_shards.sync(self._store)
+        return len(faces)
+
+    def load_visitor(self, visitor_id: str) -> int:
+        """Re-read one visitor's faces from the database (enrolled, updated or deactivated)"""
+        return self.apply_changes(visitor_ids=[visitor_id])
+
+    def load_face(self, face_id: str) -> bool:
+        """Re-read one face from the database (inserted or updated); False if it's gone or inactive"""
+        return bool(self.apply_changes(face_ids=[face_id]))
+
+    def add_face(self, face_id: str, visitor_id: str, embedding: np.ndarray, visitor_name: str = None):
+        """Add a face that isn't read from the database (the next reconcile re-reads its visitor)"""
+        with self._lock:
+            self.version += 1
+            self._store.add([face_id], [visitor_id], np.asarray(embedding, dtype=np.float32)[None, :])
+            if visitor_name is not None:
+                self._visitor_names[visitor_id] = visitor_name
+            gallery_shards.sync(self._store)
+
+    def remove_face(self, face_id: str) -> bool:
+        with self._lock:
+            self.version += 1
+            removed = self._store.remove_face(face_id)
+            self._forget_face(face_id)
+            gallery_shards.sync(self._store)
+            return removed
+
+    def remove_visitor(self, visitor_id: str) -> int:
+        with self._lock:
+            self.version += 1
+            self._visitor_names.pop(visitor_id, None)
+            removed = self._store.remove_visitor(visitor_id)
+            self._forget_visitor(visitor_id)
+            gallery_shards.sync(self._store)
+            return removed
+
+    def visitor_checksums(self) -> Dict[str, Tuple[Optional[str], Dict[str, str]]]:
+        """(name, {face_id: embedding blob md5}) per visitor held, as last read from the database"""
+        with self._lock:
+            visitor_ids = set(self._checksums).union(self._store.visitor_rows)
+            return {
+                visitor_id: (self._visitor_names.get(visitor_id), dict(self._checksums.get(visitor_id, {})))
+                for visitor_id in visitor_ids
+            }
+
+    def search(
+        self,
+        encoding: np.ndarray,
+        top_k: int = None,
+        tolerance: float = None,
+        n_probe: int = None,
+        rerank: bool = None
+    ) -> List[Dict]:
+        """
+        Find the closest enrolled faces to an encoding.
+        Distances match face_recognition.face_distance (euclidean) and
+        is_match follows FaceDetector.compare_faces (distance <= tolerance).
+        Returns at most top_k candidates, closest first, one per visitor.
+
+        n_probe trades recall for latency on the IVF index; rerank rescans
+        every face of the best candidate visitors exactly.
+
+        With GALLERY_SHARDS workers running, the search is an exact
+        scatter-gather over the shards instead (already exact, so n_probe
+        and rerank have nothing to do; the shards refuse to start with IVF,
+        quantization or summaries configured). Changes are published to the
+        shards as they are applied, never by a search.
+
+        With visitor summaries, a representative distance within
+        GALLERY_SUMMARY_MARGIN of tolerance is replaced by the visitor's
+        closest raw face (rerank does not apply); face_id is None when a
+        clear decision came from the visitor's centroid.
+        """
+        if top_k is None:
+            top_k = settings.GALLERY_TOP_K
+        if tolerance is None:
+            tolerance = settings.FACE_RECOGNITION_THRESHOLD
+        if rerank is None:
+            rerank = settings.GALLERY_RERANK
+
+        query = np.asarray(encoding, dtype=np.float32)
+
+        with self._lock:
+            store = self._store
+            if store.size == 0 or top_k <= 0:
+                return []
+
+            sharded = gallery_shards.running
+            if not sharded:
+                matches = self._search_store(store, query, top_k, tolerance, n_probe, rerank)
+            visitor_names = self._visitor_names
+
+        if sharded:
+            # Shard segments are immutable, so the scatter-gather runs outside the lock
+            matches = gallery_shards.search(query, max(top_k, settings.GALLERY_RERANK_CANDIDATES))
+
+        return [
+            {
+                "visitor_id": visitor_id,
+                "visitor_name": visitor_names.get(visitor_id),
+                "face_id": face_id,
+                "distance": distance,
+                "is_match": distance <= tolerance,
+                "confidence": max(0.0, 1.0 - distance)
+            }
+            for face_id, visitor_id, distance in matches[:top_k]
+        ]
+
+    def _search_store(
+        self,
+        store: EmbeddingStore,
+        query: np.ndarray,
+        top_k: int,
+        tolerance: float,
+        n_probe: Optional[int],
+        rerank: bool
+    ) -> List[Tuple[Optional[str], str, float]]:
+        """In-process search: (face_id, visitor_id, distance) per visitor, closest first"""
+        summaries = self._summaries
+        searched = store
+        if summaries is not None:
+            summaries.refresh()
+            searched = summaries.store
+
+        candidate_rows = searched.index.candidates(query, n_probe)
+        count = max(top_k, settings.GALLERY_RERANK_CANDIDATES)
+        rows, distances = searched.distances(query, candidate_rows, limit=count * 4)
+        best = self._best_per_visitor(searched, rows, distances, count)
+
+        if summaries is not None:
+            return self._check_borderline(store, summaries, query, best, tolerance)
+
+        # Approximate search may have missed a visitor's closer faces
+        if rerank and candidate_rows is not None and best:
+            visitor_rows = [row for _, visitor_id, _ in best for row in store.visitor_rows.get(visitor_id, ())]
+            rows, distances = store.exact_distances(query, np.array(visitor_rows, dtype=np.int64))
+            best = self._best_per_visitor(store, rows, distances, top_k)
+        return [(store.face_ids[row], visitor_id, distance) for row, visitor_id, distance in best]
+
+    @staticmethod
+    def _check_borderline(
+        store: EmbeddingStore,
+        summaries: VisitorSummaries,
+        query: np.ndarray,
+        best: List[Tuple[int, str, float]],
+        tolerance: float
+    ) -> List[Tuple[Optional[str], str, float]]:
+        """Resolve representative matches to (face_id, visitor_id, distance), closest first"""
+        margin = settings.GALLERY_SUMMARY_MARGIN
+        matches = []
+        for row, visitor_id, distance in best:
+            face_id = summaries.store.face_ids[row]
+            if visitor_id in summaries.summarized and abs(distance - tolerance) <= margin:
+                # Too close to call from the summary: compare every face of the visitor
+                rows = np.array(sorted(store.visitor_rows.get(visitor_id, ())), dtype=np.int64)
+                rows, distances = store.exact_distances(query, rows)
+                if len(rows):
+                    closest = int(np.argmin(distances))
+                    face_id, distance = store.face_ids[rows[closest]], float(distances[closest])
+                summaries.borderline_checks += 1
+            elif face_id.startswith(CENTROID_PREFIX):
+                face_id = None
+            matches.append((face_id, visitor_id, distance))
+
+        matches.sort(key=lambda match: match[2])
+        return matches
+
+    @staticmethod
+    def _best_per_visitor(
+        store: EmbeddingStore,
+        rows: np.ndarray,
+        distances: np.ndarray,
+        count: int
+    ) -> List[Tuple[int, str, float]]:
+        """Closest row per visitor, for the count closest visitors"""
+        if not len(rows):
+            return []
+
+        # Over-select so duplicate faces of one visitor don't crowd out others
+        k = min(len(distances), count * 4)
+        order = np.argpartition(distances, k - 1)[:k]
+        order = order[np.argsort(distances[order])]
+
+        best = []
+        seen = set()
+        for position in order.tolist():
+            row = int(rows[position])
+            visitor_id = store.visitor_ids[row]
+            if visitor_id in seen:
+                continue
+            seen.add(visitor_id)
+            best.append((row, visitor_id, float(distances[position])))
+            if len(best) >= count:
+                break
+        return best
+
+    def stats(self) -> Dict:
+        with self._lock:
+            # Resident: what the gallery costs in RAM; mapped: float32 rows paged in on demand
+            resident, mapped = self._store.memory_bytes()
+            if self._summaries is not None:
+                resident += self._summaries.store.memory_bytes()[0]
+            return {
+                "loaded": self.is_loaded,
+                "faces": self._store.size,
+                "visitors": len(self._store.visitor_rows),
+                "memory_bytes": resident,
+                "mapped_bytes": mapped,
+                "memory_mapped": self._store.memory_mapped,
+                "high_water_mark": self.high_water_mark.isoformat() if self.high_water_mark else None,
+                "quantization": self._store.quantization,
+                "quant_recalibrations": self._store.recalibrations,
+                "scan_bytes": int(self._store.codes.nbytes if self._store.codes is not None else self._store.matrix.nbytes),
+                "index": self._store.index.stats(),
+                "summaries": self._summaries.stats() if self._summaries is not None else None,
+                "shards": gallery_shards.stats() if gallery_shards.running else None
+            }
+
+
+# Singleton instance
+face_gallery = FaceGallery()
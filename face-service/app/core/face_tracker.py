@@ -0,0 +1,244 @@
+import time
+from collections import deque
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+Location = Tuple[int, int, int, int]  # (top, right, bottom, left)
+
+
+def iou(a: Location, b: Location) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top = max(a[0], b[0])
+    right = min(a[1], b[1])
+    bottom = min(a[2], b[2])
+    left = max(a[3], b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+
+    intersection = (right - left) * (bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def face_quality(gray: np.ndarray, location: Location) -> float:
+    """Cheap face quality score: face size weighted by sharpness"""
+    top, right, bottom, left = location
+    crop = gray[max(0, top):max(0, bottom), max(0, left):max(0, right)]
+    if crop.size == 0:
+        return 0.0
+
+    # Variance of the Laplacian is a standard blur measure
+    sharpness = cv2.Laplacian(crop, cv2.CV_64F).var()
+    return float(np.sqrt(crop.size) * min(sharpness, 500.0) / 500.0)
+
+
+class Track:
+    """A face followed across frames, with its cached encoding and identity"""
+
+    def __init__(self, track_id: int, location: Location, quality: float):
+        now = time.time()
+        self.track_id = track_id
+        self.location = location
+        self.quality = quality
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.misses = 0
+        self.appeared_at: Optional[float] = None  # Capture time of the frame the face was first detected in
+
+        self.encoding: Optional[np.ndarray] = None
+        self.identity: Optional[Dict] = None
+        self.encoded_quality = 0.0
+        self.encoded_at = 0.0
+        self.frames_since_encode = 0
+        self.encode_count = 0
+        # Recent identifications as (visitor_id or None, distance), voted on by IdentityVoter
+        self.observations = deque(maxlen=max(1, settings.VOTE_WINDOW))
+
+        # Identity committed by the recognition loop
+        self.decided_at: Optional[float] = None
+        self.decided_visitor_id: Optional[str] = None
+
+    def set_identity(self, encoding: np.ndarray, identity: Optional[Dict]):
+        """Cache a fresh encoding and its best gallery match"""
+        self.encoding = encoding
+        self.identity = identity
+        self.encoded_quality = self.quality
+        self.encoded_at = time.time()
+        self.frames_since_encode = 0
+        self.encode_count += 1
+
+        if identity is None:
+            self.observations.append((None, None))
+        else:
+            visitor_id = identity["visitor_id"] if identity.get("is_match") else None
+            self.observations.append((visitor_id, identity["distance"]))
+
+    @property
+    def is_confident(self) -> bool:
+        if self.identity is None or not self.identity.get("is_match"):
+            return False
+        margin = settings.TRACKER_LOW_CONFIDENCE_MARGIN
+        return self.identity["distance"] <= settings.FACE_RECOGNITION_THRESHOLD - margin
+
+    def to_dict(self) -> Dict:
+        return {
+            "track_id": self.track_id,
+            "face_location": self.location,
+            "quality": self.quality,
+            "hits": self.hits,
+            "misses": self.misses,
+            "age": self.last_seen - self.first_seen,
+            "encode_count": self.encode_count,
+            "identity": self.identity
+        }
+
+
+class FaceTracker:
+    """IoU-based multi-face tracker for one camera.
+
+    Detections are matched greedily to existing tracks by IoU; optionally
+    track boxes are first shifted by sparse Lucas-Kanade optical flow so
+    fast movers and frames without detection keep their track.
+    """
+
+    def __init__(self):
+        self.tracks: List[Track] = []
+        self._next_id = 1
+        self._prev_gray: Optional[np.ndarray] = None
+        # Set while an IdentityVoter (RecognitionLoop) decides these tracks, which
+        # needs several identifications per track instead of one
+        self.voting = False
+
+    def update(self, gray: np.ndarray, detections: Optional[List[Location]]) -> List[Track]:
+        """
+        Advance the tracker by one frame.
+        detections is None on frames where detection was skipped; tracks
+        are then only moved by optical flow (if enabled) and kept alive.
+        """
+        if settings.TRACKER_USE_OPTICAL_FLOW:
+            self._predict_flow(gray)
+        self._prev_gray = gray
+
+        for track in self.tracks:
+            track.frames_since_encode += 1
+
+        if detections is None:
+            return self.tracks
+
+        matches, unmatched_tracks, unmatched_detections = self._match(detections)
+        now = time.time()
+
+        for track_index, detection_index in matches:
+            track = self.tracks[track_index]
+            track.location = detections[detection_index]
+            track.quality = face_quality(gray, track.location)
+            track.last_seen = now
+            track.hits += 1
+            track.misses = 0
+
+        for track_index in unmatched_tracks:
+            self.tracks[track_index].misses += 1
+
+        for detection_index in unmatched_detections:
+            location = detections[detection_index]
+            self.tracks.append(Track(self._next_id, location, face_quality(gray, location)))
+            self._next_id += 1
+
+        self.tracks = [track for track in self.tracks if track.misses <= settings.TRACKER_MAX_MISSES]
+        return self.tracks
+
+    def _match(self, detections: List[Location]):
+        """Greedy IoU assignment of detections to tracks"""
+        pairs = []
+        for track_index, track in enumerate(self.tracks):
+            for detection_index, detection in enumerate(detections):
+                overlap = iou(track.location, detection)
+                if overlap >= settings.TRACKER_IOU_THRESHOLD:
+                    pairs.append((overlap, track_index, detection_index))
+        pairs.sort(reverse=True)
+
+        matches = []
+        used_tracks = set()
+        used_detections = set()
+        for _, track_index, detection_index in pairs:
+            if track_index in used_tracks or detection_index in used_detections:
+                continue
+            matches.append((track_index, detection_index))
+            used_tracks.add(track_index)
+            used_detections.add(detection_index)
+
+        unmatched_tracks = [i for i in range(len(self.tracks)) if i not in used_tracks]
+        unmatched_detections = [i for i in range(len(detections)) if i not in used_detections]
+        return matches, unmatched_tracks, unmatched_detections
+
+    def _predict_flow(self, gray: np.ndarray):
+        """Shift each track box by the median optical flow of its corners"""
+        if self._prev_gray is None or self._prev_gray.shape != gray.shape or not self.tracks:
+            return
+
+        points = []
+        owners = []
+        for index, track in enumerate(self.tracks):
+            top, right, bottom, left = track.location
+            crop = self._prev_gray[max(0, top):max(0, bottom), max(0, left):max(0, right)]
+            if crop.size == 0:
+                continue
+            corners = cv2.goodFeaturesToTrack(crop, maxCorners=20, qualityLevel=0.01, minDistance=5)
+            if corners is None:
+                continue
+            corners = corners.reshape(-1, 2) + np.array([max(0, left), max(0, top)], dtype=np.float32)
+            points.append(corners)
+            owners.extend([index] * len(corners))
+
+        if not points:
+            return
+
+        points = np.vstack(points).astype(np.float32).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None)
+        if moved is None:
+            return
+
+        owners = np.array(owners)
+        ok = status.ravel() == 1
+        flow = (moved - points).reshape(-1, 2)
+        height, width = gray.shape[:2]
+
+        for index, track in enumerate(self.tracks):
+            selected = ok & (owners == index)
+            if selected.sum() < 3:
+                continue
+            dx, dy = np.median(flow[selected], axis=0)
+            top, right, bottom, left = track.location
+            dx = int(round(float(np.clip(dx, -left, width - right))))
+            dy = int(round(float(np.clip(dy, -top, height - bottom))))
+            track.location = (top + dy, right + dx, bottom + dy, left + dx)
+
+    def needs_encoding(self, track: Track) -> bool:
+        """
+        Whether a track seen this frame should be (re-)encoded:
+        new tracks, tracks still collecting identity votes (only while a
+        voter is attached, see voting), tracks whose
+        face quality clearly improved, low confidence tracks (retried
+        every few frames) and stale encodings.
+        """
+        if track.misses > 0:
+            return False
+        if track.encoding is None:
+            return True
+        if self.voting and track.decided_at is None and settings.VOTE_MIN_AGREE > 1:
+            return True
+        if track.quality > track.encoded_quality * (1.0 + settings.TRACKER_QUALITY_GAIN):
+            return True
+        if not track.is_confident and track.frames_since_encode >= settings.TRACKER_RETRY_FRAMES:
+            return True
+        max_age = settings.TRACKER_MAX_ENCODING_AGE
+        return max_age > 0 and time.time() - track.encoded_at >= max_age
+
+    def reset(self):
+        self.tracks = []
+        self._prev_gray = None
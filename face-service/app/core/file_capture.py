@@ -0,0 +1,96 @@
+import os
+import time
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+DEFAULT_IMAGE_FPS = 10.0
+
+
+class FileCapture:
+    """cv2.VideoCapture-compatible replay of a video file or image directory.
+
+    playback="realtime" paces frames at the source frame rate (fps
+    overrides it); "fast" returns frames as quickly as they are read.
+    With loop=True the source restarts at the end, otherwise read()
+    returns False and finished becomes True.
+    """
+
+    def __init__(self, path: str, playback: str = "realtime", loop: bool = True, fps: float = 0.0):
+        self.path = path
+        self.realtime = playback != "fast"
+        self.loop = loop
+        self.finished = False
+        self.frames_read = 0
+        self.loops = 0
+
+        self._images: List[str] = []
+        self._video: Optional[cv2.VideoCapture] = None
+        self._position = 0
+
+        if os.path.isdir(path):
+            self._images = sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self.fps = fps or DEFAULT_IMAGE_FPS
+        else:
+            self._video = cv2.VideoCapture(path)
+            self.fps = fps or self._video.get(cv2.CAP_PROP_FPS) or 25.0
+
+        self._started_at: Optional[float] = None
+
+    def isOpened(self) -> bool:
+        if self._video is not None:
+            return self._video.isOpened()
+        return bool(self._images)
+
+    def set(self, prop_id: int, value) -> bool:
+        return False
+
+    def _next_frame(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self._video is not None:
+            return self._video.read()
+
+        while self._position < len(self._images):
+            frame = cv2.imread(self._images[self._position])
+            self._position += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def _rewind(self):
+        if self._video is not None:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._position = 0
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.finished:
+            return False, None
+
+        ret, frame = self._next_frame()
+        if not ret and self.loop and self.frames_read > 0:
+            self._rewind()
+            self.loops += 1
+            ret, frame = self._next_frame()
+        if not ret:
+            self.finished = True
+            return False, None
+
+        if self.realtime:
+            # Pace against the playback clock so decode time doesn't accumulate drift
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            due = self._started_at + self.frames_read / self.fps
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        self.frames_read += 1
+        return True, frame
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
@@ -0,0 +1,201 @@
+import os
+import re
+import secrets
+import struct
+import threading
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+# Shared-memory ring of fixed-size frame slots, one ring per camera:
+#
+#   header: magic "FBUS" | slots u32 | slot_bytes u64 | latest sequence u64 | closed u8
+#   slot:   sequence u64 | timestamp f64 | height u32 | width u32 | channels u32 | pad u32 | pixels
+#
+# The capture process is the only writer. A slot's sequence is cleared before
+# its pixels are overwritten and set once they are complete, so readers can
+# take a zero-copy view and afterwards check it still holds the frame they
+# asked for (see FrameRing.is_current).
+MAGIC = b"FBUS"
+RING_HEADER = struct.Struct("<4sIQQB")
+RING_HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QdIIII")
+SLOT_HEADER_SIZE = 64
+
+
+def ring_name(camera_id: str) -> str:
+    """
+    A new shared-memory segment name for a camera's ring. The capture
+    process's pid and a random token make it unique per ring, so a ring
+    never collides with (or replaces) one another process still publishes.
+    """
+    camera = re.sub(r'[^A-Za-z0-9_-]', '_', camera_id)
+    return f"{settings.FRAME_BUS_PREFIX}-{os.getpid()}-{secrets.token_hex(4)}-{camera}"
+
+
+class FrameRing:
+    """A camera's frame ring in shared memory.
+
+    Created by the capture process with create(); inference processes
+    attach() by the ring's segment name (FrameRing.name, passed along with
+    each frame's sequence) and read frames without copying or pickling.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        magic, self.slots, self.slot_bytes, _, _ = RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory segment {shm.name} is not a frame ring")
+        self.slot_stride = SLOT_HEADER_SIZE + self.slot_bytes
+        self.published = 0
+        self.oversized = 0
+
+    @classmethod
+    def create(cls, camera_id: str, slots: int = None, slot_bytes: int = None) -> "FrameRing":
+        slots = slots or settings.FRAME_BUS_SLOTS
+        slot_bytes = slot_bytes or settings.FRAME_BUS_MAX_WIDTH * settings.FRAME_BUS_MAX_HEIGHT * 3
+        size = RING_HEADER_SIZE + slots * (SLOT_HEADER_SIZE + slot_bytes)
+        # Names are unique per ring; a FileExistsError is a real collision and
+        # is raised rather than unlinking a segment this process doesn't own
+        shm = shared_memory.SharedMemory(name=ring_name(camera_id), create=True, size=size)
+        RING_HEADER.pack_into(shm.buf, 0, MAGIC, slots, slot_bytes, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        # Readers must not unlink the segment when they exit, but Python < 3.13
+        # registers every attached segment with the resource tracker (which
+        # forked workers share with the capture process), so skip registration
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+        return cls(shm, owner=False)
+
+    def _slot_offset(self, sequence: int) -> int:
+        return RING_HEADER_SIZE + (sequence % self.slots) * self.slot_stride
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def latest_sequence(self) -> int:
+        return struct.unpack_from("<Q", self.shm.buf, 16)[0]
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.shm.buf[24])
+
+    def write(self, frame: np.ndarray, sequence: int, timestamp: Optional[float] = None) -> bool:
+        """Publish a frame under sequence (must be increasing). Returns False if it doesn't fit a slot"""
+        if frame.nbytes > self.slot_bytes:
+            self.oversized += 1
+            return False
+
+        offset = self._slot_offset(sequence)
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        # Invalidate the slot, copy pixels, then stamp the sequence last
+        struct.pack_into("<Q", self.shm.buf, offset, 0)
+        target = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset + SLOT_HEADER_SIZE)
+        np.copyto(target, frame)
+        SLOT_HEADER.pack_into(
+            self.shm.buf, offset, 0, timestamp or time.time(), height, width, channels, 0
+        )
+        struct.pack_into("<Q", self.shm.buf, offset, sequence)
+        struct.pack_into("<Q", self.shm.buf, 16, sequence)
+        self.published += 1
+        return True
+
+    def read(self, sequence: Optional[int] = None) -> Tuple[Optional[np.ndarray], int, float]:
+        """
+        Zero-copy view of a frame (the latest if sequence is None).
+        Returns (frame, sequence, timestamp); frame is None if the slot no
+        longer holds that sequence. The view is read-only and is only valid
+        while is_current(sequence) holds.
+        """
+        if sequence is None:
+            sequence = self.latest_sequence
+        if sequence <= 0:
+            return None, sequence, 0.0
+
+        offset = self._slot_offset(sequence)
+        slot_sequence, timestamp, height, width, channels, _ = SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if slot_sequence != sequence:
+            return None, sequence, 0.0
+
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset + SLOT_HEADER_SIZE)
+        frame.flags.writeable = False
+        return frame, sequence, timestamp
+
+    def is_current(self, sequence: int) -> bool:
+        """Whether the slot for sequence still holds it (i.e. a view taken earlier is intact)"""
+        return struct.unpack_from("<Q", self.shm.buf, self._slot_offset(sequence))[0] == sequence
+
+    def close(self):
+        if self.shm.buf is None:
+            return  # Already closed
+        if self.owner:
+            self.shm.buf[24] = 1
+        try:
+            self.shm.close()
+        except BufferError:
+            # A frame view is still alive; the mapping goes away with the process
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.shm.name,
+            "slots": self.slots,
+            "slot_mb": self.slot_bytes / 1e6,
+            "latest_sequence": self.latest_sequence,
+            "published": self.published,
+            "oversized": self.oversized
+        }
+
+
+# Rings attached by this (inference) process, keyed by segment name
+_attached: Dict[str, FrameRing] = {}
+_attached_lock = threading.Lock()
+
+
+def get_ring(name: str) -> Optional[FrameRing]:
+    """
+    Attach (once per process) to a ring by segment name. Rings whose
+    publisher has closed them are detached the next time a ring is looked up.
+    """
+    with _attached_lock:
+        for attached_name, attached in list(_attached.items()):
+            if attached.closed:
+                attached.close()
+                del _attached[attached_name]
+        ring = _attached.get(name)
+        if ring is None:
+            try:
+                ring = FrameRing.attach(name)
+            except FileNotFoundError:
+                return None
+            _attached[name] = ring
+        return ring
+
+
+def read_frame(name: str, sequence: int) -> Optional[np.ndarray]:
+    """Zero-copy view of a published frame, or None if it's gone"""
+    ring = get_ring(name)
+    if ring is None:
+        return None
+    return ring.read(sequence)[0]
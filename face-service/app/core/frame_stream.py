@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+import cv2
+import numpy as np
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.camera_manager import camera_manager
+
+MJPEG_BOUNDARY = "frame"
+
+
+def encode_jpeg(frame: np.ndarray, width: int = 0, quality: int = 80) -> Optional[bytes]:
+    """Encode a frame as JPEG, downscaled to width (0 = full resolution)"""
+    height, frame_width = frame.shape[:2]
+    if 0 < width < frame_width:
+        size = (width, max(1, round(height * width / frame_width)))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    success, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not success:
+        return None
+    return encoded.tobytes()
+
+
+def multipart_part(jpeg: bytes) -> bytes:
+    return (
+        f"--{MJPEG_BOUNDARY}\r\n"
+        f"Content-Type: image/jpeg\r\n"
+        f"Content-Length: {len(jpeg)}\r\n\r\n"
+    ).encode("ascii") + jpeg + b"\r\n"
+
+
+class JpegCache:
+    """Encoded frames keyed by (camera, frame sequence, width, quality).
+
+    Concurrent requests for the same key wait for a single encode. Only the
+    newest frame of each camera is kept; entries for older frames are
+    evicted as soon as a new sequence is requested.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int, int, int], Future] = {}
+        self._latest: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, camera_id: str, sequence: int, frame: np.ndarray, width: int = 0, quality: int = 80) -> Optional[bytes]:
+        key = (camera_id, sequence, width, quality)
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                if self._latest.get(camera_id) != sequence:
+                    # New frame (or a reconnected camera restarting its sequence)
+                    self._latest[camera_id] = sequence
+                    for stale in [k for k in self._entries if k[0] == camera_id and k[1] != sequence]:
+                        del self._entries[stale]
+                future = Future()
+                self._entries[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                future.set_result(encode_jpeg(frame, width, quality))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0
+            }
+
+
+jpeg_cache = JpegCache()
+
+
+class FrameBroadcaster:
+    """Live JPEG feed for one camera, shared by every connected viewer.
+
+    While at least one viewer is connected, a task samples the camera's
+    newest frame at STREAM_FPS, encodes it once and wakes all viewers.
+    Slow viewers simply skip to the newest frame.
+
+    When the camera stops producing frames, each viewer is re-sent the last
+    frame every STREAM_KEEPALIVE_SECONDS (so proxies and clients don't drop
+    an otherwise silent connection), and its stream ends once there has
+    been no new frame for STREAM_IDLE_TIMEOUT.
+    """
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.viewers = 0
+        self.jpeg: Optional[bytes] = None
+        self.sequence = 0
+        self.frames_encoded = 0
+        self.keepalives = 0
+        self.streams_timed_out = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_running(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        interval = 1.0 / max(settings.STREAM_FPS, 0.1)
+        last_camera_sequence = None
+
+        while self.viewers > 0:
+            started_at = time.monotonic()
+            camera = camera_manager.get_camera(self.camera_id)
+            frame, camera_sequence, _ = camera.get_latest() if camera and camera.is_connected else (None, 0, 0.0)
+
+            if frame is not None and camera_sequence != last_camera_sequence:
+                jpeg = await asyncio.to_thread(
+                    jpeg_cache.get, self.camera_id, camera_sequence, frame,
+                    settings.STREAM_WIDTH, settings.STREAM_JPEG_QUALITY
+                )
+                if jpeg is not None:
+                    last_camera_sequence = camera_sequence
+                    async with self._condition:
+                        self.jpeg = jpeg
+                        self.sequence += 1
+                        self.frames_encoded += 1
+                        self._condition.notify_all()
+
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started_at)))
+
+    def _wait_timeout(self, frame_at: float, sent_at: float) -> Optional[float]:
+        """Seconds until the next keepalive or the idle timeout, whichever is first (None = no limit)"""
+        now = time.monotonic()
+        deadlines = []
+        if settings.STREAM_KEEPALIVE_SECONDS > 0:
+            deadlines.append(sent_at + settings.STREAM_KEEPALIVE_SECONDS)
+        if settings.STREAM_IDLE_TIMEOUT > 0:
+            deadlines.append(frame_at + settings.STREAM_IDLE_TIMEOUT)
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    async def frames(self) -> AsyncIterator[bytes]:
+        """
+        Yield each newly encoded JPEG (and keepalive repeats of the last one)
+        until the viewer disconnects or the camera stays silent for STREAM_IDLE_TIMEOUT
+        """
+        self.viewers += 1
+        self._ensure_running()
+        last_sequence = 0
+        frame_at = sent_at = time.monotonic()
+        try:
+            while True:
+                async with self._condition:
+                    try:
+                        await asyncio.wait_for(
+                            self._condition.wait_for(lambda: self.sequence != last_sequence),
+                            self._wait_timeout(frame_at, sent_at)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    jpeg, fresh, last_sequence = self.jpeg, self.sequence != last_sequence, self.sequence
+
+                now = time.monotonic()
+                if fresh:
+                    frame_at = sent_at = now
+                    yield jpeg
+                elif settings.STREAM_IDLE_TIMEOUT > 0 and now - frame_at >= settings.STREAM_IDLE_TIMEOUT:
+                    self.streams_timed_out += 1
+                    return
+                elif (
+                    jpeg is not None
+                    and settings.STREAM_KEEPALIVE_SECONDS > 0
+                    and now - sent_at >= settings.STREAM_KEEPALIVE_SECONDS
+                ):
+                    sent_at = now
+                    self.keepalives += 1
+                    yield jpeg
+        finally:
+            self.viewers -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "viewers": self.viewers,
+            "frames_encoded": self.frames_encoded,
+            "keepalives": self.keepalives,
+            "streams_timed_out": self.streams_timed_out,
+            "running": self._task is not None and not self._task.done()
+        }
+
+
+_broadcasters: Dict[str, FrameBroadcaster] = {}
+
+
+def get_broadcaster(camera_id: str) -> FrameBroadcaster:
+    if camera_id not in _broadcasters:
+        _broadcasters[camera_id] = FrameBroadcaster(camera_id)
+    return _broadcasters[camera_id]
+
+
+def stream_stats() -> Dict:
+    return {
+        "streams": {name: broadcaster.stats() for name, broadcaster in _broadcasters.items()},
+        "jpeg_cache": jpeg_cache.stats()
+    }
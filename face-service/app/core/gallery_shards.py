@@ -0,0 +1,553 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# One immutable shared-memory segment per shard and generation:
+#
+#   header: magic "GSHD" | rows u32 | dim u32 | generation u64
+#   body:   embeddings f32[rows, dim] | squared norms f32[rows] | visitor codes i32[rows]
+#
+# A changed shard is written to a new segment and workers switch to it on
+# their next query, so they never see a partially written shard. A replaced
+# segment is unlinked only once no search still refers to it.
+MAGIC = b"GSHD"
+SEGMENT_HEADER = struct.Struct("<4sIIQ")
+SEGMENT_HEADER_SIZE = 64
+
+Match = Tuple[str, str, float]  # (face_id, visitor_id, distance)
+
+
+def segment_name(shard: int, generation: int) -> str:
+    # The pid keeps segments of several service processes apart
+    return f"{settings.GALLERY_SHARD_PREFIX}-{os.getpid()}-{shard}-{generation}"
+
+
+def segment_views(buffer, rows: int, dim: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(embeddings, squared norms, visitor codes) views over a segment's body"""
+    offset = SEGMENT_HEADER_SIZE
+    matrix = np.ndarray((rows, dim), dtype=np.float32, buffer=buffer, offset=offset)
+    offset += matrix.nbytes
+    sq_norms = np.ndarray(rows, dtype=np.float32, buffer=buffer, offset=offset)
+    offset += sq_norms.nbytes
+    codes = np.ndarray(rows, dtype=np.int32, buffer=buffer, offset=offset)
+    return matrix, sq_norms, codes
+
+
+def attach_segment(name: str) -> shared_memory.SharedMemory:
+    # Workers must not unlink segments when they exit (see FrameRing.attach)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def search_segment(
+    matrix: np.ndarray,
+    sq_norms: np.ndarray,
+    codes: np.ndarray,
+    query: np.ndarray,
+    count: int
+) -> List[Tuple[int, float]]:
+    """Closest (row, distance) per visitor code, for the count closest visitors"""
+    if not len(matrix) or count <= 0:
+        return []
+    sq_dist = sq_norms - 2.0 * (matrix @ query) + np.dot(query, query)
+    distances = np.sqrt(np.maximum(sq_dist, 0.0))
+
+    # Over-select so duplicate faces of one visitor don't crowd out others
+    k = min(len(distances), count * 4)
+    order = np.argpartition(distances, k - 1)[:k]
+    order = order[np.argsort(distances[order])]
+
+    best = []
+    seen = set()
+    for row in order.tolist():
+        code = int(codes[row])
+        if code in seen:
+            continue
+        seen.add(code)
+        best.append((row, float(distances[row])))
+        if len(best) >= count:
+            break
+    return best
+
+
+def shard_worker(conn):
+    """Worker process loop: answers ("search", request id, segment, query, count) with (request id, search_segment())"""
+    attached: Dict[str, Tuple[shared_memory.SharedMemory, tuple]] = {}
+    try:
+        conn.send("ready")
+    except OSError:
+        return  # Stopped before it finished starting
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message[0] == "stop":
+            break
+
+        _, request_id, name, query, count = message
+        try:
+            if name not in attached:
+                # Searches in flight may still be on the previous generation
+                while len(attached) >= 2:
+                    attached.pop(next(iter(attached)))[0].close()
+                shm = attach_segment(name)
+                _, rows, dim, _ = SEGMENT_HEADER.unpack_from(shm.buf, 0)
+                attached[name] = (shm, segment_views(shm.buf, rows, dim))
+            result = search_segment(*attached[name][1], query, count)
+        except Exception as e:
+            result = e
+        try:
+            conn.send((request_id, result))
+        except OSError:
+            break  # The service went away
+
+    for shm, _ in attached.values():
+        shm.close()
+
+
+class ShardPublication:
+    """One published generation of a shard: its segment plus row-aligned ids"""
+
+    def __init__(self, shard: int, generation: int, face_ids: List[str], visitor_ids: List[str]):
+        self.shard = shard
+        self.generation = generation
+        self.name = segment_name(shard, generation)
+        self.face_ids = face_ids
+        self.visitor_ids = visitor_ids
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.views: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self.readers = 0  # Searches in flight on this generation (under GalleryShards._lock)
+        self.retired = False  # Replaced; released when the last reader finishes
+
+    @property
+    def rows(self) -> int:
+        return len(self.face_ids)
+
+    def write(self, matrix: np.ndarray, sq_norms: np.ndarray, codes: np.ndarray):
+        rows, dim = matrix.shape
+        size = SEGMENT_HEADER_SIZE + rows * (dim + 2) * 4
+        self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        SEGMENT_HEADER.pack_into(self.shm.buf, 0, MAGIC, rows, dim, self.generation)
+        self.views = segment_views(self.shm.buf, rows, dim)
+        for view, values in zip(self.views, (matrix, sq_norms, codes)):
+            np.copyto(view, values)
+
+    def release(self):
+        if self.shm is None:
+            return
+        self.views = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = None
+
+
+class Shard:
+    """Parent-side state of one shard: its visitors, publications and worker"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.visitors: Set[str] = set()
+        self.rows = 0
+        self.current: Optional[ShardPublication] = None
+        self.previous: Optional[ShardPublication] = None  # Retired once the next generation replaces it
+        self.generation = 0
+        self.process = None
+        self.conn = None
+        self.reader: Optional[threading.Thread] = None
+        self.ready = False  # The worker has finished starting up
+        # Searches waiting for this worker, by request id; guarded by send_lock
+        self.pending: Dict[int, Future] = {}
+        self.send_lock = threading.Lock()
+        self.restart_lock = threading.Lock()
+        self.restarts = 0
+        self.fallbacks = 0
+
+
+class GalleryShards:
+    """Scatter-gather gallery search over GALLERY_SHARDS worker processes.
+
+    Visitors are spread over the shards (so each visitor's faces live in
+    exactly one); every shard is a shared-memory segment read zero-copy by
+    its own worker process. A query is sent to all workers at once, each
+    returns its per-visitor top-k, and the results are merged. Shards scan
+    the raw float32 embeddings exactly, so the IVF index, quantization and
+    visitor summaries can't be combined with them (start() refuses).
+
+    Requests carry an id and a reader thread per worker hands each answer
+    to the search waiting for it, so searches from several callers are in
+    flight at the same time.
+
+    The gallery store stays the source of truth: sync() republishes only
+    the shards whose visitors changed. New visitors go to the least loaded
+    shard, and all visitors are reassigned when the largest shard grows
+    past GALLERY_SHARD_IMBALANCE times the mean.
+    """
+
+    def __init__(self, count: int = None):
+        self.count = max(count if count is not None else settings.GALLERY_SHARDS, 0)
+        self.shards = [Shard(index) for index in range(self.count)]
+        self.assignments: Dict[str, int] = {}
+        self._faces: Dict[str, int] = {}  # Faces per assigned visitor, as last published
+        self.running = False
+        self.rebalances = 0
+        self.publishes = 0
+        self.searches = 0
+        self.publish_latency = LatencyHistogram()
+        self.search_latency = LatencyHistogram()
+        self._source = None
+        self._changed: Set[str] = set()
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()  # Publishing
+        self._request_ids = itertools.count(1)
+
+    def start(self):
+        if self.running or not self.count:
+            return
+        conflicts = []
+        if settings.GALLERY_INDEX_TYPE.lower() != "flat":
+            conflicts.append(f"GALLERY_INDEX_TYPE={settings.GALLERY_INDEX_TYPE}")
+        if settings.GALLERY_QUANTIZATION.lower() != "none":
+            conflicts.append(f"GALLERY_QUANTIZATION={settings.GALLERY_QUANTIZATION}")
+        if settings.GALLERY_SUMMARIES_ENABLED:
+            conflicts.append("GALLERY_SUMMARIES_ENABLED=true")
+        if conflicts:
+            raise ValueError(
+                f"GALLERY_SHARDS={self.count} searches exact float32 shards and can't be combined with "
+                + ", ".join(conflicts)
+            )
+        for shard in self.shards:
+            self._start_worker(shard)
+        self.running = True
+        logger.info("Gallery shard workers running: %d", self.count)
+
+    def _start_worker(self, shard: Shard):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=shard_worker,
+            args=(child_conn,),
+            name=f"gallery-shard-{shard.index}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        pending: Dict[int, Future] = {}
+        reader = threading.Thread(
+            target=self._read,
+            args=(shard, process, parent_conn, pending),
+            name=f"gallery-shard-{shard.index}-reader",
+            daemon=True
+        )
+        with shard.send_lock:
+            shard.process, shard.conn, shard.pending, shard.ready = process, parent_conn, pending, False
+        shard.reader = reader
+        reader.start()
+
+    @staticmethod
+    def _read(shard: Shard, process, conn, pending: Dict[int, Future]):
+        """Reader thread of one worker: resolves the futures of its answered requests"""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message == "ready":
+                shard.ready = shard.process is process
+                continue
+            request_id, result = message
+            with shard.send_lock:
+                future = pending.pop(request_id, None)
+            if future is not None:
+                future.set_result(result)
+
+        # The worker exited: searches still waiting on it fall back to the parent
+        with shard.send_lock:
+            waiting = list(pending.values())
+            pending.clear()
+        for future in waiting:
+            future.set_exception(EOFError(f"shard {shard.index} worker exited"))
+
+    def _stop_worker(self, shard: Shard):
+        with shard.send_lock:
+            process, conn, reader = shard.process, shard.conn, shard.reader
+            shard.process, shard.conn, shard.reader, shard.ready = None, None, None, False
+            if conn is not None:
+                try:
+                    conn.send(("stop",))
+                except (OSError, ValueError):
+                    pass
+        if process is not None:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=2.0)
+        # Once the worker is gone the reader sees EOF; only then is the pipe closed
+        if reader is not None:
+            reader.join(timeout=2.0)
+        if conn is not None:
+            conn.close()
+
+    def _restart_worker(self, shard: Shard, process):
+        """Replace a failed worker, unless a concurrent search already did"""
+        with shard.restart_lock:
+            if shard.process is not process:
+                return
+            self._stop_worker(shard)
+            if self.running:
+                self._start_worker(shard)
+                shard.restarts += 1
+
+    def stop(self):
+        self.running = False
+        for shard in self.shards:
+            with shard.restart_lock:
+                self._stop_worker(shard)
+        with self._lock:
+            for shard in self.shards:
+                for publication in (shard.current, shard.previous):
+                    if publication is not None:
+                        self._retire(publication)
+                shard.current = shard.previous = None
+            self._source = None
+
+    @staticmethod
+    def _retire(publication: ShardPublication):
+        """Release a replaced generation now, or when its last search finishes (under _lock)"""
+        publication.retired = True
+        if not publication.readers:
+            publication.release()
+
+    def _least_loaded(self) -> Shard:
+        return min(self.shards, key=lambda shard: (shard.rows, shard.index))
+
+    def sync(self, store):
+        """
+        Bring the shards in line with an EmbeddingStore (call under the gallery
+        lock, after each change). Only the shards whose visitors changed are
+        republished; searches keep reading the previous generation meanwhile.
+        """
+        if not self.running:
+            return
+        with self._lock:
+            dirty: Set[int] = set()
+            if store is not self._source:
+                # New store (full load or snapshot restore): assign everyone again
+                self._source = store
+                self._changed = store.watch()
+                self._changed.update(store.visitor_rows)
+                self.assignments.clear()
+                self._faces.clear()
+                for shard in self.shards:
+                    shard.visitors.clear()
+                    shard.rows = 0
+                dirty.update(range(self.count))
+
+            changed = set(self._changed)
+            self._changed.clear()
+            for visitor_id in changed:
+                faces = len(store.visitor_rows.get(visitor_id, ()))
+                index = self.assignments.pop(visitor_id, None)
+                if index is not None:
+                    shard = self.shards[index]
+                    shard.visitors.discard(visitor_id)
+                    shard.rows -= self._faces.pop(visitor_id)
+                    dirty.add(index)
+                if faces:
+                    # Known visitors keep their shard; new ones go where there is room
+                    shard = self.shards[index] if index is not None else self._least_loaded()
+                    shard.visitors.add(visitor_id)
+                    shard.rows += faces
+                    self.assignments[visitor_id] = shard.index
+                    self._faces[visitor_id] = faces
+                    dirty.add(shard.index)
+
+            if self._imbalanced():
+                dirty.update(self._rebalance())
+            for index in sorted(dirty):
+                self._publish(self.shards[index], store)
+
+    def _imbalanced(self) -> bool:
+        total = sum(shard.rows for shard in self.shards)
+        if self.count < 2 or total < self.count * 100:
+            return False
+        return max(shard.rows for shard in self.shards) > settings.GALLERY_SHARD_IMBALANCE * total / self.count
+
+    def _rebalance(self) -> Set[int]:
+        """Reassign every visitor, largest first, to the least loaded shard; returns changed shards"""
+        previous = {shard.index: set(shard.visitors) for shard in self.shards}
+        for shard in self.shards:
+            shard.visitors.clear()
+            shard.rows = 0
+        for faces, visitor_id in sorted(((faces, visitor_id) for visitor_id, faces in self._faces.items()), reverse=True):
+            shard = self._least_loaded()
+            shard.visitors.add(visitor_id)
+            shard.rows += faces
+            self.assignments[visitor_id] = shard.index
+        self.rebalances += 1
+        return {shard.index for shard in self.shards if shard.visitors != previous[shard.index]}
+
+    def _publish(self, shard: Shard, store):
+        started_at = time.perf_counter()
+        rows, face_ids, visitor_ids, codes = [], [], [], []
+        for code, visitor_id in enumerate(sorted(shard.visitors)):
+            for row in sorted(store.visitor_rows.get(visitor_id, ())):
+                rows.append(row)
+                face_ids.append(store.face_ids[row])
+                visitor_ids.append(visitor_id)
+                codes.append(code)
+
+        shard.generation += 1
+        publication = ShardPublication(shard.index, shard.generation, face_ids, visitor_ids)
+        if rows:
+            rows = np.array(rows, dtype=np.int64)
+            publication.write(store.matrix[rows], store.sq_norms[rows], np.array(codes, dtype=np.int32))
+
+        if shard.previous is not None:
+            self._retire(shard.previous)
+        shard.previous, shard.current = shard.current, publication
+        self.publishes += 1
+        self.publish_latency.observe(time.perf_counter() - started_at)
+
+    def search(self, query: np.ndarray, count: int) -> List[Match]:
+        """Per-visitor best matches across all shards, closest first (at most count)"""
+        started_at = time.perf_counter()
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            # Held until the gather is done, so a concurrent sync can't unlink a
+            # segment a worker is about to attach (or the parent falls back to)
+            publications = [shard.current for shard in self.shards]
+            for publication in publications:
+                if publication is not None:
+                    publication.readers += 1
+        try:
+            matches = self._scatter_gather(publications, query, count)
+        finally:
+            with self._lock:
+                for publication in publications:
+                    if publication is not None:
+                        publication.readers -= 1
+                        if publication.retired and not publication.readers:
+                            publication.release()
+                self.searches += 1
+
+        matches.sort(key=lambda match: match[2])
+        self.search_latency.observe(time.perf_counter() - started_at)
+        return matches[:count]
+
+    def _scatter_gather(self, publications: List[Optional[ShardPublication]], query: np.ndarray, count: int) -> List[Match]:
+        # Scatter, then gather: the workers scan their shards in parallel
+        matches: List[Match] = []
+        sent = []
+        for shard, publication in zip(self.shards, publications):
+            if publication is None or not publication.rows:
+                continue
+            process = shard.process
+            if not self._is_ready(shard):
+                matches.extend(self._search_locally(shard, publication, query, count))
+                continue
+            try:
+                sent.append((shard, publication, process, self._send(shard, publication, query, count)))
+            except (OSError, ValueError):
+                matches.extend(self._search_locally(shard, publication, query, count, failed=process))
+
+        for shard, publication, process, future in sent:
+            try:
+                result = future.result(timeout=settings.GALLERY_SHARD_TIMEOUT)
+                if isinstance(result, Exception):
+                    raise result
+            except Exception as e:
+                logger.warning("Gallery shard %d failed (%r); searching it in-process", shard.index, e)
+                matches.extend(self._search_locally(shard, publication, query, count, failed=process))
+                continue
+            matches.extend(
+                (publication.face_ids[row], publication.visitor_ids[row], distance)
+                for row, distance in result
+            )
+        return matches
+
+    def _send(self, shard: Shard, publication: ShardPublication, query: np.ndarray, count: int) -> Future:
+        request_id = next(self._request_ids)
+        future: Future = Future()
+        with shard.send_lock:
+            if shard.conn is None:
+                raise OSError(f"shard {shard.index} has no worker")
+            shard.pending[request_id] = future
+            try:
+                shard.conn.send(("search", request_id, publication.name, query, count))
+            except Exception:
+                shard.pending.pop(request_id, None)
+                raise
+        return future
+
+    def _is_ready(self, shard: Shard) -> bool:
+        """Whether the worker can take queries (it announces itself once its imports are done)"""
+        return shard.ready
+
+    def _search_locally(
+        self,
+        shard: Shard,
+        publication: ShardPublication,
+        query: np.ndarray,
+        count: int,
+        failed=None
+    ) -> List[Match]:
+        """Search a shard from the parent's own mapping; a failed worker process is replaced"""
+        shard.fallbacks += 1
+        if failed is not None:
+            self._restart_worker(shard, failed)
+        # The search holds a reference, so the publication's mapping is still there
+        return [
+            (publication.face_ids[row], publication.visitor_ids[row], distance)
+            for row, distance in search_segment(*publication.views, query, count)
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "shards": self.count,
+            "running": self.running,
+            "rebalances": self.rebalances,
+            "publishes": self.publishes,
+            "searches": self.searches,
+            "publish_ms": self.publish_latency.stats(buckets=False),
+            "search_ms": self.search_latency.stats(buckets=False),
+            "workers": [
+                {
+                    "shard": shard.index,
+                    "visitors": len(shard.visitors),
+                    "rows": shard.rows,
+                    "generation": shard.generation,
+                    "alive": shard.process is not None and shard.process.is_alive(),
+                    "restarts": shard.restarts,
+                    "fallbacks": shard.fallbacks
+                }
+                for shard in self.shards
+            ]
+        }
+
+
+# Singleton instance
+gallery_shards = GalleryShards()
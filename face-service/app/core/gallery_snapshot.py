@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.face_gallery import EMBEDDING_DIM, QUANTIZED_DTYPES, EmbeddingStore, face_gallery
+from app.core.latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 2  # 2: face checksums for GallerySync.reconcile()
+CURRENT_FILE = "CURRENT"
+
+# Rows written after a snapshot's high-water mark (naive UTC, like the columns)
+CHANGED_VISITORS_QUERY = "SELECT id FROM visitors WHERE updated_at > :since"
+CHANGED_FACES_QUERY = "SELECT id, visitor_id FROM faces WHERE created_at > :since"
+
+
+def _configured_quantization() -> str:
+    quantization = settings.GALLERY_QUANTIZATION.lower()
+    return quantization if quantization in QUANTIZED_DTYPES else "none"
+
+
+class GallerySnapshot:
+    """Versioned on-disk copy of face_gallery for fast restarts.
+
+    Each save writes one directory under GALLERY_SNAPSHOT_PATH (v000001,
+    v000002, ...) holding every store array as .npy (embedding matrix,
+    norms, quantized codes, face and visitor ids, index structures) plus
+    meta.json, the visitor names and the face checksums, then points the
+    CURRENT file at it.
+    A half-written snapshot is never visible: the directory is renamed
+    into place and CURRENT is replaced atomically.
+
+    On startup the arrays are opened with np.load(mmap_mode="r"), so the
+    gallery is searchable without reading, decoding or re-indexing every
+    embedding. Only faces and visitors written after the snapshot's
+    high-water mark are then re-read from the database. Deletions and
+    embeddings updated in place carry no timestamp, so load_or_restore()
+    follows up with GallerySync.reconcile() before the gallery is reported
+    loaded.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.GALLERY_SNAPSHOT_PATH
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._requested = threading.Event()
+        self._saved_version: Optional[int] = None
+        self.current: Optional[str] = None
+        self.saves = 0
+        self.restored = False
+        self.catchup_faces = 0
+        self.catchup_visitors = 0
+        self.last_error: Optional[str] = None
+        self.save_latency = LatencyHistogram()
+        self.restore_latency = LatencyHistogram()  # Snapshot opened -> caught up with the database
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="gallery-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._requested.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def request(self):
+        """Save as soon as possible (e.g. right after a full load from the database)"""
+        self._requested.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._requested.wait(settings.GALLERY_SNAPSHOT_INTERVAL)
+            self._requested.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.save()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Gallery snapshot error: %s", e)
+
+    def _versions(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if name.startswith("v") and name[1:].isdigit() and os.path.isdir(os.path.join(self.path, name))
+        )
+
+    def _current_directory(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        directory = os.path.join(self.path, name)
+        return directory if name and os.path.isdir(directory) else None
+
+    def save(self) -> Optional[str]:
+        """Write a new snapshot if the gallery changed since the last one; returns its directory"""
+        if not face_gallery.is_loaded or face_gallery.version == self._saved_version:
+            return None
+
+        started_at = time.perf_counter()
+        arrays, visitor_names, checksums, high_water_mark, version = face_gallery.snapshot()
+        if high_water_mark is None:
+            return None
+
+        versions = self._versions()
+        name = f"v{int(versions[-1][1:]) + 1 if versions else 1:06d}"
+        directory = os.path.join(self.path, name)
+        staging = directory + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        for key, array in arrays.items():
+            np.save(os.path.join(staging, f"{key}.npy"), array, allow_pickle=False)
+        with open(os.path.join(staging, "visitor_names.json"), "w") as f:
+            json.dump(visitor_names, f)
+        with open(os.path.join(staging, "checksums.json"), "w") as f:
+            json.dump(checksums, f)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({
+                "format": SNAPSHOT_FORMAT,
+                "version": version,
+                "created_at": datetime.utcnow().isoformat(),
+                "high_water_mark": high_water_mark.isoformat(),
+                "size": int(arrays["alive"].sum()),
+                "dim": EMBEDDING_DIM,
+                "quantization": _configured_quantization() if "codes" in arrays else "none",
+                "index_type": settings.GALLERY_INDEX_TYPE.lower()
+            }, f)
+        os.rename(staging, directory)
+
+        current = os.path.join(self.path, CURRENT_FILE)
+        with open(current + ".tmp", "w") as f:
+            f.write(name)
+        os.replace(current + ".tmp", current)
+
+        # Older versions may still be mapped by this process; unlinking keeps those mappings valid
+        keep = max(settings.GALLERY_SNAPSHOT_KEEP, 1)
+        for old in (versions + [name])[:-keep]:
+            shutil.rmtree(os.path.join(self.path, old), ignore_errors=True)
+
+        self._saved_version = version
+        self.current = name
+        self.saves += 1
+        self.save_latency.observe(time.perf_counter() - started_at)
+        return directory
+
+    def restore(self) -> bool:
+        """
+        Replace face_gallery with the current snapshot and catch up on later
+        database changes (face_gallery is left unloaded until reconciled).
+        Returns False when there is no usable snapshot.
+        """
+        directory = self._current_directory()
+        if directory is None:
+            return False
+
+        started_at = time.perf_counter()
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        quantization = _configured_quantization()
+        if meta.get("format") != SNAPSHOT_FORMAT or meta.get("dim") != EMBEDDING_DIM:
+            logger.warning("Ignoring gallery snapshot %s: incompatible format", directory)
+            return False
+        if meta.get("quantization") != quantization:
+            logger.warning(
+                "Ignoring gallery snapshot %s: quantization %s != %s", directory, meta.get("quantization"), quantization
+            )
+            return False
+
+        # Index structures of another index type are dropped; the index is rebuilt instead
+        same_index = meta.get("index_type") == settings.GALLERY_INDEX_TYPE.lower()
+        arrays = {
+            name[:-len(".npy")]: np.load(os.path.join(directory, name), mmap_mode="r")
+            for name in os.listdir(directory)
+            if name.endswith(".npy") and (same_index or not name.startswith("index_"))
+        }
+        with open(os.path.join(directory, "visitor_names.json")) as f:
+            visitor_names = json.load(f)
+        with open(os.path.join(directory, "checksums.json")) as f:
+            checksums = json.load(f)
+
+        high_water_mark = datetime.fromisoformat(meta["high_water_mark"])
+        store = EmbeddingStore.from_snapshot(arrays, quantization=quantization)
+        face_gallery.restore(store, visitor_names, checksums, high_water_mark)
+        self._saved_version = face_gallery.version
+        self.current = os.path.basename(directory)
+        self.restored = True
+        logger.info("Face gallery restored from snapshot %s: %d embeddings", self.current, store.size)
+
+        self.catch_up(high_water_mark)
+        self.restore_latency.observe(time.perf_counter() - started_at)
+        return True
+
+    def _changed_rows(self, since: datetime) -> Tuple[Set[str], List[Tuple[str, str]]]:
+        """Visitors updated and (face_id, visitor_id) of faces created after since"""
+        with engine.connect() as conn:
+            visitors = {str(row[0]) for row in conn.execute(text(CHANGED_VISITORS_QUERY), {"since": since})}
+            faces = [
+                (str(face_id), str(visitor_id))
+                for face_id, visitor_id in conn.execute(text(CHANGED_FACES_QUERY), {"since": since})
+            ]
+        return visitors, faces
+
+    def catch_up(self, since: datetime):
+        """Re-read faces and visitors written after since (minus GALLERY_SNAPSHOT_CATCHUP_MARGIN)"""
+        high_water_mark = face_gallery.database_now()
+        visitors, faces = self._changed_rows(since - timedelta(seconds=settings.GALLERY_SNAPSHOT_CATCHUP_MARGIN))
+
+        face_gallery.apply_changes(
+            visitor_ids=visitors,
+            face_ids=[face_id for face_id, visitor_id in faces if visitor_id not in visitors],
+            high_water_mark=high_water_mark
+        )
+        self.catchup_visitors += len(visitors)
+        self.catchup_faces += len(faces)
+        logger.info("Face gallery caught up: %d visitors, %d faces changed since snapshot", len(visitors), len(faces))
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": settings.GALLERY_SNAPSHOT_ENABLED,
+            "path": self.path,
+            "current": self.current,
+            "restored": self.restored,
+            "saves": self.saves,
+            "catchup_visitors": self.catchup_visitors,
+            "catchup_faces": self.catchup_faces,
+            "save_ms": self.save_latency.stats(buckets=False),
+            "restore_ms": self.restore_latency.stats(buckets=False),
+            "last_error": self.last_error
+        }
+
+
+# Singleton instance
+gallery_snapshot = GallerySnapshot()
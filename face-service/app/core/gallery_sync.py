@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Set, Tuple
+
+import psycopg2
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.face_gallery import face_gallery, _is_active
+from app.core.gallery_snapshot import gallery_snapshot
+from app.core.latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Row-level triggers on faces and visitors NOTIFY the channel given as the
+# trigger argument with {"table", "op", "id", "visitor_id"}. The backend's
+# init_db creates them (backend/app/db/gallery_triggers.py); the service only
+# installs them itself with GALLERY_SYNC_INSTALL_TRIGGERS.
+NOTIFY_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION facescan_gallery_notify() RETURNS trigger AS $$
+DECLARE
+    changed RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    IF TG_TABLE_NAME = 'faces' THEN
+        PERFORM pg_notify(TG_ARGV[0], json_build_object(
+            'table', TG_TABLE_NAME, 'op', TG_OP, 'id', changed.id, 'visitor_id', changed.visitor_id
+        )::text);
+    ELSE
+        PERFORM pg_notify(TG_ARGV[0], json_build_object(
+            'table', TG_TABLE_NAME, 'op', TG_OP, 'id', changed.id, 'visitor_id', changed.id
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGER_SQL = (
+    "CREATE OR REPLACE TRIGGER facescan_gallery_{table} "
+    "AFTER INSERT OR UPDATE OR DELETE ON {table} "
+    "FOR EACH ROW EXECUTE FUNCTION facescan_gallery_notify('{channel}')"
+)
+
+# Per-visitor checksum of everything the gallery depends on; visitor_checksum()
+# computes the same value from the gallery's own rows
+DIGEST_QUERY = (
+    "SELECT f.visitor_id, v.name, v.is_active, "
+    "md5(string_agg(f.id::text || ':' || md5(f.embedding), ',' ORDER BY f.id)) "
+    "FROM faces f JOIN visitors v ON v.id = f.visitor_id "
+    "GROUP BY f.visitor_id, v.name, v.is_active"
+)
+
+Digest = Tuple[str, bool, str]  # (name, active, checksum)
+
+
+def visitor_checksum(faces: Dict[str, str]) -> str:
+    """DIGEST_QUERY's checksum for one visitor, from face_id -> md5 of the embedding blob"""
+    # uuid order in Postgres is the order of their canonical lowercase text
+    joined = ",".join(f"{face_id}:{checksum}" for face_id, checksum in sorted(faces.items()))
+    return hashlib.md5(joined.encode()).hexdigest()
+
+
+def load_or_restore() -> int:
+    """Fill face_gallery from the gallery snapshot if there is one, else from the database"""
+    if settings.GALLERY_SNAPSHOT_ENABLED and gallery_snapshot.restore():
+        # Catch-up only sees new rows: deletions, deactivations and embeddings
+        # updated while the service was down are found by their checksums,
+        # before anything can be matched against them
+        repaired = gallery_sync.reconcile()
+        face_gallery.mark_loaded()
+        logger.info("Face gallery reconciled after snapshot restore: %d visitors repaired", repaired)
+        return face_gallery.size
+    count = face_gallery.load()
+    logger.info("Face gallery loaded: %d embeddings", count)
+    if settings.GALLERY_SNAPSHOT_ENABLED:
+        gallery_snapshot.request()
+    return count
+
+
+class GallerySync:
+    """Keeps face_gallery in step with the faces and visitors tables.
+
+    Triggers on both tables (created by the backend's init_db) NOTIFY
+    GALLERY_SYNC_CHANNEL for every changed row. A listener thread collects notifications for
+    GALLERY_SYNC_DEBOUNCE_MS and applies them as single-face or
+    single-visitor reloads, so identification only ever waits for the
+    affected rows to be swapped in memory.
+
+    Every GALLERY_SYNC_RECONCILE_SECONDS, and after the listener had to
+    reconnect, per-visitor checksums from the database are compared with
+    the same checksums computed from the gallery's own rows; visitors that
+    differ are reloaded. This repairs whatever a missed notification or a
+    failed apply left behind.
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._pending_faces: Dict[str, Tuple[str, str]] = {}  # face_id -> (op, visitor_id)
+        self._pending_visitors: Set[str] = set()
+        self._pending_since = 0.0
+        self.listening = False
+        self.notifications = 0
+        self.ignored = 0  # Malformed or foreign payloads on the channel
+        self.faces_applied = 0
+        self.visitors_applied = 0
+        self.reconciliations = 0
+        self.repaired = 0
+        self.connects = 0
+        self.last_error: Optional[str] = None
+        self.apply_latency = LatencyHistogram()  # Notification received -> applied
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="gallery-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def install_triggers(self):
+        channel = settings.GALLERY_SYNC_CHANNEL
+        with engine.begin() as conn:
+            conn.execute(text(NOTIFY_FUNCTION_SQL))
+            for table in ("faces", "visitors"):
+                conn.execute(text(TRIGGER_SQL.format(table=table, channel=channel)))
+
+    def _connect(self):
+        """Dedicated autocommit connection LISTENing on the sync channel"""
+        conn = psycopg2.connect(settings.DATABASE_URL)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{settings.GALLERY_SYNC_CHANNEL}"')
+        self.connects += 1
+        return conn
+
+    def _run(self):
+        triggers_installed = False
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                if settings.GALLERY_SYNC_INSTALL_TRIGGERS and not triggers_installed:
+                    self.install_triggers()
+                    triggers_installed = True
+
+                # Listen before loading so no change falls between the two
+                conn = self._connect()
+                if not face_gallery.is_loaded:
+                    load_or_restore()  # Current as of now, a restored snapshot included
+                else:
+                    self.reconcile()
+                self.listening = True
+                self._listen(conn)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Gallery sync error: %s", e)
+            finally:
+                self.listening = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop_event.wait(settings.GALLERY_SYNC_RETRY_SECONDS)
+
+    def _listen(self, conn):
+        debounce = settings.GALLERY_SYNC_DEBOUNCE_MS / 1000.0
+        interval = settings.GALLERY_SYNC_RECONCILE_SECONDS
+        next_reconcile = time.monotonic() + interval
+
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            timeout = 1.0
+            if self._pending_faces or self._pending_visitors:
+                timeout = max(0.0, self._pending_since + debounce - now)
+
+            if select.select([conn], [], [], timeout) != ([], [], []):
+                conn.poll()
+                while conn.notifies:
+                    self._queue(conn.notifies.pop(0).payload)
+
+            now = time.monotonic()
+            if (self._pending_faces or self._pending_visitors) and now >= self._pending_since + debounce:
+                self._apply()
+            if interval > 0 and now >= next_reconcile:
+                self.reconcile()
+                next_reconcile = now + interval
+
+    @staticmethod
+    def _parse(payload: str) -> Optional[Tuple[str, str, str, str]]:
+        """(table, op, id, visitor_id) of a trigger notification, or None if it isn't one"""
+        try:
+            change = json.loads(payload)
+            table = change["table"]
+            row_id = str(uuid.UUID(str(change["id"])))
+            visitor_id = str(uuid.UUID(str(change["visitor_id"])))
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return None
+        if table not in ("faces", "visitors"):
+            return None
+        return table, str(change.get("op", "")), row_id, visitor_id
+
+    def _queue(self, payload: str):
+        change = self._parse(payload)
+        if change is None:
+            # Someone else NOTIFYing on the channel must not stop the listener
+            self.ignored += 1
+            logger.warning("Ignoring malformed gallery notification: %r", payload[:200])
+            return
+        self.notifications += 1
+        if not self._pending_faces and not self._pending_visitors:
+            self._pending_since = time.monotonic()
+
+        table, op, row_id, visitor_id = change
+        if table == "faces":
+            self._pending_faces[row_id] = (op, visitor_id)
+        else:
+            self._pending_visitors.add(row_id)
+
+    def _apply(self):
+        """Apply queued changes: whole visitors first, then individual faces"""
+        visitors, faces = self._pending_visitors, self._pending_faces
+        self._pending_visitors, self._pending_faces = set(), {}
+
+        # Faces of reloaded visitors come with them
+        faces = {face_id: op for face_id, (op, visitor_id) in faces.items() if visitor_id not in visitors}
+        face_gallery.apply_changes(
+            visitor_ids=visitors,
+            face_ids=[face_id for face_id, op in faces.items() if op != "DELETE"],
+            removed_face_ids=[face_id for face_id, op in faces.items() if op == "DELETE"]
+        )
+
+        self.faces_applied += len(faces)
+        self.visitors_applied += len(visitors)
+        self.apply_latency.observe(time.monotonic() - self._pending_since)
+
+    def _database_digests(self) -> Dict[str, Digest]:
+        with engine.connect() as conn:
+            return {
+                str(visitor_id): (name, _is_active(is_active), checksum)
+                for visitor_id, name, is_active, checksum in conn.execute(text(DIGEST_QUERY))
+            }
+
+    def reconcile(self) -> int:
+        """Reload visitors whose faces, name or state in the gallery differ from the database; returns how many"""
+        # Afterwards the gallery holds every change committed before this point
+        checked_at = face_gallery.database_now()
+        digests = self._database_digests()
+        held = face_gallery.visitor_checksums()
+
+        # Held but deleted or deactivated
+        stale = {visitor_id for visitor_id in held if not digests.get(visitor_id, (None, False, None))[1]}
+        for visitor_id, (name, active, checksum) in digests.items():
+            if not active:
+                continue
+            gallery = held.get(visitor_id)
+            if gallery is None or gallery[0] != name or visitor_checksum(gallery[1]) != checksum:
+                stale.add(visitor_id)
+
+        face_gallery.apply_changes(visitor_ids=stale, high_water_mark=checked_at)
+        self.reconciliations += 1
+        self.repaired += len(stale)
+        return len(stale)
+
+    def stats(self) -> Dict:
+        return {
+            "listening": self.listening,
+            "channel": settings.GALLERY_SYNC_CHANNEL,
+            "connects": self.connects,
+            "notifications": self.notifications,
+            "ignored": self.ignored,
+            "faces_applied": self.faces_applied,
+            "visitors_applied": self.visitors_applied,
+            "reconciliations": self.reconciliations,
+            "repaired": self.repaired,
+            "apply_ms": self.apply_latency.stats(buckets=False),
+            "last_error": self.last_error
+        }
+
+
+# Singleton instance
+gallery_sync = GallerySync()
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.face_tracker import Track
+
+CooldownKey = Tuple[str, str, str]  # (visitor_id, gate_id, direction)
+
+
+class VisitorCooldown:
+    """Visitors recently committed at a gate lane.
+
+    A visitor stays in the cache while any camera of that gate and
+    direction still sees them and for VISITOR_COOLDOWN_SECONDS after, so
+    someone lingering at the lane (or re-tracked after turning away) is
+    committed once. Shared by all cameras.
+    """
+
+    def __init__(self):
+        self._last_seen: Dict[CooldownKey, float] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def _expire(self, now: float):
+        cooldown = settings.VISITOR_COOLDOWN_SECONDS
+        for key in [key for key, seen in self._last_seen.items() if now - seen >= cooldown]:
+            del self._last_seen[key]
+
+    def claim(self, key: CooldownKey, now: float) -> bool:
+        """Start a cooldown for key; False if one is already running"""
+        with self._lock:
+            self._expire(now)
+            if key in self._last_seen:
+                self._last_seen[key] = now
+                self.suppressed += 1
+                return False
+            self._last_seen[key] = now
+            return True
+
+    def touch(self, key: CooldownKey, now: float):
+        """Extend a running cooldown (the visitor is still in view)"""
+        with self._lock:
+            if key in self._last_seen:
+                self._last_seen[key] = now
+
+    def clear(self):
+        with self._lock:
+            self._last_seen.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire(time.time())
+            return {
+                "cooldown_seconds": settings.VISITOR_COOLDOWN_SECONDS,
+                "active": len(self._last_seen),
+                "suppressed": self.suppressed
+            }
+
+
+# Singleton instance
+visitor_cooldown = VisitorCooldown()
+
+
+def vote(track: Track) -> Optional[Tuple[Optional[str], int, Optional[float]]]:
+    """
+    Consensus over a track's recent identifications.
+    Returns (visitor_id or None for unknown, agreeing votes, mean distance
+    of those votes), or None while there is no consensus yet.
+    """
+    if not track.observations:
+        return None
+
+    counts = Counter(visitor_id for visitor_id, _ in track.observations)
+    # Prefer a visitor over "unknown" when they tie
+    visitor_id, agreeing = max(counts.items(), key=lambda item: (item[1], item[0] is not None))
+
+    if agreeing < max(1, settings.VOTE_MIN_AGREE):
+        if track.encode_count < settings.VOTE_MAX_ENCODES:
+            return None
+        # Identifications keep disagreeing: settle on unknown rather than guess
+        visitor_id = None
+        agreeing = counts.get(None, 0)
+
+    distances = [
+        distance for voter, distance in track.observations
+        if voter == visitor_id and distance is not None
+    ]
+    return visitor_id, agreeing, sum(distances) / len(distances) if distances else None
+
+
+class IdentityVoter:
+    """Per-camera decision layer between identification and events.
+
+    A track's identity is committed once VOTE_MIN_AGREE of its last
+    VOTE_WINDOW identifications agree, and never changes afterwards.
+    Committed visitors then go through the shared visitor_cooldown, so a
+    person produces one decision per stay at a lane, not one per frame or
+    per track.
+    """
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.committed = 0
+        self.unknown = 0
+        self.suppressed = 0
+
+    def decide(self, camera, tracks: List[Track], now: float) -> List[Tuple[Track, Dict]]:
+        """Tracks whose identity was committed on this frame, with the voted identity"""
+        decisions = []
+        for track in tracks:
+            if track.misses > 0:
+                continue
+
+            if track.decided_at is not None:
+                if track.decided_visitor_id is not None:
+                    visitor_cooldown.touch((track.decided_visitor_id, camera.gate_id, camera.direction), now)
+                continue
+
+            result = vote(track)
+            if result is None:
+                continue
+            visitor_id, votes, distance = result
+            track.decided_at = now
+            track.decided_visitor_id = visitor_id
+
+            if visitor_id is None:
+                self.unknown += 1
+            elif not visitor_cooldown.claim((visitor_id, camera.gate_id, camera.direction), now):
+                self.suppressed += 1
+                continue
+            else:
+                self.committed += 1
+
+            decisions.append((track, {
+                "visitor_id": visitor_id,
+                "distance": distance,
+                "confidence": max(0.0, 1.0 - distance) if distance is not None else None,
+                "votes": votes,
+                "observations": len(track.observations)
+            }))
+        return decisions
+
+    def stats(self) -> Dict:
+        return {
+            "committed": self.committed,
+            "unknown": self.unknown,
+            "suppressed": self.suppressed
+        }
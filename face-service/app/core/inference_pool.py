@@ -0,0 +1,163 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the inference queue is full and new work is rejected"""
+    pass
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """Run fn in a worker, reporting wall-clock start/end for wait accounting"""
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return started_at, time.time(), result
+
+
+class InferencePool:
+    """Bounded worker pool for blocking CV / inference work.
+
+    Async routes hand their OpenCV and face_recognition calls to this pool
+    so the event loop stays responsive. At most INFERENCE_WORKERS jobs run
+    and INFERENCE_QUEUE_SIZE wait; anything beyond that is rejected
+    immediately with PoolSaturatedError instead of queueing without limit.
+
+    In process mode, work that touches in-process state (gallery, trackers)
+    must be submitted with local=True so it runs on a thread instead.
+    """
+
+    def __init__(self):
+        self.worker_type = settings.INFERENCE_WORKER_TYPE.lower()
+        self.max_workers = settings.INFERENCE_WORKERS or os.cpu_count() or 1
+        self.max_queue = settings.INFERENCE_QUEUE_SIZE
+        self._executor: Optional[Executor] = None
+        self._thread_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+
+    def _get_executor(self, local: bool) -> Executor:
+        with self._lock:
+            if self.worker_type == "process" and not local:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                return self._executor
+
+            if self._thread_executor is None:
+                self._thread_executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference"
+                )
+            return self._thread_executor
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PoolSaturatedError("Inference queue is full")
+            self._in_flight += 1
+            self._submitted += 1
+
+    def _finish(self, submitted_at: float, started_at: float, finished_at: float):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._waits.append(max(0.0, started_at - submitted_at))
+            self._run_times.append(finished_at - started_at)
+
+    def _fail(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._failed += 1
+
+    def _submit(self, executor: Executor, fn: Callable, args: tuple, kwargs: dict) -> Future:
+        submitted_at = time.time()
+        try:
+            future = executor.submit(_timed_call, fn, args, kwargs)
+        except BaseException:
+            self._fail()
+            raise
+        # The slot is released when the job really ends, not when its caller stops
+        # waiting: a cancelled await leaves a running job holding its slot
+        future.add_done_callback(lambda done: self._settle(done, submitted_at))
+        return future
+
+    def _settle(self, future: Future, submitted_at: float):
+        if future.cancelled() or future.exception() is not None:
+            self._fail()
+        else:
+            started_at, finished_at, _ = future.result()
+            self._finish(submitted_at, started_at, finished_at)
+
+    async def run(self, fn: Callable, *args, local: bool = False, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, or raise PoolSaturatedError"""
+        self._admit()
+        future = self._submit(self._get_executor(local), fn, args, kwargs)
+        _, _, result = await asyncio.wrap_future(future)
+        return result
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """
+        Blocking counterpart of run() for code already off the event loop
+        (e.g. a camera pipeline thread handing frame work to worker processes).
+        """
+        self._admit()
+        _, _, result = self._submit(self._get_executor(local=False), fn, args, kwargs).result()
+        return result
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.max_workers)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            run_times = np.array(self._run_times) if self._run_times else np.zeros(1)
+            return {
+                "worker_type": self.worker_type,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "wait_ms": {
+                    "mean": float(waits.mean() * 1000),
+                    "p95": float(np.percentile(waits, 95) * 1000),
+                    "max": float(waits.max() * 1000)
+                },
+                "run_ms": {
+                    "mean": float(run_times.mean() * 1000),
+                    "p95": float(np.percentile(run_times, 95) * 1000)
+                }
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executors = [self._executor, self._thread_executor]
+            self._executor = None
+            self._thread_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+inference_pool = InferencePool()
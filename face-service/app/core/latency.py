@@ -0,0 +1,46 @@
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Sequence
+
+import numpy as np
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """Thread-safe latency recorder.
+
+    Keeps cumulative counts in fixed buckets (for the whole run) and a
+    window of recent samples for mean / percentiles.
+    """
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS, window: int = 1000):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        ms = max(0.0, seconds * 1000)
+        with self._lock:
+            self.counts[bisect_left(self.buckets_ms, ms)] += 1
+            self.count += 1
+            self._recent.append(ms)
+
+    def stats(self, buckets: bool = True) -> Dict:
+        with self._lock:
+            recent = np.array(self._recent) if self._recent else np.zeros(1)
+            result = {
+                "count": self.count,
+                "mean": float(recent.mean()),
+                "p50": float(np.percentile(recent, 50)),
+                "p95": float(np.percentile(recent, 95)),
+                "max": float(recent.max())
+            }
+            if buckets:
+                labels = [f"<={bound:g}" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]:g}"]
+                result["buckets"] = dict(zip(labels, self.counts))
+            return result
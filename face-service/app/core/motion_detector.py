@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.face_detector import face_detector
+
+
+class MotionDetector:
+    """Cheap scene-change detector for one camera.
+
+    Works on a small blurred copy of the grayscale frame the tracker
+    already needs: pixels that differ from a slowly adapting background by
+    more than MOTION_PIXEL_THRESHOLD count as changed, and the scene has
+    changed when at least MOTION_MIN_AREA of them do. The same small frame
+    gives the night-mode decision, so preprocessing doesn't convert and
+    average the full frame again.
+    """
+
+    def __init__(self):
+        self._background: Optional[np.ndarray] = None
+        self.is_night = False
+        self.changed_fraction = 0.0
+        self.frames = 0
+        self.motion_frames = 0
+
+    def _downsample(self, gray: np.ndarray) -> np.ndarray:
+        height, width = gray.shape[:2]
+        target = settings.MOTION_WIDTH
+        if 0 < target < width:
+            size = (target, max(1, int(round(height * target / float(width)))))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def update(self, gray: np.ndarray) -> bool:
+        """Compare a grayscale frame with the background; returns whether the scene changed"""
+        small = self._downsample(gray)
+        self.is_night = face_detector.is_night_mode(small)
+        self.frames += 1
+
+        if self._background is None or self._background.shape != small.shape:
+            # First frame (or new resolution): everything is new
+            self._background = small.astype(np.float32)
+            self.changed_fraction = 1.0
+            self.motion_frames += 1
+            return True
+
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self._background))
+        self.changed_fraction = float(np.count_nonzero(diff > settings.MOTION_PIXEL_THRESHOLD)) / diff.size
+        # Adapt slowly so lighting drift doesn't read as motion
+        cv2.accumulateWeighted(small, self._background, settings.MOTION_BACKGROUND_RATE)
+
+        motion = self.changed_fraction >= settings.MOTION_MIN_AREA
+        if motion:
+            self.motion_frames += 1
+        return motion
+
+    def reset(self):
+        self._background = None
+
+    def stats(self) -> Dict:
+        return {
+            "frames": self.frames,
+            "motion_frames": self.motion_frames,
+            "changed_fraction": self.changed_fraction,
+            "night_mode": self.is_night
+        }
@@ -0,0 +1,238 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.camera_manager import camera_manager
+from app.core.camera_recognizer import get_recognizer
+from app.core.event_publisher import event_publisher
+from app.core.face_gallery import face_gallery
+from app.core.face_tracker import Track
+from app.core.identity_voter import IdentityVoter, visitor_cooldown
+from app.core.latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionLoop:
+    """Continuous grab -> preprocess -> detect -> encode -> identify -> emit for one camera.
+
+    Runs on its own thread, always taking the camera's newest frame (frames
+    that arrive in between are skipped, never queued). An event is emitted
+    when IdentityVoter commits a track's identity: once per track, and once
+    per visitor stay at the lane.
+
+    The rate adapts to the lane: RECOGNITION_FPS while there is motion or a
+    tracked face, RECOGNITION_IDLE_FPS once it has been quiet for
+    RECOGNITION_IDLE_AFTER seconds. A CPU budget further stretches the
+    frame interval so the pipeline is busy at most that share of the time.
+    """
+
+    def __init__(self, camera_id: str, fps: Optional[float] = None, publish: Callable[[Dict], None] = None):
+        self.camera_id = camera_id
+        self.fps = fps  # None = the camera's recognition_fps, else RECOGNITION_FPS
+        self.publish = publish or event_publisher.publish
+
+        self.frames_processed = 0
+        self.frames_skipped = 0  # Polls that found no new frame
+        self.overruns = 0  # Frames that took longer than the frame interval
+        self.throttled = 0  # Frames whose interval was stretched to stay within the CPU budget
+        self.idle = False
+        self.current_fps = 0.0
+        self.events = 0
+        self.errors = 0
+        self.frame_latency = LatencyHistogram()  # Capture -> tracks for that frame
+        self.decision_latency = LatencyHistogram()  # Face appears -> committed identity
+        self.voter = IdentityVoter(camera_id)
+
+        self._last_sequence = 0
+        self._started_at = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"recognition-{self.camera_id}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        # Other callers of the recognizer (the HTTP route) encode once per track again
+        recognizer = get_recognizer(self.camera_id)
+        if recognizer is not None:
+            recognizer.tracker.voting = False
+
+    def _active_fps(self, camera) -> float:
+        if self.fps is not None:
+            return self.fps
+        if camera is not None and camera.recognition_fps is not None:
+            return camera.recognition_fps
+        return settings.RECOGNITION_FPS
+
+    def _interval(self, busy: float) -> float:
+        """Seconds until the next frame, given the last one kept the pipeline busy for busy seconds"""
+        camera = camera_manager.get_camera(self.camera_id)
+        recognizer = get_recognizer(self.camera_id)
+
+        fps = self._active_fps(camera)
+        self.idle = recognizer is not None and time.time() - recognizer.active_at >= settings.RECOGNITION_IDLE_AFTER
+        if self.idle and settings.RECOGNITION_IDLE_FPS > 0:
+            fps = min(fps, settings.RECOGNITION_IDLE_FPS) if fps > 0 else settings.RECOGNITION_IDLE_FPS
+        interval = 1.0 / fps if fps > 0 else 0.0
+
+        budget = settings.RECOGNITION_CPU_BUDGET
+        if camera is not None and camera.cpu_budget is not None:
+            budget = camera.cpu_budget
+        if budget > 0 and busy / budget > interval:
+            interval = busy / budget
+            self.throttled += 1
+
+        self.current_fps = 1.0 / interval if interval > 0 else 0.0
+        return interval
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started_at = time.monotonic()
+            try:
+                processed = self.step()
+            except Exception as e:
+                self.errors += 1
+                processed = False
+                logger.error("Recognition loop error on camera %s: %s", self.camera_id, e)
+
+            now = time.monotonic()
+            if not processed:
+                # Nothing new yet: poll again shortly
+                delay = 0.01
+            else:
+                busy = now - started_at
+                interval = self._interval(busy)
+                if interval and busy > interval:
+                    self.overruns += 1
+                delay = interval - busy
+            self._stop_event.wait(max(0.0, delay))
+
+    def step(self) -> bool:
+        """Process the camera's newest frame if it hasn't been seen; returns whether one was"""
+        camera = camera_manager.get_camera(self.camera_id)
+        recognizer = get_recognizer(self.camera_id)
+        if camera is None or recognizer is None or not camera.is_connected:
+            self.frames_skipped += 1
+            return False
+
+        frame, sequence, captured_at = camera.get_latest()
+        if frame is None or sequence == self._last_sequence:
+            self.frames_skipped += 1
+            return False
+        self._last_sequence = sequence
+
+        # The voter needs several identifications of each track before deciding
+        recognizer.tracker.voting = True
+        tracks = recognizer.process(frame, sequence, captured_at)
+        now = time.time()
+        self.frame_latency.observe(now - captured_at)
+        self.frames_processed += 1
+
+        for event in self._decisions(camera, tracks, captured_at, now):
+            self.events += 1
+            self.publish(event)
+        return True
+
+    def _decisions(self, camera, tracks: List[Track], captured_at: float, now: float) -> List[Dict]:
+        """Events for tracks whose identity was committed on this frame"""
+        events = []
+        for track, decision in self.voter.decide(camera, tracks, now):
+            self.decision_latency.observe(now - track.appeared_at)
+            visitor_id = decision["visitor_id"]
+            events.append({
+                "camera_id": self.camera_id,
+                "gate_id": camera.gate_id,
+                "direction": camera.direction,
+                "track_id": track.track_id,
+                "recognized": visitor_id is not None,
+                "visitor_id": visitor_id,
+                "visitor_name": face_gallery.visitor_name(visitor_id) if visitor_id else None,
+                "distance": decision["distance"],
+                "confidence": decision["confidence"],
+                "votes": decision["votes"],
+                "observations": decision["observations"],
+                "face_location": track.location,
+                "captured_at": captured_at,
+                "timestamp": now,
+                "latency_ms": (now - track.appeared_at) * 1000
+            })
+        return events
+
+    def stats(self) -> Dict:
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        return {
+            "camera": self.camera_id,
+            "running": self.running,
+            "mode": "idle" if self.idle else "active",
+            "target_fps": self.current_fps,
+            "fps": self.frames_processed / elapsed if elapsed > 0 else 0.0,
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "overruns": self.overruns,
+            "throttled": self.throttled,
+            "events": self.events,
+            "decisions": self.voter.stats(),
+            "errors": self.errors,
+            "frame_latency_ms": self.frame_latency.stats(),
+            "decision_latency_ms": self.decision_latency.stats()
+        }
+
+
+class RecognitionService:
+    """Runs one RecognitionLoop per registered camera"""
+
+    def __init__(self):
+        self.loops: Dict[str, RecognitionLoop] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start loops for every camera in the registry (already running ones are kept)"""
+        event_publisher.start()
+        with self._lock:
+            for camera_id in camera_manager.camera_ids():
+                loop = self.loops.get(camera_id)
+                if loop is None:
+                    loop = self.loops[camera_id] = RecognitionLoop(camera_id)
+                loop.start()
+        logger.info("Recognition loops running: %s", ", ".join(self.loops) or "none")
+
+    def stop(self):
+        with self._lock:
+            loops = list(self.loops.values())
+        for loop in loops:
+            loop.stop()
+        event_publisher.stop()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            loops = dict(self.loops)
+        return {
+            "enabled": settings.RECOGNITION_ENABLED,
+            "loops": {camera_id: loop.stats() for camera_id, loop in loops.items()},
+            "cooldown": visitor_cooldown.stats(),
+            "events": event_publisher.stats()
+        }
+
+
+# Singleton instance
+recognition_service = RecognitionService()
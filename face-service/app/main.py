@@ -1,10 +1,25 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.core.camera_manager import camera_manager
+from app.core.face_gallery import face_gallery
+from app.core.gallery_sync import gallery_sync, load_or_restore
+from app.core.gallery_snapshot import gallery_snapshot
+from app.core.gallery_shards import gallery_shards
+from app.core.inference_pool import inference_pool
+from app.core.encoding_batcher import encoding_batcher
+from app.core.frame_stream import stream_stats
+from app.core.camera_recognizer import recognizer_stats
+from app.core.recognition_loop import recognition_service
 from app.api.routes import detection, recognition
 
+# Uvicorn only configures its own loggers; the service's go to stderr
+logging.basicConfig(level=settings.LOG_LEVEL.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="FaceScan Face Recognition Service",
     version="1.0.0"
@@ -35,16 +50,62 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def service_stats():
+    return {
+        "cameras": camera_manager.stats(),
+        "frames": stream_stats(),
+        "pipelines": recognizer_stats(),
+        "recognition": recognition_service.stats(),
+        "inference": inference_pool.stats(),
+        "encoding_batches": encoding_batcher.stats(),
+        "gallery": face_gallery.stats(),
+        "gallery_sync": gallery_sync.stats(),
+        "gallery_snapshot": gallery_snapshot.stats()
+    }
+
 
 @app.on_event("startup")
 async def startup_event():
     # Initialize cameras based on current settings so frames are available
     # Run in background to avoid blocking startup
     import asyncio
-    asyncio.create_task(asyncio.to_thread(camera_manager.initialize))
+    asyncio.create_task(asyncio.to_thread(start_cameras))
+
+    # Shard workers first, so the loaded gallery is published to them right away
+    gallery_shards.start()
+
+    if settings.GALLERY_LOAD_ON_STARTUP:
+        if settings.GALLERY_SNAPSHOT_ENABLED:
+            gallery_snapshot.start()
+        if settings.GALLERY_SYNC_ENABLED:
+            # Loads the gallery, then keeps it up to date
+            gallery_sync.start()
+        else:
+            asyncio.create_task(asyncio.to_thread(load_gallery))
+
+
+def start_cameras():
+    """Open the configured cameras, then start their recognition loops if enabled"""
+    camera_manager.initialize()
+    if settings.RECOGNITION_ENABLED:
+        recognition_service.start()
+
+
+def load_gallery():
+    """Load the face gallery, logging instead of failing startup"""
+    try:
+        load_or_restore()
+    except Exception as e:
+        logger.exception("Error loading face gallery: %s", e)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    # Cleanly release camera handles
+    # Stop the pipelines before releasing the camera handles they read from
+    recognition_service.stop()
     camera_manager.shutdown()
+    gallery_sync.stop()
+    gallery_snapshot.stop()
+    gallery_shards.stop()
+    inference_pool.shutdown()
@@ -0,0 +1,117 @@
+"""Replay a video or image directory through the camera recognition pipeline.
+
+Usage: python benchmark_pipeline.py <video file or image dir> [--realtime] [--no-gallery] [--access]
+
+Reports pipeline throughput and capture-to-result latency without any camera
+hardware. Fast playback (default) hands every frame to the pipeline as soon as
+the previous one is done; --realtime paces frames at the source frame rate.
+
+Tracks go through the identity voter as in the recognition loop. With
+--access, the visitors it commits are also run through the backend's access
+stage (record_access: visit transition and gate event, gate controller mocked)
+by ../backend/benchmark_access.py, against the backend's configured database;
+nothing it writes is kept. Without --access that stage is not measured.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+from app.core.camera_manager import camera_manager, CameraStream
+from app.core.camera_recognizer import get_recognizer
+from app.core.face_gallery import face_gallery
+from app.core.identity_voter import IdentityVoter
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+if not args:
+    print(__doc__)
+    sys.exit(1)
+
+if "--no-gallery" not in sys.argv:
+    try:
+        print(f"Gallery loaded: {face_gallery.load()} embeddings")
+    except Exception as e:
+        print(f"Gallery not loaded ({e}); identification is skipped")
+
+stream = CameraStream(
+    camera_type="file",
+    camera_id="benchmark",
+    file_path=args[0],
+    playback="realtime" if "--realtime" in sys.argv else "fast",
+    loop=False
+)
+camera_manager.cameras = {"benchmark": stream}
+if not stream.connect():
+    print(f"Cannot open {args[0]}")
+    sys.exit(1)
+
+recognizer = get_recognizer("benchmark")
+recognizer.tracker.voting = True
+voter = IdentityVoter("benchmark")
+events = []
+latencies = []
+last_sequence = 0
+faces = 0
+started_at = time.time()
+
+while stream.state != "finished" or stream.get_latest()[1] != last_sequence:
+    frame, sequence, captured_at = stream.get_latest()
+    if frame is None or sequence == last_sequence:
+        time.sleep(0.001)
+        continue
+    last_sequence = sequence
+    tracks = recognizer.process(frame, sequence, captured_at)
+    faces += len(tracks)
+    now = time.time()
+    latencies.append(now - captured_at)
+    for track, decision in voter.decide(stream, tracks, now):
+        # The fields record_access acts on
+        events.append({
+            "recognized": decision["visitor_id"] is not None,
+            "visitor_id": decision["visitor_id"],
+            "visitor_name": face_gallery.visitor_name(decision["visitor_id"]) if decision["visitor_id"] else None,
+            "gate_id": stream.gate_id,
+            "direction": stream.direction
+        })
+
+elapsed = time.time() - started_at
+stream.close()
+
+latencies = np.array(latencies) * 1000 if latencies else np.zeros(1)
+print(f"\nFrames processed: {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.1f} fps)")
+print(f"Latency ms: p50={np.percentile(latencies, 50):.1f} p95={np.percentile(latencies, 95):.1f} max={latencies.max():.1f}")
+print(f"Track observations: {faces}")
+print(f"Pipeline: {recognizer.stats()}")
+print(f"Decisions: {voter.stats()}")
+
+recognized = [event for event in events if event["recognized"]]
+if "--access" not in sys.argv:
+    print("Access stage (backend record_access): not measured, run with --access")
+elif not recognized:
+    print("Access stage (backend record_access): not measured, no visitor was recognized")
+else:
+    result = subprocess.run(
+        [sys.executable, "benchmark_access.py"],
+        cwd=BACKEND_DIR,
+        input=json.dumps(recognized),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        reason = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}"
+        print(f"Access stage (backend record_access): not measured ({reason})")
+    else:
+        access = json.loads(result.stdout)
+        access_ms = np.array(access["ms"])
+        print(
+            f"Access stage ms (gate controller mocked): p50={np.percentile(access_ms, 50):.1f} "
+            f"p95={np.percentile(access_ms, 95):.1f} max={access_ms.max():.1f} "
+            f"({access['opened']}/{access['events']} events opened the gate)"
+        )
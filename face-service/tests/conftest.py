@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+# Run from anywhere: make the face-service package importable as "app"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _data_paths(tmp_path, monkeypatch):
+    # Files the gallery writes (quantized re-rank rows) go to the test's own directory
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "GALLERY_QUANT_RERANK_PATH", str(tmp_path / "gallery-rerank"))
+
+
+class FakeDatabase:
+    """The faces and visitors tables, answering FaceGallery's and GallerySync's queries"""
+
+    def __init__(self):
+        self.visitors = {}  # id -> (name, is_active)
+        self.faces = {}  # id -> (visitor_id, embedding blob)
+        self.now = datetime(2026, 1, 1)
+        # Rows whose created_at / updated_at moved since checkpoint() (what catch-up can see)
+        self.changed_visitors = set()
+        self.changed_faces = []
+        self.rng = np.random.default_rng(0)
+
+    def checkpoint(self):
+        self.changed_visitors, self.changed_faces = set(), []
+
+    def add_visitor(self, faces=2, name="Visitor"):
+        visitor_id = str(uuid.uuid4())
+        self.visitors[visitor_id] = (name, "true")
+        self.changed_visitors.add(visitor_id)
+        for _ in range(faces):
+            self.add_face(visitor_id)
+        return visitor_id
+
+    def add_face(self, visitor_id):
+        face_id = str(uuid.uuid4())
+        self.faces[face_id] = (visitor_id, self.rng.normal(size=128).astype(np.float32).tobytes())
+        self.changed_faces.append((face_id, visitor_id))
+        return face_id
+
+    def face_rows(self, where, params):
+        for face_id, (visitor_id, raw) in self.faces.items():
+            if "visitor_ids" in params and visitor_id not in params["visitor_ids"]:
+                continue
+            if "face_ids" in params and face_id not in params["face_ids"]:
+                continue
+            name, is_active = self.visitors[visitor_id]
+            yield face_id, visitor_id, raw, name, is_active
+
+    def digests(self):
+        """What DIGEST_QUERY computes in Postgres"""
+        faces = {}
+        for face_id, (visitor_id, raw) in sorted(self.faces.items()):
+            faces.setdefault(visitor_id, []).append(f"{face_id}:{hashlib.md5(raw).hexdigest()}")
+        return {
+            visitor_id: (self.visitors[visitor_id][0], self.visitors[visitor_id][1] == "true",
+                         hashlib.md5(",".join(entries).encode()).hexdigest())
+            for visitor_id, entries in faces.items()
+        }
+
+
+@pytest.fixture
+def database(monkeypatch):
+    from app.core.face_gallery import FaceGallery
+    from app.core.gallery_snapshot import GallerySnapshot
+    from app.core.gallery_sync import GallerySync
+
+    database = FakeDatabase()
+    monkeypatch.setattr(FaceGallery, "_query", lambda self, where, params: list(database.face_rows(where, params)))
+    monkeypatch.setattr(FaceGallery, "database_now", lambda self: database.now)
+    monkeypatch.setattr(GallerySync, "_database_digests", lambda self: database.digests())
+    monkeypatch.setattr(
+        GallerySnapshot,
+        "_changed_rows",
+        lambda self, since: (set(database.changed_visitors), list(database.changed_faces))
+    )
+    return database
+
+
+@pytest.fixture
+def gallery(database, monkeypatch):
+    """A fresh FaceGallery in place of the singleton, fed from the fake database"""
+    from app.core import gallery_snapshot, gallery_sync
+    from app.core.face_gallery import FaceGallery
+
+    gallery = FaceGallery()
+    monkeypatch.setattr(gallery_sync, "face_gallery", gallery)
+    monkeypatch.setattr(gallery_snapshot, "face_gallery", gallery)
+    return gallery
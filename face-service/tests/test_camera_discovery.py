@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from app.core import camera_discovery as discovery_module
+from app.core.camera_discovery import CameraDiscovery
+from app.core.config import settings
+
+
+@pytest.fixture
+def hung():
+    """Released at teardown, so hung probe threads don't outlive the test"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _discovery(monkeypatch, indices, probe, workers=2, timeout=0.2):
+    monkeypatch.setattr(settings, "CAMERA_DISCOVERY_WORKERS", workers)
+    monkeypatch.setattr(settings, "CAMERA_DISCOVERY_PROBE_TIMEOUT", timeout)
+    monkeypatch.setattr(discovery_module, "_probe", probe)
+    discovery = CameraDiscovery()
+    candidates = ({index: f"Camera {index}" for index in indices}, set(indices))
+    monkeypatch.setattr(discovery, "_linux_candidates", lambda: candidates)
+    monkeypatch.setattr(discovery, "_index_candidates", lambda: candidates)
+    monkeypatch.setattr(discovery, "_open_indices", lambda: {})
+    return discovery
+
+
+def test_hung_probe_times_out_and_keeps_its_slot(monkeypatch, hung):
+    def probe(index):
+        if index == 0:
+            hung.wait()
+        return index % 2 == 0
+
+    discovery = _discovery(monkeypatch, range(6), probe)
+    started = time.monotonic()
+    listing = discovery.discover()
+    assert [camera["index"] for camera in listing["cameras"]] == [2, 4]
+    assert time.monotonic() - started < 2
+    assert discovery.probes_timed_out == 1 and discovery.probes_running == 1
+
+    # The next listing probes the others with the slot that's left; the hung device isn't reopened
+    listing = discovery.discover(refresh=True)
+    assert [camera["index"] for camera in listing["cameras"]] == [2, 4]
+    assert discovery.probes_timed_out == 1 and discovery.probes_running == 1
+
+    hung.set()
+    deadline = time.monotonic() + 5
+    while discovery.probes_running:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert [camera["index"] for camera in discovery.discover(refresh=True)["cameras"]] == [0, 2, 4]
+
+
+def test_probes_are_skipped_while_every_slot_is_hung(monkeypatch, hung):
+    def probe(index):
+        hung.wait()
+        return True
+
+    discovery = _discovery(monkeypatch, range(3), probe, workers=1)
+    assert discovery.discover()["count"] == 0
+    assert discovery.probes_timed_out == 1 and discovery.probes_skipped == 2
+
+    started = time.monotonic()
+    assert discovery.discover(refresh=True)["count"] == 0
+    assert time.monotonic() - started < 0.1
+    assert discovery.probes_running == 1 and discovery.probes_skipped == 4
+
+
+def test_callers_share_one_enumeration_outside_the_lock(monkeypatch):
+    probing = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def probe(index):
+        calls.append(index)
+        probing.set()
+        release.wait(5)
+        return True
+
+    discovery = _discovery(monkeypatch, [0], probe, timeout=5)
+    listings = []
+    callers = [threading.Thread(target=lambda: listings.append(discovery.discover())) for _ in range(3)]
+    callers[0].start()
+    assert probing.wait(5)
+    for caller in callers[1:]:
+        caller.start()
+
+    # The slow probe doesn't hold the cache lock
+    started = time.monotonic()
+    discovery.invalidate()
+    assert time.monotonic() - started < 0.1
+
+    release.set()
+    for caller in callers:
+        caller.join()
+    assert calls == [0]
+    assert all(listing["count"] == 1 and not listing["cached"] for listing in listings)
+
+    # Invalidated while enumerating: that result isn't served from the cache
+    discovery.discover()
+    assert calls == [0, 0]
+    assert discovery.discover()["cached"]
@@ -0,0 +1,47 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip("face_recognition")
+
+from app.core import encoding_batcher as batcher_module  # noqa: E402
+from app.core.encoding_batcher import EncodingBatcher  # noqa: E402
+
+IMAGE = np.zeros((100, 100, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def batcher(monkeypatch):
+    # Landmarks stand in as the face locations; a face's descriptor is its top coordinate
+    monkeypatch.setattr(batcher_module, "face_landmarks", lambda image, locations, model: list(locations))
+    monkeypatch.setattr(
+        batcher_module,
+        "compute_descriptors",
+        lambda images, landmarks: [[np.full(128, shape[0]) for shape in shapes] for shapes in landmarks]
+    )
+    batcher = EncodingBatcher()
+    monkeypatch.setattr(batcher_module, "encoding_batcher", batcher)
+    return batcher
+
+
+def _encode_in_child(top):
+    encodings = batcher_module.encoding_batcher.encode(IMAGE, [(top, 20, 20, 0)], "large")
+    return float(encodings[0][0])
+
+
+def test_each_caller_gets_its_own_encodings(batcher):
+    encodings = batcher.encode(IMAGE, [(1, 20, 20, 0), (2, 20, 20, 0)], "large")
+    assert [float(encoding[0]) for encoding in encodings] == [1.0, 2.0]
+    assert batcher.encode(IMAGE, [], "large") == []
+    assert batcher.stats()["faces"] == 2
+
+
+def test_forked_worker_runs_its_own_scheduler(batcher):
+    # The parent's scheduler is running when the pool forks
+    batcher.encode(IMAGE, [(1, 20, 20, 0)], "large")
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as pool:
+        assert pool.submit(_encode_in_child, 7).result(timeout=10) == 7.0
+    assert batcher.encode(IMAGE, [(3, 20, 20, 0)], "large")[0][0] == 3.0
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from app.core.ann_index import FlatIndex
+from app.core.face_gallery import EmbeddingStore
+
+
+def _embeddings(rng, count, spread):
+    return (rng.normal(size=(count, 128)) * spread).astype(np.float32)
+
+
+def test_int8_scale_widens_for_out_of_range_adds():
+    rng = np.random.default_rng(0)
+    store = EmbeddingStore(index=FlatIndex(), quantization="int8")
+    store.add([f"a{i}" for i in range(50)], ["v1"] * 50, _embeddings(rng, 50, 0.05))
+    narrow_scale = store.scale.copy()
+
+    # Incremental adds far outside the first batch's range (the flat index never rebuilds)
+    wide = _embeddings(rng, 20, 0.5)
+    rows = store.add([f"b{i}" for i in range(20)], ["v2"] * 20, wide)
+
+    assert store.recalibrations == 1
+    assert np.all(store.scale >= narrow_scale)
+    dequantized = store.codes[rows].astype(np.float32) * store.scale
+    assert np.abs(dequantized - wide).max() <= store.scale.max()
+
+    # Earlier rows were re-encoded with the new scale, not left on the old one
+    first = store.live_rows()[:50]
+    assert np.abs(store.codes[first].astype(np.float32) * store.scale - store.matrix[first]).max() <= store.scale.max()
+
+
+def test_int8_search_finds_out_of_range_faces():
+    rng = np.random.default_rng(1)
+    store = EmbeddingStore(index=FlatIndex(), quantization="int8")
+    store.add([f"a{i}" for i in range(100)], [f"v{i}" for i in range(100)], _embeddings(rng, 100, 0.05))
+    wide = _embeddings(rng, 10, 0.5)
+    store.add([f"b{i}" for i in range(10)], [f"w{i}" for i in range(10)], wide)
+
+    for i, query in enumerate(wide):
+        rows, distances = store.distances(query, limit=1)
+        assert store.face_ids[rows[np.argmin(distances)]] == f"b{i}"
+
+
+def test_in_range_adds_keep_the_scale():
+    rng = np.random.default_rng(2)
+    store = EmbeddingStore(index=FlatIndex(), quantization="int8")
+    first = _embeddings(rng, 50, 0.1)
+    store.add([f"a{i}" for i in range(50)], ["v1"] * 50, first)
+    scale = store.scale.copy()
+    store.add(["b"], ["v2"], first[:1] * 0.5)
+
+    assert store.recalibrations == 0
+    assert np.array_equal(store.scale, scale)
+
+
+@pytest.mark.parametrize("quantization, ratio", [("float16", 2), ("int8", 4)])
+def test_quantized_store_keeps_float32_rows_out_of_memory(quantization, ratio):
+    rng = np.random.default_rng(3)
+    plain = EmbeddingStore(index=FlatIndex(), quantization="none")
+    store = EmbeddingStore(index=FlatIndex(), quantization=quantization)
+    embeddings = _embeddings(rng, 3000, 0.1)
+    face_ids = [f"f{i}" for i in range(3000)]
+    plain.add(face_ids, face_ids, embeddings)
+    store.add(face_ids, face_ids, embeddings)  # Grows the store several times
+
+    resident, mapped = store.memory_bytes()
+    assert store.memory_mapped and mapped == store.matrix.nbytes
+    assert resident * ratio * 0.9 < plain.memory_bytes()[0]
+
+    # Re-ranking still returns exact float32 distances from the disk-backed rows
+    for i in (0, 1234, 2999):
+        rows, distances = store.distances(embeddings[i], limit=1)
+        closest = int(np.argmin(distances))
+        assert store.face_ids[rows[closest]] == f"f{i}"
+        assert distances[closest] < 1e-3
+
+
+def test_quantized_snapshot_store_copies_rows_to_disk_on_write(tmp_path):
+    rng = np.random.default_rng(4)
+    store = EmbeddingStore(index=FlatIndex(), quantization="int8")
+    store.add([f"a{i}" for i in range(100)], ["v1"] * 100, _embeddings(rng, 100, 0.1))
+    for name, array in store.snapshot_arrays().items():
+        np.save(tmp_path / f"{name}.npy", array)
+    arrays = {path.stem: np.load(path, mmap_mode="r") for path in tmp_path.glob("*.npy")}
+
+    restored = EmbeddingStore.from_snapshot(arrays, quantization="int8")
+    restored.add(["b"], ["v2"], _embeddings(rng, 1, 0.1))
+
+    assert restored.memory_mapped and restored.matrix.flags.writeable
+    assert restored.memory_bytes()[0] < restored.matrix.nbytes
+    assert restored.size == 101
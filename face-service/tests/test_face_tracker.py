@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.core.face_tracker import FaceTracker
+
+LOCATION = (20, 80, 80, 20)
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    monkeypatch.setattr(settings, "VOTE_MIN_AGREE", 3)
+    monkeypatch.setattr(settings, "TRACKER_USE_OPTICAL_FLOW", False)
+    monkeypatch.setattr(settings, "TRACKER_MAX_ENCODING_AGE", 0)
+    return FaceTracker()
+
+
+def _encoded_track(tracker):
+    gray = np.zeros((120, 120), dtype=np.uint8)
+    track = tracker.update(gray, [LOCATION])[0]
+    track.set_identity(np.zeros(128), {"visitor_id": "v1", "distance": 0.3})
+    tracker.update(gray, [LOCATION])
+    return track
+
+
+def test_tracks_are_encoded_once_without_a_voter(tracker):
+    track = _encoded_track(tracker)
+    assert not tracker.needs_encoding(track)
+
+
+def test_undecided_tracks_are_re_encoded_while_voting(tracker):
+    tracker.voting = True
+    track = _encoded_track(tracker)
+    assert tracker.needs_encoding(track)
+
+    track.decided_at = 1.0
+    assert not tracker.needs_encoding(track)
+
+
+def test_camera_recognize_route_encodes_each_track_once(monkeypatch):
+    pytest.importorskip("face_recognition")
+    from app.core import camera_recognizer
+
+    monkeypatch.setattr(settings, "VOTE_MIN_AGREE", 3)
+    monkeypatch.setattr(settings, "MOTION_GATING_ENABLED", False)
+    monkeypatch.setattr(settings, "TRACKER_DETECT_INTERVAL", 1)
+    monkeypatch.setattr(settings, "TRACKER_MAX_ENCODING_AGE", 0)
+    detector = camera_recognizer.face_detector
+    monkeypatch.setattr(detector, "detect_faces", lambda *args, **kwargs: [LOCATION])
+    monkeypatch.setattr(detector, "encode_faces", lambda image, locations: [np.zeros(128) for _ in locations])
+    monkeypatch.setattr(camera_recognizer.face_gallery, "is_loaded", False)
+
+    # What /recognition/cameras/recognize runs per call: no RecognitionLoop, no voter
+    recognizer = camera_recognizer.CameraRecognizer("test")
+    frame = np.full((120, 120, 3), 128, dtype=np.uint8)
+    for sequence in range(1, 6):
+        recognizer.process(frame, sequence)
+
+    assert recognizer.encodings_computed == 1
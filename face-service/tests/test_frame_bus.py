@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from app.core import frame_bus
+from app.core.frame_bus import FrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create("test", slots=2, slot_bytes=64 * 64 * 3)
+    yield ring
+    ring.close()
+
+
+def test_oversized_frame_is_not_published(ring):
+    assert ring.write(np.zeros((64, 64, 3), dtype=np.uint8), 1)
+    assert ring.is_current(1)
+
+    assert not ring.write(np.zeros((128, 128, 3), dtype=np.uint8), 2)
+    assert ring.oversized == 1
+    assert not ring.is_current(2)
+    assert ring.read(2)[0] is None
+
+
+def test_recognizer_skips_the_bus_for_oversized_frames(ring, monkeypatch):
+    pytest.importorskip("face_recognition")
+    from types import SimpleNamespace
+    from app.core import camera_recognizer
+
+    monkeypatch.setattr(camera_recognizer.inference_pool, "worker_type", "process")
+    recognizer = camera_recognizer.CameraRecognizer("test")
+    camera = SimpleNamespace(ring=ring)
+
+    ring.write(np.zeros((64, 64, 3), dtype=np.uint8), 1)
+    assert recognizer._use_frame_bus(camera, 1) == ring.name
+
+    # Too large for a slot: detection must run locally instead of being missed
+    ring.write(np.zeros((128, 128, 3), dtype=np.uint8), 2)
+    assert not recognizer._use_frame_bus(camera, 2)
+    assert recognizer.frames_off_bus == 1
+
+
+def test_rings_for_the_same_camera_do_not_replace_each_other(ring):
+    # E.g. a second service instance, or a reconnect racing the old ring's close
+    other = FrameRing.create("test", slots=2, slot_bytes=64 * 64 * 3)
+    try:
+        assert other.name != ring.name
+        ring.write(np.full((64, 64, 3), 1, dtype=np.uint8), 1)
+        other.write(np.full((64, 64, 3), 2, dtype=np.uint8), 1)
+        assert ring.read(1)[0][0, 0, 0] == 1
+        assert other.read(1)[0][0, 0, 0] == 2
+    finally:
+        other.close()
+    assert not ring.closed and ring.is_current(1)
+
+
+def test_create_fails_instead_of_unlinking_an_existing_segment(ring, monkeypatch):
+    monkeypatch.setattr(frame_bus, "ring_name", lambda camera_id: ring.name)
+    with pytest.raises(FileExistsError):
+        FrameRing.create("test", slots=2, slot_bytes=64 * 64 * 3)
+
+    ring.write(np.zeros((64, 64, 3), dtype=np.uint8), 1)
+    assert frame_bus.read_frame(ring.name, 1) is not None
+
+
+def test_workers_attach_by_name_and_drop_closed_rings(ring):
+    ring.write(np.zeros((64, 64, 3), dtype=np.uint8), 1)
+    attached = frame_bus.get_ring(ring.name)
+    assert attached is not ring and not attached.owner
+    assert frame_bus.get_ring(ring.name) is attached
+    assert attached.read(1)[0] is not None
+
+    replacement = FrameRing.create("test", slots=2, slot_bytes=64 * 64 * 3)
+    try:
+        ring.close()
+        assert frame_bus.get_ring(replacement.name) is not None
+        assert ring.name not in frame_bus._attached
+        assert frame_bus.get_ring(ring.name) is None
+    finally:
+        replacement.close()
+        frame_bus.get_ring(replacement.name)
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.core import frame_stream
+from app.core.config import settings
+from app.core.frame_stream import FrameBroadcaster
+
+
+class Camera:
+    """Publishes a new frame on each get_latest() until stopped"""
+
+    is_connected = True
+
+    def __init__(self):
+        self.sequence = 0
+        self.producing = True
+
+    def get_latest(self):
+        if self.producing:
+            self.sequence += 1
+        frame = np.full((16, 16, 3), self.sequence % 256, dtype=np.uint8)
+        return frame, self.sequence, time.time()
+
+
+@pytest.fixture
+def camera(monkeypatch):
+    camera = Camera()
+    monkeypatch.setattr(frame_stream.camera_manager, "get_camera", lambda camera_id: camera)
+    monkeypatch.setattr(settings, "STREAM_FPS", 100.0)
+    monkeypatch.setattr(settings, "STREAM_WIDTH", 0)
+    return camera
+
+
+async def _watch(broadcaster, camera, stop_after):
+    """(seconds since start, jpeg) per yielded part; the camera stops after stop_after parts"""
+    parts = []
+    started_at = time.monotonic()
+    async for jpeg in broadcaster.frames():
+        parts.append((time.monotonic() - started_at, jpeg))
+        if len(parts) == stop_after:
+            camera.producing = False
+        if len(parts) > 50:
+            break
+    return parts
+
+
+def test_silent_camera_gets_keepalives_then_the_stream_ends(camera, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_KEEPALIVE_SECONDS", 0.1)
+    monkeypatch.setattr(settings, "STREAM_IDLE_TIMEOUT", 0.5)
+    broadcaster = FrameBroadcaster("test")
+
+    parts = asyncio.run(_watch(broadcaster, camera, stop_after=3))
+
+    last_frame = parts[2][1]
+    keepalives = parts[3:]
+    assert 3 <= len(keepalives) <= 5
+    assert all(jpeg == last_frame for _, jpeg in keepalives)
+    assert parts[-1][0] - parts[2][0] < 1.0
+    assert broadcaster.keepalives == len(keepalives)
+    assert broadcaster.streams_timed_out == 1 and broadcaster.viewers == 0
+
+
+def test_no_keepalives_while_frames_arrive(camera, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_KEEPALIVE_SECONDS", 0.1)
+    monkeypatch.setattr(settings, "STREAM_IDLE_TIMEOUT", 0)
+    broadcaster = FrameBroadcaster("test")
+
+    async def watch():
+        parts = []
+        async for jpeg in broadcaster.frames():
+            parts.append(jpeg)
+            if len(parts) == 20:
+                return parts
+
+    parts = asyncio.run(watch())
+    assert len(set(parts)) == 20
+    assert broadcaster.keepalives == 0
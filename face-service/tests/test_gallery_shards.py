@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.core.ann_index import FlatIndex
+from app.core.config import settings
+from app.core.face_gallery import EmbeddingStore
+from app.core.gallery_shards import GalleryShards
+
+VISITORS = 8
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(0)
+    store = EmbeddingStore(index=FlatIndex())
+    store.add(
+        [f"f{i}" for i in range(VISITORS)],
+        [f"v{i}" for i in range(VISITORS)],
+        rng.normal(size=(VISITORS, 128)).astype(np.float32)
+    )
+    return store
+
+
+@pytest.fixture
+def shards(monkeypatch, request):
+    monkeypatch.setattr(settings, "GALLERY_SHARD_PREFIX", f"test-gallery-{os.getpid()}-{request.node.name}")
+    shards = GalleryShards(count=2)
+    yield shards
+    shards.stop()
+
+
+def _touch(store, visitor):
+    """Re-add a visitor's face, so the next sync republishes its shard"""
+    row = store.face_rows[f"f{visitor}"]
+    store.add([f"f{visitor}"], [f"v{visitor}"], store.matrix[row].copy())
+
+
+def _wait_ready(shards):
+    deadline = time.monotonic() + 60
+    while not all(shards._is_ready(shard) for shard in shards.shards):
+        assert time.monotonic() < deadline, "shard workers did not start"
+        time.sleep(0.05)
+
+
+def test_sync_during_search_keeps_the_searched_generation(shards, store, monkeypatch):
+    shards.running = True  # No workers: every shard is searched from the parent's mapping
+    shards.sync(store)
+    is_ready = shards._is_ready
+
+    def sync_twice(shard):
+        # Two publishes retire the generation this search is reading
+        for _ in range(2):
+            for visitor in range(VISITORS):
+                _touch(store, visitor)
+            shards.sync(store)
+        return is_ready(shard)
+
+    monkeypatch.setattr(shards, "_is_ready", sync_twice)
+    searched = [shard.current for shard in shards.shards]
+    query = store.matrix[store.face_rows["f3"]].copy()
+    matches = shards.search(query, VISITORS)
+
+    assert len(matches) == VISITORS
+    assert matches[0][:2] == ("f3", "v3")
+    # The generations it read are released once the search is done
+    for publication in searched:
+        assert publication.retired and publication.readers == 0
+        assert publication.shm is None
+
+
+def test_search_while_syncing(shards, store):
+    shards.start()
+    shards.sync(store)
+    _wait_ready(shards)
+
+    gallery_lock = threading.Lock()
+    stop = threading.Event()
+
+    def sync():
+        while not stop.is_set():
+            with gallery_lock:
+                _touch(store, 0)
+                shards.sync(store)
+
+    queries = {f"v{i}": store.matrix[store.face_rows[f"f{i}"]].copy() for i in range(VISITORS)}
+    syncer = threading.Thread(target=sync)
+    syncer.start()
+    try:
+        for _ in range(50):
+            for visitor_id, query in queries.items():
+                matches = shards.search(query, VISITORS)
+                assert len(matches) == VISITORS
+                assert matches[0][1] == visitor_id
+    finally:
+        stop.set()
+        syncer.join()
+
+    assert sum(shard.restarts for shard in shards.shards) == 0
+
+
+def test_searches_from_several_callers_are_in_flight_together(shards, store, monkeypatch):
+    shards.start()
+    shards.sync(store)
+    _wait_ready(shards)
+
+    callers = 4
+    # Every caller has sent its requests before any of them gathers an answer
+    in_flight = threading.Barrier(callers, timeout=10)
+    send = shards._send
+
+    def send_then_wait(shard, *args):
+        future = send(shard, *args)
+        if shard.index == shards.count - 1:
+            in_flight.wait()
+        return future
+
+    monkeypatch.setattr(shards, "_send", send_then_wait)
+    results = {}
+
+    def search(visitor):
+        query = store.matrix[store.face_rows[f"f{visitor}"]].copy()
+        results[visitor] = shards.search(query, VISITORS)
+
+    threads = [threading.Thread(target=search, args=(visitor,)) for visitor in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Each caller got the answers to its own query
+    assert {visitor: matches[0][1] for visitor, matches in results.items()} == {
+        visitor: f"v{visitor}" for visitor in range(callers)
+    }
+    assert sum(shard.fallbacks for shard in shards.shards) == 0
+
+
+def test_gallery_publishes_on_change_not_on_search(shards, store, monkeypatch):
+    from app.core import face_gallery as gallery_module
+
+    monkeypatch.setattr(gallery_module, "gallery_shards", shards)
+    shards.running = True
+    gallery = gallery_module.FaceGallery()
+    gallery.restore(store, {f"v{i}": f"Visitor {i}" for i in range(VISITORS)}, {}, None)
+    publishes = shards.publishes
+
+    embedding = np.ones(128, dtype=np.float32)
+    gallery.add_face("new", "v-new", embedding, "New")
+    assert shards.publishes == publishes + 1
+
+    for _ in range(3):
+        best = gallery.search(embedding, top_k=1)[0]
+        assert (best["visitor_id"], best["visitor_name"]) == ("v-new", "New")
+    assert shards.publishes == publishes + 1
+
+    gallery.remove_visitor("v-new")
+    assert all(match["visitor_id"] != "v-new" for match in gallery.search(embedding, top_k=VISITORS))
+
+
+@pytest.mark.parametrize("name, value", [
+    ("GALLERY_INDEX_TYPE", "ivf"),
+    ("GALLERY_QUANTIZATION", "int8"),
+    ("GALLERY_SUMMARIES_ENABLED", True),
+])
+def test_start_refuses_settings_shards_cannot_honour(shards, monkeypatch, name, value):
+    monkeypatch.setattr(settings, name, value)
+    with pytest.raises(ValueError, match=name):
+        shards.start()
+    assert not shards.running
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from app.core import gallery_sync as sync_module
+from app.core.gallery_snapshot import GallerySnapshot
+from app.core.gallery_sync import GallerySync, load_or_restore
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    snapshot = GallerySnapshot(path=str(tmp_path / "snapshot"))
+    monkeypatch.setattr(sync_module, "gallery_snapshot", snapshot)
+    return snapshot
+
+
+def _restart(monkeypatch):
+    """A new, empty gallery, as after a service restart"""
+    from app.core import gallery_snapshot
+    from app.core.face_gallery import FaceGallery
+
+    gallery = FaceGallery()
+    monkeypatch.setattr(sync_module, "face_gallery", gallery)
+    monkeypatch.setattr(gallery_snapshot, "face_gallery", gallery)
+    return gallery
+
+
+def test_restore_catches_up_on_changes_without_timestamps(database, gallery, snapshot, monkeypatch):
+    kept, updated, trimmed, deactivated = (database.add_visitor() for _ in range(4))
+    gallery.load()
+    assert snapshot.save() is not None
+    database.checkpoint()
+
+    # While the service is down: an embedding updated in place, a face deleted
+    # (neither moves a timestamp catch-up sees), a visitor deactivated and one enrolled
+    face_id = next(face for face, (visitor, _) in database.faces.items() if visitor == updated)
+    database.faces[face_id] = (updated, np.ones(128, dtype=np.float32).tobytes())
+    del database.faces[next(face for face, (visitor, _) in database.faces.items() if visitor == trimmed)]
+    database.visitors[deactivated] = ("Visitor", "false")
+    database.changed_visitors.add(deactivated)
+    enrolled = database.add_visitor()
+
+    restored = _restart(monkeypatch)
+    loaded_while_reconciling = []
+    reconcile = GallerySync.reconcile
+
+    def watched_reconcile(self):
+        loaded_while_reconciling.append(restored.is_loaded)
+        return reconcile(self)
+
+    monkeypatch.setattr(GallerySync, "reconcile", watched_reconcile)
+    load_or_restore()
+
+    assert snapshot.restored and restored.is_loaded
+    assert loaded_while_reconciling == [False]
+    held = {visitor_id: set(faces) for visitor_id, (_, faces) in restored.visitor_checksums().items()}
+    expected = {}
+    for face, (visitor, _) in database.faces.items():
+        if database.visitors[visitor][1] == "true":
+            expected.setdefault(visitor, set()).add(face)
+    assert held == expected
+    assert kept in held and enrolled in held and deactivated not in held
+
+    best = restored.search(np.ones(128, dtype=np.float32), top_k=1)[0]
+    assert (best["face_id"], best["distance"]) == (face_id, pytest.approx(0.0, abs=1e-3))
+
+
+def test_restore_without_changes_repairs_nothing(database, gallery, snapshot, monkeypatch):
+    for _ in range(3):
+        database.add_visitor()
+    gallery.load()
+    snapshot.save()
+    database.checkpoint()
+
+    restored = _restart(monkeypatch)
+    load_or_restore()
+
+    assert snapshot.restored and restored.is_loaded
+    assert restored.size == gallery.size
+    assert GallerySync().reconcile() == 0
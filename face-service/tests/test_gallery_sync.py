@@ -0,0 +1,100 @@
+import json
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.gallery_sync import GallerySync
+
+def _held(gallery):
+    return {visitor_id: set(faces) for visitor_id, (_, faces) in gallery.visitor_checksums().items()}
+
+
+def _expected(database):
+    expected = {}
+    for face_id, (visitor_id, _) in database.faces.items():
+        if database.visitors[visitor_id][1] == "true":
+            expected.setdefault(visitor_id, set()).add(face_id)
+    return expected
+
+
+def test_first_reconcile_repairs_drift_already_in_the_gallery(database, gallery):
+    kept, updated, trimmed, deactivated = (database.add_visitor() for _ in range(4))
+    gallery.load()
+
+    # Changes whose notifications never arrived, before any reconcile ran
+    face_id = next(face for face, (visitor, _) in database.faces.items() if visitor == updated)
+    database.faces[face_id] = (updated, np.ones(128, dtype=np.float32).tobytes())
+    del database.faces[next(face for face, (visitor, _) in database.faces.items() if visitor == trimmed)]
+    database.visitors[deactivated] = ("Visitor", "false")
+    enrolled = database.add_visitor()
+    database.visitors[kept] = ("Renamed", "true")
+
+    assert GallerySync().reconcile() == 5
+    assert _held(gallery) == _expected(database)
+    assert enrolled in _held(gallery) and deactivated not in _held(gallery)
+    assert gallery.visitor_name(kept) == "Renamed"
+    best = gallery.search(np.ones(128, dtype=np.float32), top_k=1)[0]
+    assert (best["face_id"], best["distance"]) == (face_id, pytest.approx(0.0, abs=1e-3))
+    assert gallery.high_water_mark == database.now
+
+    assert GallerySync().reconcile() == 0
+
+
+def test_reconcile_accepts_faces_the_gallery_cannot_decode(database, gallery):
+    visitor_id = database.add_visitor()
+    database.faces[str(uuid.uuid4())] = (visitor_id, b"not an embedding")
+    gallery.load()
+
+    assert gallery.size == 2
+    assert GallerySync().reconcile() == 0
+
+
+def test_reconcile_drops_visitors_deleted_from_the_database(database, gallery):
+    visitor_id = database.add_visitor()
+    gallery.load()
+    database.faces.clear()
+    del database.visitors[visitor_id]
+
+    assert GallerySync().reconcile() == 1
+    assert gallery.size == 0 and _held(gallery) == {}
+
+
+def _notification(table, op, row_id, visitor_id):
+    return json.dumps({"table": table, "op": op, "id": row_id, "visitor_id": visitor_id})
+
+
+def test_notifications_are_applied_together(database, gallery):
+    first, second = database.add_visitor(), database.add_visitor()
+    gallery.load()
+    sync = GallerySync()
+
+    inserted = database.add_face(first)
+    deleted = next(face for face, (visitor, _) in database.faces.items() if visitor == first and face != inserted)
+    del database.faces[deleted]
+    database.visitors[second] = ("Visitor", "false")
+    for payload in (
+        _notification("faces", "INSERT", inserted, first),
+        _notification("faces", "DELETE", deleted, first),
+        _notification("visitors", "UPDATE", second, second),
+    ):
+        sync._queue(payload)
+    sync._apply()
+
+    assert _held(gallery) == _expected(database)
+    assert (sync.faces_applied, sync.visitors_applied) == (2, 1)
+
+
+@pytest.mark.parametrize("payload", [
+    "not json",
+    "[1, 2]",
+    json.dumps({"table": "faces", "op": "INSERT"}),
+    json.dumps({"table": "faces", "op": "INSERT", "id": "42", "visitor_id": str(uuid.uuid4())}),
+    json.dumps({"table": "gates", "op": "INSERT", "id": str(uuid.uuid4()), "visitor_id": str(uuid.uuid4())}),
+])
+def test_malformed_notifications_are_skipped(payload):
+    sync = GallerySync()
+    sync._queue(payload)
+
+    assert sync.ignored == 1 and sync.notifications == 0
+    assert not sync._pending_faces and not sync._pending_visitors
@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.core.face_tracker import Track
+from app.core.identity_voter import IdentityVoter, visitor_cooldown, vote
+
+ENTRY = SimpleNamespace(gate_id="gate-1", direction="entry")
+EXIT = SimpleNamespace(gate_id="gate-1", direction="exit")
+
+
+@pytest.fixture(autouse=True)
+def voting(monkeypatch):
+    monkeypatch.setattr(settings, "VOTE_WINDOW", 5)
+    monkeypatch.setattr(settings, "VOTE_MIN_AGREE", 3)
+    monkeypatch.setattr(settings, "VOTE_MAX_ENCODES", 6)
+    monkeypatch.setattr(settings, "VISITOR_COOLDOWN_SECONDS", 30.0)
+    visitor_cooldown.clear()
+    yield
+    visitor_cooldown.clear()
+
+
+_track_ids = iter(range(1, 1000))
+
+
+def _track(*visitor_ids, distance=0.4):
+    """A track identified once per visitor_id (None = no match)"""
+    track = Track(next(_track_ids), (20, 80, 80, 20), 1.0)
+    for visitor_id in visitor_ids:
+        _identify(track, visitor_id, distance)
+    return track
+
+
+def _identify(track, visitor_id, distance=0.4):
+    identity = {"visitor_id": visitor_id, "distance": distance, "is_match": True} if visitor_id else None
+    track.set_identity(np.zeros(128), identity)
+
+
+def test_identity_is_committed_once_enough_identifications_agree():
+    voter = IdentityVoter("entry")
+    track = _track("v1", "v2", "v1")
+    assert voter.decide(ENTRY, [track], now=100.0) == []
+
+    _identify(track, "v1", distance=0.2)
+    [(decided, decision)] = voter.decide(ENTRY, [track], now=101.0)
+    assert decided is track and track.decided_visitor_id == "v1"
+    assert decision["votes"] == 3 and decision["observations"] == 4
+    assert decision["distance"] == pytest.approx((0.4 + 0.4 + 0.2) / 3)
+    assert decision["confidence"] == pytest.approx(1 - decision["distance"])
+
+    # Committed for good: later frames (and identifications) emit nothing
+    _identify(track, "v2")
+    assert voter.decide(ENTRY, [track], now=102.0) == []
+    assert voter.stats() == {"committed": 1, "unknown": 0, "suppressed": 0}
+
+
+def test_disagreeing_identifications_settle_on_unknown():
+    voter = IdentityVoter("entry")
+    track = _track("v1", "v2", None, "v3", "v1")
+    assert vote(track) is None
+
+    _identify(track, "v2")  # VOTE_MAX_ENCODES identifications, still no 3 in agreement
+    [(_, decision)] = voter.decide(ENTRY, [track], now=100.0)
+    assert decision["visitor_id"] is None
+    assert voter.unknown == 1
+
+    # Unknown faces don't start a cooldown
+    assert visitor_cooldown.stats()["active"] == 0
+
+
+def test_a_visitor_is_preferred_over_unknown_on_a_tie(monkeypatch):
+    monkeypatch.setattr(settings, "VOTE_MIN_AGREE", 2)
+    assert vote(_track(None, "v1", None, "v1"))[:2] == ("v1", 2)
+
+
+def test_tracks_missing_from_the_frame_are_not_decided():
+    voter = IdentityVoter("entry")
+    track = _track("v1", "v1", "v1")
+    track.misses = 1
+    assert voter.decide(ENTRY, [track], now=100.0) == []
+    assert track.decided_at is None
+
+
+def test_visitor_is_committed_once_per_stay_at_a_lane():
+    voter = IdentityVoter("entry")
+    first = _track("v1", "v1", "v1")
+    assert len(voter.decide(ENTRY, [first], now=100.0)) == 1
+
+    # Re-tracked while still at the lane (e.g. after turning away): suppressed
+    second = _track("v1", "v1", "v1")
+    assert voter.decide(ENTRY, [second], now=110.0) == []
+    assert voter.suppressed == 1 and second.decided_visitor_id == "v1"
+
+    # The same visitor at the exit lane is a separate decision
+    assert len(IdentityVoter("exit").decide(EXIT, [_track("v1", "v1", "v1")], now=111.0)) == 1
+
+    # Lingering in view keeps the cooldown running past its length
+    voter.decide(ENTRY, [second], now=135.0)
+    assert voter.decide(ENTRY, [_track("v1", "v1", "v1")], now=150.0) == []
+
+    # Once unseen for VISITOR_COOLDOWN_SECONDS, they're committed again
+    assert len(voter.decide(ENTRY, [_track("v1", "v1", "v1")], now=181.0)) == 1
+    assert voter.committed == 2 and visitor_cooldown.suppressed == 2
+
+
+def test_cooldown_is_shared_by_the_cameras_of_a_lane():
+    assert len(IdentityVoter("entry-a").decide(ENTRY, [_track("v1", "v1", "v1")], now=100.0)) == 1
+    assert IdentityVoter("entry-b").decide(ENTRY, [_track("v1", "v1", "v1")], now=101.0) == []